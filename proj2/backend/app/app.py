@@ -45,17 +45,118 @@ def create_app(config_name):
     # Disable event system overhead in SQLAlchemy.
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Minimum gap between the end of one showing and the start of the next in an auditorium.
+    app.config['SHOWING_CLEANUP_BUFFER_MINS'] = int(os.getenv('SHOWING_CLEANUP_BUFFER_MINS', 15))
+
+    # Per-showing seat map cache (invalidated locally on booking; TTL bounds cross-worker staleness).
+    app.config['SEATMAP_CACHE_TTL_SECS'] = int(os.getenv('SEATMAP_CACHE_TTL_SECS', 30))
+    app.config['SEATMAP_CACHE_SIZE'] = int(os.getenv('SEATMAP_CACHE_SIZE', 1024))
+
+    # Argon2 cost and the bounded hashing pool (requests past workers + queue
+    # size wait up to the admission timeout, then get a 503). Tests hash cheaply.
+    app.config['ARGON2_TIME_COST'] = int(os.getenv('ARGON2_TIME_COST', 1 if config_name == 'testing' else 3))
+    app.config['ARGON2_MEMORY_COST'] = int(os.getenv('ARGON2_MEMORY_COST', 1024 if config_name == 'testing' else 65536))
+    app.config['ARGON2_PARALLELISM'] = int(os.getenv('ARGON2_PARALLELISM', 1 if config_name == 'testing' else 4))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+    app.config['PASSWORD_HASH_QUEUE_SIZE'] = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32))
+    app.config['PASSWORD_HASH_ADMISSION_TIMEOUT_SECS'] = float(os.getenv('PASSWORD_HASH_ADMISSION_TIMEOUT_SECS', 2))
+
+    # Largest batch accepted by the bulk staff/driver onboarding endpoints.
+    app.config['BULK_ONBOARDING_MAX_ROWS'] = int(os.getenv('BULK_ONBOARDING_MAX_ROWS', 500))
+
+    # Session user cache for the login user_loader (TTL bounds how long another
+    # worker can keep serving a changed or deactivated account).
+    app.config['USER_CACHE_TTL_SECS'] = int(os.getenv('USER_CACHE_TTL_SECS', 60))
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 4096))
+    # Endpoints (comma-separated, '*' for all) that may still identify the user by a JSON body user_id
+    # instead of the login session (deprecated). Defaults to the ones the bundled frontend still uses.
+    from app.identity import LEGACY_BODY_USER_ID_ENDPOINTS
+    app.config['BODY_USER_ID_ENDPOINTS'] = os.getenv(
+        'BODY_USER_ID_ENDPOINTS', '*' if config_name == 'testing' else ','.join(LEGACY_BODY_USER_ID_ENDPOINTS))
+
+    # Per-theatre, per-day showtimes listing cache and the longest window one request may ask for.
+    app.config['SHOWTIMES_CACHE_TTL_SECS'] = int(os.getenv('SHOWTIMES_CACHE_TTL_SECS', 300))
+    app.config['SHOWTIMES_CACHE_SIZE'] = int(os.getenv('SHOWTIMES_CACHE_SIZE', 512))
+    app.config['SHOWTIMES_MAX_DAYS'] = int(os.getenv('SHOWTIMES_MAX_DAYS', 14))
+
+    # Per-customer recommendation cache: entries are fresh for the TTL, then served
+    # stale for up to RECOMMENDATION_STALE_SECS while a background refresh runs on a
+    # small pool (refreshes beyond its workers + queue are dropped).
+    app.config['RECOMMENDATION_CACHE_TTL_SECS'] = int(os.getenv('RECOMMENDATION_CACHE_TTL_SECS', 1800))
+    app.config['RECOMMENDATION_STALE_SECS'] = int(os.getenv('RECOMMENDATION_STALE_SECS', 3600))
+    app.config['RECOMMENDATION_CACHE_SIZE'] = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 4096))
+    app.config['RECOMMENDATION_MENU_TTL_SECS'] = int(os.getenv('RECOMMENDATION_MENU_TTL_SECS', 60))
+    app.config['RECOMMENDATION_REFRESH_ASYNC'] = config_name != 'testing'
+    app.config['RECOMMENDATION_REFRESH_WORKERS'] = int(os.getenv('RECOMMENDATION_REFRESH_WORKERS', 2))
+    app.config['RECOMMENDATION_REFRESH_QUEUE_SIZE'] = int(os.getenv('RECOMMENDATION_REFRESH_QUEUE_SIZE', 8))
+    # Prompt size: items per menu category, the menu section's token budget and history items listed.
+    app.config['RECOMMENDATION_MENU_TOP_K'] = int(os.getenv('RECOMMENDATION_MENU_TOP_K', 5))
+    app.config['RECOMMENDATION_MENU_TOKEN_BUDGET'] = int(os.getenv('RECOMMENDATION_MENU_TOKEN_BUDGET', 300))
+    app.config['RECOMMENDATION_HISTORY_TOP_ITEMS'] = int(os.getenv('RECOMMENDATION_HISTORY_TOP_ITEMS', 8))
+    # Rows written by precompute_recommendations.py older than this are ignored.
+    app.config['RECOMMENDATION_PRECOMPUTED_MAX_AGE_HOURS'] = int(os.getenv('RECOMMENDATION_PRECOMPUTED_MAX_AGE_HOURS', 36))
+    # 'llm' (Mistral, with the local recommender as fallback) or 'local' (co-occurrence only).
+    app.config['RECOMMENDATION_BACKEND'] = os.getenv('RECOMMENDATION_BACKEND', 'llm')
+    # LLM calls: per-call deadline, worker pool, HTTP pool and circuit breaker.
+    # MISTRAL_SERVER_URL points the client elsewhere, e.g. at fake_llm_server.py.
+    app.config['LLM_TIMEOUT_SECS'] = float(os.getenv('LLM_TIMEOUT_SECS', 2 if config_name == 'testing' else 8))
+    app.config['LLM_WORKERS'] = int(os.getenv('LLM_WORKERS', 8))
+    app.config['LLM_QUEUE_SIZE'] = int(os.getenv('LLM_QUEUE_SIZE', 16))
+    app.config['LLM_MAX_CONNECTIONS'] = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    app.config['LLM_BREAKER_FAILURES'] = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+    app.config['LLM_BREAKER_RESET_SECS'] = float(os.getenv('LLM_BREAKER_RESET_SECS', 30))
+    app.config['MISTRAL_SERVER_URL'] = os.getenv('MISTRAL_SERVER_URL') or None
+    # Window of hourly sales rollups used to rank "popular" items (menu sort, new customers).
+    app.config['POPULARITY_WINDOW_HOURS'] = int(os.getenv('POPULARITY_WINDOW_HOURS', 168))
+    # Snack pairings kept per movie, and how often the pairing index is rebuilt from scratch
+    app.config['PAIRING_TOP_K'] = int(os.getenv('PAIRING_TOP_K', 10))
+    app.config['PAIRING_REBUILD_SECS'] = int(os.getenv('PAIRING_REBUILD_SECS', 3600))
+    # Lifetime of the in-process active-coupon snapshot (bounds staleness across workers)
+    app.config['COUPON_CACHE_TTL_SECS'] = int(os.getenv('COUPON_CACHE_TTL_SECS', 60))
+    # Token-bucket rate limits as '<requests>/<seconds>' ('0' disables one). An
+    # empty storage URL keeps buckets per process; redis://... shares them.
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'false' if config_name == 'testing' else 'true').lower() == 'true'
+    app.config['RATE_LIMIT_STORAGE_URL'] = os.getenv('RATE_LIMIT_STORAGE_URL', '')
+    app.config['RATE_LIMIT_EVICT_SECS'] = int(os.getenv('RATE_LIMIT_EVICT_SECS', 60))
+    app.config['RATE_LIMIT_LOGIN_PER_IP'] = os.getenv('RATE_LIMIT_LOGIN_PER_IP', '20/60')
+    app.config['RATE_LIMIT_LOGIN_PER_ACCOUNT'] = os.getenv('RATE_LIMIT_LOGIN_PER_ACCOUNT', '5/60')
+    app.config['RATE_LIMIT_COUPON_PER_IP'] = os.getenv('RATE_LIMIT_COUPON_PER_IP', '30/60')
+    app.config['RATE_LIMIT_COUPON_PER_ACCOUNT'] = os.getenv('RATE_LIMIT_COUPON_PER_ACCOUNT', '20/60')
+    # Signed puzzle tokens: HMAC key and lifetime (spent nonces are stored on deliveries.puzzle_nonce)
+    app.config['PUZZLE_TOKEN_SECRET'] = os.getenv('PUZZLE_TOKEN_SECRET', app.config['SECRET_KEY'])
+    app.config['PUZZLE_TOKEN_TTL_SECS'] = int(os.getenv('PUZZLE_TOKEN_TTL_SECS', 900))
+    # How often the puzzle catalog checks its table and folders for changes
+    app.config['PUZZLE_CATALOG_RELOAD_SECS'] = int(os.getenv('PUZZLE_CATALOG_RELOAD_SECS', 0 if config_name == 'testing' else 10))
+    # Item recommender: incremental refresh interval, full rebuild interval and ids re-read behind the mark
+    app.config['ITEM_RECOMMENDER_REFRESH_SECS'] = int(os.getenv('ITEM_RECOMMENDER_REFRESH_SECS', 0 if config_name == 'testing' else 60))
+    app.config['ITEM_RECOMMENDER_REBUILD_SECS'] = int(os.getenv('ITEM_RECOMMENDER_REBUILD_SECS', 3600))
+    app.config['ITEM_RECOMMENDER_OVERLAP_ROWS'] = int(os.getenv('ITEM_RECOMMENDER_OVERLAP_ROWS', 1000))
+
+    # Deliveries a single staff member may hold at once before leaving the queue.
+    app.config['STAFF_MAX_CONCURRENT_DELIVERIES'] = int(os.getenv('STAFF_MAX_CONCURRENT_DELIVERIES', 1))
+
+    # Stale-delivery sweeper: per-status SLAs (minutes), batch size, and whether
+    # this process runs the periodic sweep (enable it in exactly one worker).
+    app.config['STALE_DELIVERY_SLA_MINUTES'] = {
+        'pending': int(os.getenv('STALE_PENDING_SLA_MINUTES', 10)),
+        'accepted': int(os.getenv('STALE_ACCEPTED_SLA_MINUTES', 45)),
+    }
+    app.config['STALE_DELIVERY_BATCH_SIZE'] = int(os.getenv('STALE_DELIVERY_BATCH_SIZE', 100))
+    app.config['STALE_DELIVERY_SWEEP_INTERVAL_SECS'] = int(os.getenv('STALE_DELIVERY_SWEEP_INTERVAL_SECS', 60))
+    app.config['STALE_DRIVER_RELEASE_STATUS'] = os.getenv('STALE_DRIVER_RELEASE_STATUS', 'available')
+    app.config['STALE_DELIVERY_SWEEPER_ENABLED'] = os.getenv('STALE_DELIVERY_SWEEPER_ENABLED', 'false').lower() == 'true'
+
     # Initialize extensions with the created app instance.
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = None  
     login_manager.session_protection = None  
 
-    # Reload the user object from the stored session id for authenticated requests.
+    # Reload the user from the stored session id for authenticated requests (cached).
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import Users
-        return Users.query.filter_by(id=int(user_id)).first()
+        from app.identity import load_user_principal
+        return load_user_principal(int(user_id))
 
     # Standard unauthorized handler returning JSON 401 for API clients.
     @login_manager.unauthorized_handler
@@ -83,9 +184,34 @@ def create_app(config_name):
     app.register_blueprint(coupon_bp)
     app.register_blueprint(bundle_bp)
 
+    # Fill denormalized theatre/auditorium ids on new bookings and deliveries; registered first so later flush listeners see them.
+    from app.services.venue_service import register_venue_listeners
+    register_venue_listeners()
+
+    # Keep theatre delivery dashboard counters in step with delivery status changes.
+    from app.services.delivery_stats_service import register_delivery_stats_listeners
+    register_delivery_stats_listeners()
+
+    # Keep the hourly per-theatre item sales rollups in step with checkouts and cancellations.
+    from app.services.sales_rollup_service import register_sales_rollup_listeners
+    register_sales_rollup_listeners()
+
+    # Token-bucket limits on login and coupon endpoints, checked before any view runs.
+    from app.rate_limit import init_rate_limiting
+    init_rate_limiting(app)
+
+    # Drop the in-process active-coupon snapshot whenever coupons change.
+    from app.services.coupon_service import register_coupon_cache_listeners
+    register_coupon_cache_listeners()
+
     # Create all database tables if they don't exist
     with app.app_context():
         db.create_all()
 
+    # Optionally run the stale-delivery sweep in a background thread.
+    if app.config['STALE_DELIVERY_SWEEPER_ENABLED'] and not app.config.get('TESTING'):
+        from app.services.dispatch_service import start_stale_delivery_sweeper
+        start_stale_delivery_sweeper(app)
+
     # Return the configured application instance.
     return app
@@ -0,0 +1,121 @@
+from flask import current_app
+from collections import OrderedDict
+import threading
+import time
+
+# Guards creation of named caches in app.extensions.
+_registry_lock = threading.Lock()
+
+
+class TTLCache:
+    """Thread-safe in-process cache with a size bound (LRU) and per-entry TTL.
+
+    Entries expire after ttl seconds and the least-recently-used entry is
+    evicted once maxsize is reached. Invalidation is local to the process, so
+    the TTL also bounds how stale another worker's copy can get.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        """Initialize an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries kept.
+            ttl: Default lifetime of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return a live entry, or default if it is missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache TTL)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Store value only if key has no live entry.
+
+        Returns:
+            bool: True if stored, False if a live entry was already present.
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > now:
+                return False
+            self._data[key] = (value, now + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value for key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key.
+            factory: Zero-argument callable producing the value.
+            ttl: Optional lifetime override in seconds.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def delete(self, key):
+        """Drop a single entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def get_cache(name, maxsize=1024, ttl=60):
+    """Return the named cache for the current app, creating it on first use.
+
+    Caches live in app.extensions so each app instance (e.g. per test) gets
+    its own and nothing leaks between them.
+
+    Args:
+        name: Cache name, e.g. 'seatmap'.
+        maxsize: Size bound used when the cache is first created.
+        ttl: Default TTL in seconds used when the cache is first created.
+
+    Returns:
+        TTLCache: The cache registered under name.
+    """
+    caches = current_app.extensions.setdefault('ttl_caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        with _registry_lock:
+            cache = caches.get(name)
+            if cache is None:
+                cache = caches[name] = TTLCache(maxsize=maxsize, ttl=ttl)
+    return cache
+
@@ -0,0 +1,141 @@
+from flask import current_app
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# Guards creation of the per-app hashing pool.
+_pool_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool has no room for another job."""
+
+
+class PasswordHashPool:
+    """Bounded worker pool that runs argon2 off the request thread.
+
+    argon2-cffi releases the GIL while hashing, so a small thread pool gives
+    real parallelism without the cost of pickling work to processes. At most
+    workers + queue_size jobs are admitted at once; a caller that cannot get
+    a slot within admission_timeout gets PasswordHashingBusy instead of
+    queueing indefinitely behind a login burst. Bulk batches (hash_many) may
+    hold at most half the workers' worth of those slots, so logins always
+    find room.
+    """
+
+    def __init__(self, time_cost=3, memory_cost=65536, parallelism=4, workers=4, queue_size=32,
+                 admission_timeout=2.0):
+        """Create the pool.
+
+        Args:
+            time_cost: argon2 iterations.
+            memory_cost: argon2 memory in KiB.
+            parallelism: argon2 lanes.
+            workers: Number of hashing threads.
+            queue_size: Jobs allowed to wait for a free thread.
+            admission_timeout: Seconds to wait for a slot before giving up.
+        """
+        self.hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='argon2')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._bulk_slots = threading.BoundedSemaphore(max(1, workers // 2))
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.admission_timeout):
+            raise PasswordHashingBusy("Password hashing is busy, please retry shortly")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        return self._submit(fn, *args).result()
+
+    def hash(self, password):
+        """Hash a plaintext password with the configured parameters.
+
+        Raises:
+            PasswordHashingBusy: If the pool is saturated.
+        """
+        return self._run(self.hasher.hash, password)
+
+    def hash_many(self, passwords):
+        """Hash several passwords in parallel, preserving order.
+
+        At most workers // 2 bulk jobs are in flight across all batches; the
+        next job is submitted only when one of them finishes, so a large batch
+        never fills the queue ahead of logins. If a job cannot be admitted,
+        the batch's jobs that have not started are cancelled.
+
+        Raises:
+            PasswordHashingBusy: If a slot does not free up within the admission timeout.
+        """
+        futures = []
+        try:
+            for password in passwords:
+                self._bulk_slots.acquire()
+                try:
+                    future = self._submit(self.hasher.hash, password)
+                except BaseException:
+                    self._bulk_slots.release()
+                    raise
+                future.add_done_callback(lambda _: self._bulk_slots.release())
+                futures.append(future)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return [future.result() for future in futures]
+
+    def verify(self, password_hash, password):
+        """Return True if password matches password_hash.
+
+        Raises:
+            PasswordHashingBusy: If the pool is saturated.
+        """
+        return self._run(self._verify, password_hash, password)
+
+    def _verify(self, password_hash, password):
+        try:
+            return self.hasher.verify(password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self, password_hash):
+        """Return True if password_hash was made with different parameters (cheap, no hashing)."""
+        try:
+            return self.hasher.check_needs_rehash(password_hash)
+        except InvalidHashError:
+            return False
+
+    def shutdown(self):
+        """Stop accepting work and release the worker threads."""
+        self._executor.shutdown(wait=False)
+
+
+def get_password_hasher():
+    """Return the current app's hashing pool, creating it from config on first use.
+
+    Returns:
+        PasswordHashPool: The pool stored in app.extensions.
+    """
+    pool = current_app.extensions.get('password_hasher')
+    if pool is None:
+        with _pool_lock:
+            pool = current_app.extensions.get('password_hasher')
+            if pool is None:
+                config = current_app.config
+                pool = current_app.extensions['password_hasher'] = PasswordHashPool(
+                    time_cost=int(config.get('ARGON2_TIME_COST', 3)),
+                    memory_cost=int(config.get('ARGON2_MEMORY_COST', 65536)),
+                    parallelism=int(config.get('ARGON2_PARALLELISM', 4)),
+                    workers=int(config.get('PASSWORD_HASH_WORKERS', 4)),
+                    queue_size=int(config.get('PASSWORD_HASH_QUEUE_SIZE', 32)),
+                    admission_timeout=float(config.get('PASSWORD_HASH_ADMISSION_TIMEOUT_SECS', 2)),
+                )
+    return pool
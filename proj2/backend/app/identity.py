@@ -0,0 +1,248 @@
+from flask import g, has_request_context, request, current_app
+from flask_login import UserMixin, current_user
+from sqlalchemy import inspect
+from app.models import Users, Staff, Drivers, Suppliers, Customers
+from app.cache import get_cache
+import threading
+
+# Endpoints the bundled frontend still calls with a JSON body user_id and no
+# session cookie; allowed by default outside the testing config until it moves to cookie auth.
+LEGACY_BODY_USER_ID_ENDPOINTS = (
+    'staff.list_staff_by_theatre', 'staff.set_theatre_status', 'staff.set_availability', 'staff.add_staff',
+    'staff.remove_staff', 'staff.accept_delivery', 'staff.fulfill_delivery',
+    'suppliers.set_availability', 'suppliers.edit_supplier',
+    'suppliers.add_product', 'suppliers.edit_product', 'suppliers.remove_product',
+)
+
+# Guards the in-flight load records used by the user_loader cache.
+_loads_lock = threading.Lock()
+
+
+def get_role_record(model, user_id):
+    """Return the role row (Staff, Drivers, ...) for a user, memoized on g.
+
+    The record is looked up at most once per request/app context. Negative
+    results are not memoized, and a record deleted or detached since it was
+    cached is looked up again. Records are bound to the scoped session, which
+    shares the app context's lifetime with g.
+
+    Args:
+        model: Role model keyed by user_id (Staff, Drivers, Suppliers, Customers).
+        user_id: The user's id.
+
+    Returns:
+        The role record, or None if the user does not have that role.
+    """
+    if user_id is None:
+        return None
+    records = g.setdefault('role_records', {})
+    key = (model.__tablename__, user_id)
+    record = records.get(key)
+    if record is not None:
+        state = inspect(record)
+        if not (state.deleted or state.was_deleted or state.detached):
+            return record
+    record = model.query.filter_by(user_id=user_id).first()
+    if record is None:
+        records.pop(key, None)
+    else:
+        records[key] = record
+    return record
+
+
+class Principal:
+    """The user acting in the current request, with lazily resolved role records."""
+
+    def __init__(self, user_id, role=None, authenticated=False):
+        """Create a principal.
+
+        Args:
+            user_id: The acting user's id.
+            role: The user's role from Users.role, if known.
+            authenticated: True when the id comes from the login session.
+        """
+        self.user_id = user_id
+        self.role = role
+        self.authenticated = authenticated
+
+    def staff(self):
+        """Return the Staff record for this principal, or None."""
+        return get_role_record(Staff, self.user_id)
+
+    def driver(self):
+        """Return the Drivers record for this principal, or None."""
+        return get_role_record(Drivers, self.user_id)
+
+    def supplier(self):
+        """Return the Suppliers record for this principal, or None."""
+        return get_role_record(Suppliers, self.user_id)
+
+    def customer(self):
+        """Return the Customers record for this principal, or None."""
+        return get_role_record(Customers, self.user_id)
+
+
+def principal_for(user_id):
+    """Return a Principal for user_id, reusing the request's principal when it matches.
+
+    Args:
+        user_id: The acting user's id (may be None).
+
+    Returns:
+        Principal: Principal for the id.
+    """
+    principal = _request_principal()
+    if principal is not None and user_id is not None and principal.user_id == user_id:
+        return principal
+    return Principal(user_id)
+
+
+def _request_principal():
+    """Return the principal already resolved for the current request, if any."""
+    if not has_request_context():
+        return None
+    # g outlives a single request when an app context was pushed beforehand
+    # (tests, CLI), so remember which request the principal belongs to.
+    resolved = g.get('principal')
+    if resolved is not None and resolved[0] is request._get_current_object():
+        return resolved[1]
+    return None
+
+
+def get_principal():
+    """Resolve the acting user once per request.
+
+    The flask_login session wins. Otherwise the user_id in the JSON body is
+    used, but only on endpoints listed in BODY_USER_ID_ENDPOINTS (clients that
+    have not moved to session auth yet); each such use logs a deprecation
+    warning. Anywhere else an unauthenticated request has no principal.
+
+    Returns:
+        Principal | None: The acting principal, or None if nobody is identified.
+    """
+    if not has_request_context():
+        return None
+    resolved = g.get('principal')
+    current_request = request._get_current_object()
+    if resolved is not None and resolved[0] is current_request:
+        return resolved[1]
+    principal = None
+    if current_user.is_authenticated:
+        principal = Principal(current_user.id, role=getattr(current_user, 'role', None), authenticated=True)
+    else:
+        data = request.get_json(silent=True) or {}
+        if data.get('user_id') is not None and _body_user_id_allowed():
+            if not current_app.testing:
+                current_app.logger.warning(
+                    f"Deprecated: {request.endpoint} identified user {data['user_id']} from the request body; use session auth")
+            principal = Principal(data['user_id'])
+    g.principal = (current_request, principal)
+    return principal
+
+
+def _body_user_id_allowed():
+    """Return True if the current endpoint may take the acting user from the JSON body."""
+    allowed = current_app.config.get('BODY_USER_ID_ENDPOINTS', '')
+    endpoints = {name.strip() for name in allowed.split(',') if name.strip()}
+    return '*' in endpoints or request.endpoint in endpoints
+
+
+class UserPrincipal(UserMixin):
+    """Detached, read-only snapshot of a user served to flask_login as current_user.
+
+    Carries the profile fields the API reads from current_user, so cached
+    sessions need no Users row; services that modify the user load it themselves.
+    """
+
+    def __init__(self, user):
+        """Snapshot a Users row.
+
+        Args:
+            user: The Users record.
+        """
+        self.id = user.id
+        self.name = user.name
+        self.email = user.email
+        self.phone = user.phone
+        self.birthday = user.birthday
+        self.role = user.role
+        self.account_status = user.account_status
+
+    @property
+    def is_active(self):
+        return self.account_status == 'active'
+
+    def __repr__(self):
+        return f'<UserPrincipal id = {self.id} role = {self.role} status = {self.account_status}>'
+
+
+def _user_cache():
+    return get_cache(
+        'user_principals',
+        maxsize=int(current_app.config.get('USER_CACHE_SIZE', 4096)),
+        ttl=int(current_app.config.get('USER_CACHE_TTL_SECS', 60)),
+    )
+
+
+def _user_loads():
+    # user id -> {'loads': in-flight loads, 'version': invalidations seen}; an
+    # entry lives only while a load is running, so the dict stays small
+    return current_app.extensions.setdefault('user_principal_loads', {})
+
+
+def load_user_principal(user_id):
+    """Return the cached principal for a session user id, loading it on a miss.
+
+    Inactive accounts resolve to None, which logs the session out. A load
+    registers itself before the query and is only cached if no
+    invalidate_user_principal ran meanwhile, so a racing load never caches
+    the old row.
+
+    Args:
+        user_id: The user's primary key.
+
+    Returns:
+        UserPrincipal | None: The principal, or None if missing or inactive.
+    """
+    user_id = int(user_id)
+    cache = _user_cache()
+    principal = cache.get(user_id)
+    if principal is not None:
+        return principal if principal.is_active else None
+
+    loads = _user_loads()
+    with _loads_lock:
+        load = loads.setdefault(user_id, {'loads': 0, 'version': 0})
+        load['loads'] += 1
+        version = load['version']
+    principal = None
+    try:
+        user = Users.query.filter_by(id=user_id).first()
+        if not user:
+            return None
+        principal = UserPrincipal(user)
+    finally:
+        with _loads_lock:
+            if principal is not None and load['version'] == version:
+                cache.set(user_id, principal)
+            load['loads'] -= 1
+            if load['loads'] == 0:
+                loads.pop(user_id, None)
+    return principal if principal.is_active else None
+
+
+def invalidate_user_principal(user_id):
+    """Drop a user's cached principal after their row changes or is deleted.
+
+    Only this process's cache is cleared; other workers pick the change up
+    once their entry's TTL (USER_CACHE_TTL_SECS) runs out.
+
+    Args:
+        user_id: The user's primary key.
+    """
+    user_id = int(user_id)
+    with _loads_lock:
+        load = _user_loads().get(user_id)
+        if load is not None:
+            load['version'] += 1
+        _user_cache().delete(user_id)
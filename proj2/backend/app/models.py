@@ -1,6 +1,6 @@
 from app.app import db
-from sqlalchemy.dialects.mysql import INTEGER, TINYINT, SMALLINT, DECIMAL
-from sqlalchemy.sql import func, expression
+from sqlalchemy.dialects.mysql import INTEGER, TINYINT, SMALLINT, DECIMAL, DATETIME
+from sqlalchemy.sql import func, expression, text
 from flask_login import UserMixin
 
 class Theatres(db.Model):
@@ -63,11 +63,14 @@ class Staff(db.Model):
     theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id'), nullable = False)
     role = db.Column(db.Enum('admin', 'runner', name = 'staff_role'), nullable = False)
     is_available = db.Column(db.Boolean, nullable = False, server_default = expression.false())
+    # Deliveries currently assigned to this staff member (bounded by STAFF_MAX_CONCURRENT_DELIVERIES)
+    active_deliveries = db.Column(INTEGER(unsigned = True), nullable = False, server_default = '0')
     date_added = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp())
     last_updated = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp(), server_onupdate = func.current_timestamp())
+    __table_args__ = (db.Index('idx_staff_queue', 'theatre_id', 'is_available', 'last_updated'),)
 
     def __repr__(self):
-        return f'<Staff user_id = {self.user_id} theatre_id = {self.theatre_id} role = {self.role} is_available = {self.is_available}>'
+        return f'<Staff user_id = {self.user_id} theatre_id = {self.theatre_id} role = {self.role} is_available = {self.is_available} active_deliveries = {self.active_deliveries}>'
     
 class Movies(db.Model):
     __tablename__ = 'movies'
@@ -113,12 +116,15 @@ class CustomerShowings(db.Model):
     customer_id = db.Column(db.BigInteger, db.ForeignKey('customers.user_id', ondelete='CASCADE'), nullable = False)
     movie_showing_id = db.Column(db.BigInteger, db.ForeignKey('movie_showings.id', ondelete='CASCADE'), nullable = False)
     seat_id = db.Column(db.BigInteger, db.ForeignKey('seats.id'), nullable = False)
+    # Denormalized from seat -> auditorium -> theatre at booking time
+    auditorium_id = db.Column(db.BigInteger, db.ForeignKey('auditoriums.id'), nullable = True)
+    theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id'), nullable = True)
     date_added = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp())
     last_updated = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp(), server_onupdate = func.current_timestamp())
-    __table_args__ = (db.UniqueConstraint('movie_showing_id', 'seat_id', name = 'unique_movie_seat'),)
+    __table_args__ = (db.UniqueConstraint('movie_showing_id', 'seat_id', name = 'unique_movie_seat'), db.Index('idx_customer_showings_theatre', 'theatre_id', 'movie_showing_id'))
 
     def __repr__(self):
-        return f'<Customer Showings id = {self.id} customer_id = {self.customer_id} movie_showing_id = {self.movie_showing_id} seat_id = {self.seat_id}>'
+        return f'<Customer Showings id = {self.id} customer_id = {self.customer_id} movie_showing_id = {self.movie_showing_id} seat_id = {self.seat_id} theatre_id = {self.theatre_id}>'
 
 
 class PaymentMethods(db.Model):
@@ -194,6 +200,9 @@ class Deliveries(db.Model):
     customer_showing_id = db.Column(db.BigInteger, db.ForeignKey('customer_showings.id', ondelete='CASCADE'), nullable = False)
     payment_method_id = db.Column(db.BigInteger, db.ForeignKey('payment_methods.id'), nullable = False)
     staff_id = db.Column(db.BigInteger, db.ForeignKey('staff.user_id'))
+    # Denormalized from the customer showing at checkout time
+    auditorium_id = db.Column(db.BigInteger, db.ForeignKey('auditoriums.id'), nullable = True)
+    theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id'), nullable = True)
     payment_status = db.Column(db.Enum('pending', 'completed', 'failed'), server_default = 'pending', nullable = False)
     # Total before any coupon discount is applied
     total_price = db.Column(DECIMAL(12,2), nullable = False)
@@ -206,12 +215,14 @@ class Deliveries(db.Model):
     ngo_name = db.Column(db.String(128), nullable=True)
     donation_amount = db.Column(DECIMAL(12,2), nullable=False, server_default=u'0.00')
     donation_percentage = db.Column(DECIMAL(5,2), nullable=True)
+    # Nonce of the coupon puzzle token spent on this order; unique so a token unlocks one order
+    puzzle_nonce = db.Column(db.String(32), nullable=True)
     delivery_time = db.Column(db.DateTime, server_default = 'CURRENT_TIMESTAMP', server_onupdate = 'CURRENT_TIMESTAMP', nullable = False)
     delivery_status = db.Column(db.Enum('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit', 'delivered', 'fulfilled', 'cancelled'), server_default = 'pending', nullable = False)
     is_rated = db.Column(db.Boolean, server_default = expression.false(), nullable = False)
     date_added = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp())
     last_updated = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp(), server_onupdate = func.current_timestamp())
-    __table_args__ = (db.CheckConstraint('total_price >= 0.00', name = 'check_total_price'),)
+    __table_args__ = (db.CheckConstraint('total_price >= 0.00', name = 'check_total_price'), db.Index('idx_deliveries_status_updated', 'delivery_status', 'last_updated'), db.Index('idx_deliveries_theatre_status', 'theatre_id', 'delivery_status', 'date_added'), db.UniqueConstraint('puzzle_nonce', name = 'unique_delivery_puzzle_nonce'))
 
     def __repr__(self):
         return f'<Deliveries id = {self.id} driver_id = {self.driver_id} customer_showing_id = {self.customer_showing_id} payment_method_id = {self.payment_method_id} staff_id = {self.staff_id} payment_status = {self.payment_status} total_price = {self.total_price} coupon_code = {self.coupon_code} discount_amount = {self.discount_amount} ngo_name = {self.ngo_name} donation_amount = {self.donation_amount} delivery_time = {self.delivery_time} delivery_status = {self.delivery_status}>'
@@ -267,6 +278,10 @@ class CodePuzzles(db.Model):
     answer = db.Column(db.Text, nullable=False)
     is_active = db.Column(db.Boolean, nullable=False, server_default=expression.true())
     date_added = db.Column(db.DateTime(timezone=True), nullable=False, server_default=func.current_timestamp())
+    # Microsecond precision so the puzzle catalog's MAX(last_updated) fingerprint sees every edit
+    last_updated = db.Column(DATETIME(fsp=6), nullable=False, server_default=text('CURRENT_TIMESTAMP(6)'),
+                             server_onupdate=text('CURRENT_TIMESTAMP(6)'))
+    __table_args__ = (db.Index('idx_code_puzzles_last_updated', 'last_updated'),)
 
     def __repr__(self):
         return f'<CodePuzzles id={self.id} folder={self.folder!r} name={self.name!r} difficulty={self.difficulty} active={self.is_active}>'
@@ -307,3 +322,49 @@ class NgoDonations(db.Model):
 
     def __repr__(self):
         return f'<NgoDonations ngo_id = {self.ngo_id} total_amount_donated = {self.total_amount_donated}>'
+
+class TheatreDeliveryCounters(db.Model):
+    __tablename__ = 'theatre_delivery_counters'
+    # Live number of deliveries per theatre and status, maintained on each status transition
+    theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id', ondelete='CASCADE'), primary_key = True)
+    delivery_status = db.Column(db.Enum('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit', 'delivered', 'fulfilled', 'cancelled'), primary_key = True)
+    delivery_count = db.Column(db.Integer, nullable = False, server_default = '0')
+    last_updated = db.Column(db.DateTime(timezone = True), nullable = False, server_default = func.current_timestamp(), server_onupdate = func.current_timestamp())
+
+    def __repr__(self):
+        return f'<TheatreDeliveryCounters theatre_id = {self.theatre_id} delivery_status = {self.delivery_status} delivery_count = {self.delivery_count}>'
+
+class TheatreDeliveryThroughput(db.Model):
+    __tablename__ = 'theatre_delivery_throughput'
+    # Transitions into each status per theatre, bucketed into 15-minute windows
+    theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id', ondelete='CASCADE'), primary_key = True)
+    window_start = db.Column(db.DateTime, primary_key = True)
+    delivery_status = db.Column(db.Enum('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit', 'delivered', 'fulfilled', 'cancelled'), primary_key = True)
+    transition_count = db.Column(INTEGER(unsigned = True), nullable = False, server_default = '0')
+
+    def __repr__(self):
+        return f'<TheatreDeliveryThroughput theatre_id = {self.theatre_id} window_start = {self.window_start} delivery_status = {self.delivery_status} transition_count = {self.transition_count}>'
+
+class CustomerRecommendations(db.Model):
+    __tablename__ = 'customer_recommendations'
+    # Recommendation precomputed off-peak by precompute_recommendations.py, stamped with the menu it was built from
+    user_id = db.Column(db.BigInteger, db.ForeignKey('customers.user_id', ondelete='CASCADE'), primary_key = True)
+    recommendation = db.Column(db.JSON, nullable = False)
+    menu_version = db.Column(db.String(40), nullable = False)
+    generated_at = db.Column(db.DateTime, nullable = False)
+
+    def __repr__(self):
+        return f'<CustomerRecommendations user_id = {self.user_id} menu_version = {self.menu_version} generated_at = {self.generated_at}>'
+
+class TheatreItemSalesHourly(db.Model):
+    __tablename__ = 'theatre_item_sales_hourly'
+    # Units sold per product/bundle per theatre per hour, maintained with each checkout and cancellation
+    theatre_id = db.Column(db.BigInteger, db.ForeignKey('theatres.id', ondelete='CASCADE'), primary_key = True)
+    hour_start = db.Column(db.DateTime, primary_key = True)
+    item_type = db.Column(db.Enum('product', 'bundle'), primary_key = True)
+    item_id = db.Column(db.BigInteger, primary_key = True)
+    units_sold = db.Column(db.Integer, nullable = False, server_default = '0')
+    __table_args__ = (db.Index('idx_item_sales_hour', 'hour_start'),)
+
+    def __repr__(self):
+        return f'<TheatreItemSalesHourly theatre_id = {self.theatre_id} hour_start = {self.hour_start} item = {self.item_type}:{self.item_id} units_sold = {self.units_sold}>'
@@ -0,0 +1,222 @@
+from flask import current_app, jsonify, request, session
+from abc import ABC, abstractmethod
+from array import array
+import math
+import threading
+import time
+
+# Guards creation of the per-app bucket store.
+_store_lock = threading.Lock()
+
+
+class TokenBucketStore(ABC):
+    """Interface for token bucket storage.
+
+    A bucket holds up to capacity tokens and refills at capacity/period
+    tokens per second. Each request takes one token or is refused.
+    """
+
+    @abstractmethod
+    def take(self, key, capacity, period):
+        """Take a token from the bucket under key.
+
+        Args:
+            key: Bucket name, e.g. 'RATE_LIMIT_LOGIN_PER_IP:10.0.0.1'.
+            capacity: Bucket size (the allowed burst).
+            period: Seconds for an empty bucket to refill completely.
+
+        Returns:
+            float: 0.0 if a token was taken, else seconds until one is available.
+        """
+
+
+class MemoryTokenBucketStore(TokenBucketStore):
+    """Per-process bucket store kept in three flat arrays indexed by a key -> slot dict.
+
+    Each bucket costs one dict entry plus three doubles (tokens, last update,
+    time it will be full again). Every evict_interval seconds buckets that
+    have refilled completely are dropped and the arrays compacted, since a
+    full bucket is indistinguishable from a missing one.
+    """
+
+    def __init__(self, evict_interval=60):
+        """Create an empty store.
+
+        Args:
+            evict_interval: Seconds between sweeps for full buckets.
+        """
+        self.evict_interval = evict_interval
+        self._slots = {}
+        self._tokens = array('d')
+        self._updated = array('d')
+        self._full_at = array('d')
+        self._next_evict = time.monotonic() + evict_interval
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_evict:
+                self._evict(now)
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = len(self._tokens)
+                self._tokens.append(float(capacity))
+                self._updated.append(now)
+                self._full_at.append(now)
+            tokens = min(float(capacity), self._tokens[slot] + (now - self._updated[slot]) * rate)
+            self._updated[slot] = now
+            if tokens < 1.0:
+                self._tokens[slot] = tokens
+                return (1.0 - tokens) / rate
+            tokens -= 1.0
+            self._tokens[slot] = tokens
+            self._full_at[slot] = now + (capacity - tokens) / rate
+            return 0.0
+
+    def _evict(self, now):
+        live = [(key, slot) for key, slot in self._slots.items() if self._full_at[slot] > now]
+        self._tokens = array('d', (self._tokens[slot] for _, slot in live))
+        self._updated = array('d', (self._updated[slot] for _, slot in live))
+        self._full_at = array('d', (self._full_at[slot] for _, slot in live))
+        self._slots = {key: i for i, (key, _) in enumerate(live)}
+        self._next_evict = now + self.evict_interval
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slots)
+
+
+class RedisTokenBucketStore(TokenBucketStore):
+    """Bucket store shared by every worker through Redis (requires the redis package).
+
+    The refill-and-take step is a Lua script, so it is atomic across
+    workers, and each bucket expires once it would be full again.
+    """
+
+    _SCRIPT = """
+        local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens, updated = tonumber(bucket[1]), tonumber(bucket[2])
+        if tokens == nil then tokens, updated = capacity, now end
+        tokens = math.min(capacity, tokens + (now - updated) * rate)
+        local wait = 0
+        if tokens < 1 then wait = (1 - tokens) / rate else tokens = tokens - 1 end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+        return tostring(wait)
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        """Connect to Redis.
+
+        Args:
+            url: Redis URL, e.g. redis://localhost:6379/0.
+            prefix: Prepended to every bucket key.
+        """
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self._SCRIPT)
+
+    def take(self, key, capacity, period):
+        return float(self._take(keys=[self.prefix + key], args=[capacity, capacity / period, time.time()]))
+
+
+def get_rate_limit_store():
+    """Return the current app's bucket store, created from RATE_LIMIT_STORAGE_URL on first use.
+
+    An empty URL keeps buckets in process memory; a redis:// URL shares them
+    between workers.
+
+    Returns:
+        TokenBucketStore: The store kept in app.extensions.
+    """
+    store = current_app.extensions.get('rate_limit_store')
+    if store is None:
+        with _store_lock:
+            store = current_app.extensions.get('rate_limit_store')
+            if store is None:
+                url = current_app.config.get('RATE_LIMIT_STORAGE_URL', '')
+                if url:
+                    store = RedisTokenBucketStore(url)
+                else:
+                    store = MemoryTokenBucketStore(int(current_app.config.get('RATE_LIMIT_EVICT_SECS', 60)))
+                current_app.extensions['rate_limit_store'] = store
+    return store
+
+
+def parse_limit(value):
+    """Parse a '<requests>/<seconds>' limit, e.g. '10/60'. Empty or '0' disables the limit.
+
+    Returns:
+        tuple | None: (capacity, period) or None.
+
+    Raises:
+        ValueError: If the value is malformed.
+    """
+    if not value or str(value).strip() == '0':
+        return None
+    capacity, _, period = str(value).partition('/')
+    capacity, period = int(capacity), float(period or 1)
+    if capacity < 1 or period <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}")
+    return capacity, period
+
+
+def _client_ip():
+    return request.remote_addr
+
+
+def _login_account():
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    return str(email).strip().lower() if email else None
+
+
+def _session_account():
+    # Read the Flask-Login session id directly so no user row is loaded
+    return session.get('_user_id')
+
+
+# endpoint -> [(limit config key, bucket key function)]; buckets sharing a config key are shared across endpoints
+RATE_LIMITED_ENDPOINTS = {
+    'user.login': [('RATE_LIMIT_LOGIN_PER_IP', _client_ip), ('RATE_LIMIT_LOGIN_PER_ACCOUNT', _login_account)],
+    'coupon.apply_coupon': [('RATE_LIMIT_COUPON_PER_IP', _client_ip), ('RATE_LIMIT_COUPON_PER_ACCOUNT', _session_account)],
+    'coupon.get_coupon_puzzle': [('RATE_LIMIT_COUPON_PER_IP', _client_ip), ('RATE_LIMIT_COUPON_PER_ACCOUNT', _session_account)],
+}
+
+
+def check_rate_limit():
+    """before_request hook: answer 429 when a limited endpoint's IP or account bucket is empty.
+
+    Runs before the view, so refused requests cost no database query or
+    password hash. If the shared store is unreachable requests are let through.
+    """
+    rules = RATE_LIMITED_ENDPOINTS.get(request.endpoint)
+    if not rules or request.method == 'OPTIONS' or not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    try:
+        store = get_rate_limit_store()
+        wait = 0.0
+        for config_key, key_fn in rules:
+            limit = parse_limit(current_app.config.get(config_key))
+            subject = key_fn()
+            if limit is None or subject is None:
+                continue
+            wait = max(wait, store.take(f"{config_key}:{subject}", *limit))
+    except Exception as e:
+        current_app.logger.warning(f"Rate limiting skipped: {e}")
+        return None
+    if wait <= 0:
+        return None
+    response = jsonify({'error': 'Too many requests, please retry later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def init_rate_limiting(app):
+    """Register the rate limit check on app."""
+    app.before_request(check_rate_limit)
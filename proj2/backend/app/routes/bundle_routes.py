@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_login import current_user, login_required
 from app.models import *
 from app.services.bundle_service import BundleService
+from app.identity import get_principal
 
 
 # Blueprint for bundle-related endpoints
@@ -10,7 +11,8 @@ bundle_bp = Blueprint("bundles", __name__, url_prefix="/api")
 
 # Helper function to retrieve the current user's id
 def get_user_id():
-    return current_user.id if current_user.is_authenticated else None
+    principal = get_principal()
+    return principal.user_id if principal and principal.authenticated else None
 
 
 @bundle_bp.route('/bundles', methods=['POST'])
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.services.customer_service import CustomerService
 from app.services.recommendation_service import RecommendationService
+from app.services.showing_service import ShowingService
+from app.services.pairing_service import get_showing_pairings
+from datetime import datetime
 
 
 # Blueprint for customer-related endpoints
@@ -556,6 +559,170 @@ def create_customer_showing(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@customer_bp.route('/showings/<int:showing_id>/seatmap', methods=['GET'])
+def get_showing_seatmap(showing_id):
+    """
+    Get Showing Seat Map
+    ---
+    tags: [Movie Booking]
+    description: Returns the auditorium layout as per-aisle seat-number ranges plus a base64 occupancy bitset (one bit per seat in aisle/number order, most significant bit first; 1 = booked).
+    parameters:
+      - in: path
+        name: showing_id
+        type: integer
+        required: true
+        description: The ID of the movie showing.
+    responses:
+      200:
+        description: Seat map
+        schema:
+          type: object
+          properties:
+            showing_id: {type: integer}
+            auditorium_id: {type: integer}
+            seat_count: {type: integer}
+            booked_count: {type: integer}
+            layout:
+              type: array
+              items:
+                type: object
+                properties:
+                  aisle: {type: string}
+                  ranges:
+                    type: array
+                    items:
+                      type: array
+                      items: {type: integer}
+            occupancy: {type: string, description: 'Base64-encoded occupancy bitset'}
+      404: {description: Showing not found}
+    """
+    try:
+        seatmap = ShowingService().get_seatmap(showing_id)
+        return jsonify(seatmap), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@customer_bp.route('/showings/<int:showing_id>/pairings', methods=['GET'])
+def get_showing_snack_pairings(showing_id):
+    """
+    Get Snack Pairings for a Showing
+    ---
+    tags: [Movie Booking]
+    description: Returns the products whose name, category and keywords best match the showing's movie genre and keywords, from a precomputed TF-IDF similarity index (no LLM call).
+    parameters:
+      - in: path
+        name: showing_id
+        type: integer
+        required: true
+        description: The ID of the movie showing.
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Maximum number of pairings (default 5, at most PAIRING_TOP_K).
+    responses:
+      200:
+        description: Pairings, best match first
+        schema:
+          type: object
+          properties:
+            showing_id: {type: integer}
+            movie_id: {type: integer}
+            pairings:
+              type: array
+              items:
+                type: object
+                properties:
+                  type: {type: string}
+                  id: {type: integer}
+                  name: {type: string}
+                  category: {type: string}
+                  price: {type: number}
+                  score: {type: number}
+      400: {description: Invalid limit}
+      404: {description: Showing not found}
+    """
+    try:
+        pairings = get_showing_pairings(showing_id, limit=request.args.get('limit', 5, type=int))
+        return jsonify(pairings), 200
+    except ValueError as e:
+        status = 404 if str(e).endswith("not found") else 400
+        return jsonify({'error': str(e)}), status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@customer_bp.route('/theatres/<int:theatre_id>/showtimes', methods=['GET'])
+def get_theatre_showtimes(theatre_id):
+    """
+    Get Theatre Showtimes
+    ---
+    tags: [Movie Booking]
+    description: Lists the movies showing at a theatre with their showings in a time window (default the next 24 hours, at most SHOWTIMES_MAX_DAYS).
+    parameters:
+      - in: path
+        name: theatre_id
+        type: integer
+        required: true
+      - in: query
+        name: from
+        type: string
+        required: false
+        description: Window start (ISO 8601); defaults to now.
+      - in: query
+        name: to
+        type: string
+        required: false
+        description: Window end, exclusive (ISO 8601); defaults to one day after from.
+    responses:
+      200:
+        description: Showtimes grouped by movie
+        schema:
+          type: object
+          properties:
+            theatre_id: {type: integer}
+            from: {type: string}
+            to: {type: string}
+            movies:
+              type: array
+              items:
+                type: object
+                properties:
+                  movie_id: {type: integer}
+                  title: {type: string}
+                  genre: {type: string}
+                  length_mins: {type: integer}
+                  rating: {type: number}
+                  showings:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        showing_id: {type: integer}
+                        auditorium_id: {type: integer}
+                        start_time: {type: string}
+      400: {description: Invalid window}
+      404: {description: Theatre not found}
+    """
+    try:
+        window = {}
+        for param in ('from', 'to'):
+            value = request.args.get(param)
+            if value:
+                try:
+                    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                except ValueError:
+                    return jsonify({'error': f"'{param}' must be an ISO 8601 datetime"}), 400
+                window[param] = parsed.replace(tzinfo=None)
+        showtimes = ShowingService().get_showtimes(theatre_id, start=window.get('from'), end=window.get('to'))
+        return jsonify(showtimes), 200
+    except ValueError as e:
+        status = 404 if str(e).endswith("not found") else 400
+        return jsonify({'error': str(e)}), status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @customer_bp.route('/deliveries', methods=['POST'])
 def create_delivery():
   """
@@ -693,6 +860,18 @@ def list_products():
     ---
     tags: [Product Catalog]
     description: Retrieves a list of all currently available concession products (the menu).
+    parameters:
+      - in: query
+        name: sort
+        type: string
+        enum: [popular]
+        required: false
+        description: Order by units sold over the recent popularity window instead of supplier and name.
+      - in: query
+        name: theatre_id
+        type: integer
+        required: false
+        description: With sort=popular, rank by sales at this theatre.
     responses:
       200:
         description: Products retrieved successfully
@@ -702,9 +881,12 @@ def list_products():
             products:
               type: array
               items: {$ref: '#/definitions/ProductMenu'}
+      400:
+        description: Invalid sort
     """
     try:
-        products = customer_service.show_all_products()
+        products = customer_service.show_all_products(sort=request.args.get('sort'),
+                                                      theatre_id=request.args.get('theatre_id', type=int))
         return jsonify({
             'products': [{
                 'id': p.id,
@@ -716,6 +898,8 @@ def list_products():
                 'is_available': p.is_available
             } for p in products]
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app.models import *
 from app.services.driver_service import DriverService
+from app.services.dispatch_service import DispatchService
+from app.services.staff_service import StaffService
+from app.identity import get_principal
+from app.hashing import PasswordHashingBusy
 
 
 # Blueprint for driver-related endpoints
@@ -80,6 +84,66 @@ def create_driver():
         return jsonify({'error': f'An unexpected error occurred: {e}'}), 500
 
 
+@driver_bp.route('/driver/bulk', methods=['POST'])
+def create_drivers_bulk():
+    """
+    Create Driver Accounts in Bulk
+    ---
+    tags: [Driver Management (Admin)]
+    description: Creates many driver accounts in one request (staff admin only). Rows are validated independently (including unique email, phone and license plate); valid rows are created and invalid ones reported.
+    parameters:
+      - in: body
+        name: driver_batch
+        schema:
+          type: object
+          required: [drivers]
+          properties:
+            drivers:
+              type: array
+              items: {$ref: '#/definitions/DriverRegistration'}
+    responses:
+      200:
+        description: Per-row results
+        schema:
+          type: object
+          properties:
+            created: {type: integer}
+            failed: {type: integer}
+            results:
+              type: array
+              items:
+                type: object
+                properties:
+                  index: {type: integer}
+                  status: {type: string, enum: [created, error]}
+                  user_id: {type: integer}
+                  error: {type: string}
+      400:
+        description: Missing or invalid batch
+      404:
+        description: Unauthorized (not a staff admin)
+      503:
+        description: Password hashing is saturated; retry shortly
+    """
+    try:
+        data = request.json
+        StaffService(principal=get_principal()).validate_admin()
+        service = DriverService()
+        if 'drivers' not in data:
+            return jsonify({"error": "Missing required fields"}), 400
+        results = service.create_drivers_bulk(data['drivers'])
+        created = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({"created": created, "failed": len(results) - created, "results": results}), 200
+    except ValueError as e:
+        if str(e).startswith("Unauthorized"):
+            return jsonify({'error': str(e)}), 404
+        return jsonify({'error': str(e)}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': f'An unexpected error occurred: {e}'}), 500
+
+
 @driver_bp.route('/driver/<int:driver_user_id>', methods=['DELETE'])
 def delete_driver(driver_user_id):
     """
@@ -291,6 +355,7 @@ def assign_driver(delivery_id):
         
         if not assigned:
             return jsonify({"message": "No available drivers found."}), 404
+        db.session.commit()
             
         driver = service.validate_driver(delivery.driver_id) # Fetch the newly assigned driver
         
@@ -347,6 +412,58 @@ def complete_delivery(delivery_id):
         return jsonify({'error': f'An unexpected error occurred: {e}'}), 500
 
 
+@driver_bp.route('/deliveries/sweep-stale', methods=['POST'])
+def sweep_stale_deliveries():
+    """
+    Sweep Stale Deliveries
+    ---
+    tags: [Delivery Operations]
+    description: Releases drivers and staff from deliveries stuck past their status SLA and re-dispatches them (staff admin only; cron should use sweep_stale_deliveries.py).
+    responses:
+      200:
+        description: Sweep completed
+        schema:
+          type: object
+          properties:
+            found: {type: integer}
+            requeued: {type: integer}
+            reassigned: {type: integer}
+      404:
+        description: Unauthorized (not a staff admin)
+    """
+    try:
+        StaffService(principal=get_principal()).validate_admin()
+        service = DispatchService()
+        result = service.sweep_stale_deliveries()
+        return jsonify(result), 200
+    except ValueError as e:
+        if str(e).startswith("Unauthorized"):
+            return jsonify({'error': str(e)}), 404
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'An unexpected error occurred: {e}'}), 500
+
+
+@driver_bp.route('/deliveries/sweep-stale/metrics', methods=['GET'])
+def get_sweep_metrics():
+    """
+    Get Stale-Delivery Sweeper Metrics
+    ---
+    tags: [Delivery Operations]
+    description: Returns process-wide counters for the stale-delivery sweeper (runs, found, requeued, reassigned, errors). Staff admin only.
+    responses:
+      200:
+        description: Sweeper counters
+      404:
+        description: Unauthorized (not a staff admin)
+    """
+    try:
+        StaffService(principal=get_principal()).validate_admin()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify(DispatchService.get_metrics()), 200
+
+
 @driver_bp.route('/deliveries/<int:delivery_id>/rate', methods=['PUT'])
 def rate_driver(delivery_id):
     """
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app.models import *
-from app.services.staff_service import StaffService
+from app.services.staff_service import StaffService, ScheduleConflictError, ScheduleValidationError
+from app.services.delivery_stats_service import DeliveryStatsService, THROUGHPUT_MAX_WINDOWS
+from app.identity import get_principal
+from app.hashing import PasswordHashingBusy
 from datetime import datetime
 
 
@@ -8,12 +11,6 @@ from datetime import datetime
 staff_bp = Blueprint("staff", __name__, url_prefix="/api")
 
 
-# Helper function to retrieve the current user's id
-def get_user_id():
-    data = request.json
-    return data.get('user_id')
-
-
 @staff_bp.route('/staff', methods=['POST'])
 def add_staff():
     """
@@ -40,8 +37,7 @@ def add_staff():
         description: Unauthorized (manager not admin) or theatre not found
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
 
         data = request.json
         required_fields = ['name', 'email', 'phone', 'birthday', 'password', 'theatre_id', 'role']
@@ -64,6 +60,66 @@ def add_staff():
         return jsonify({'error': str(e)}), 500
 
 
+@staff_bp.route('/staff/bulk', methods=['POST'])
+def add_staff_bulk():
+    """
+    Add Staff Members in Bulk
+    ---
+    tags: [Staff Management]
+    description: Creates many staff members in one request (e.g. seasonal onboarding). Rows are validated independently; valid rows are created and invalid ones reported. Requires manager user_id in the request body for authorization.
+    parameters:
+      - in: body
+        name: staff_batch
+        schema:
+          type: object
+          required: [user_id, staff]
+          properties:
+            user_id: {type: integer, description: 'The staff manager user ID.'}
+            staff:
+              type: array
+              items: {$ref: '#/definitions/StaffRegistration'}
+    responses:
+      200:
+        description: Per-row results
+        schema:
+          type: object
+          properties:
+            created: {type: integer}
+            failed: {type: integer}
+            results:
+              type: array
+              items:
+                type: object
+                properties:
+                  index: {type: integer}
+                  status: {type: string, enum: [created, error]}
+                  user_id: {type: integer}
+                  error: {type: string}
+      400:
+        description: Missing or invalid batch
+      404:
+        description: Unauthorized (manager not admin)
+      503:
+        description: Password hashing is saturated; retry shortly
+    """
+    try:
+        service = StaffService(principal=get_principal())
+        data = request.json
+        if 'staff' not in data:
+            return jsonify({"error": "Missing required fields"}), 400
+        results = service.add_staff_bulk(data['staff'])
+        created = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({"created": created, "failed": len(results) - created, "results": results}), 200
+    except ValueError as e:
+        if str(e).startswith("Unauthorized"):
+            return jsonify({'error': str(e)}), 404
+        return jsonify({'error': str(e)}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @staff_bp.route('/staff/<int:staff_user_id>', methods=['DELETE'])
 def remove_staff(staff_user_id):
     """
@@ -94,8 +150,7 @@ def remove_staff(staff_user_id):
         description: Staff member not found or unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         service.remove_staff(staff_user_id)
         return jsonify({"message":"Staff successfully removed"}), 200
     except ValueError as e:
@@ -187,8 +242,7 @@ def set_theatre_status():
         description: Theatre not found or unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         if 'theatre_id' not in data or 'is_open' not in data:
             return jsonify({"error": "Missing theatre_id or is_open"}), 400
@@ -225,8 +279,7 @@ def add_movie():
         description: Unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         required_fields = ['title', 'genre', 'length_mins', 'release_year', 'keywords', 'rating']
         if not all(field in data for field in required_fields):
@@ -276,8 +329,7 @@ def edit_movie(movie_id):
         description: Movie not found or unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         required_fields = ['title', 'genre', 'length_mins', 'release_year', 'keywords', 'rating']
         if not all(field in data for field in required_fields):
@@ -328,8 +380,7 @@ def remove_movie(movie_id):
         description: Movie not found or unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         service.remove_movie(movie_id)
         return jsonify({"message":"Movie successfully removed"}), 200
     except ValueError as e:
@@ -361,10 +412,11 @@ def add_showing():
         description: Missing fields or invalid start_time
       404:
         description: Movie/Auditorium not found or unauthorized
+      409:
+        description: Showing overlaps another showing in the auditorium
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         required_fields = ['movie_id', 'auditorium_id', 'start_time']
         if not all(field in data for field in required_fields):
@@ -375,6 +427,8 @@ def add_showing():
             start_time=datetime.fromisoformat(data['start_time'].replace("Z", "+00:00"))
         )
         return jsonify({"message":"Movie Showing created successfully", "showing_id": showing.id}), 201
+    except ScheduleConflictError as e:
+        return jsonify({'error': str(e), 'conflicts': e.conflicts}), 409
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
@@ -409,10 +463,11 @@ def edit_showing(showing_id):
         description: Missing fields or invalid start_time
       404:
         description: Showing not found or unauthorized
+      409:
+        description: Showing overlaps another showing in the auditorium
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         required_fields = ['movie_id', 'auditorium_id', 'start_time']
         if not all(field in data for field in required_fields):
@@ -424,6 +479,79 @@ def edit_showing(showing_id):
             start_time=datetime.fromisoformat(data['start_time'].replace("Z", "+00:00"))
         )
         return jsonify({"message":"Movie Showing details changed successfully", "showing_id": showing.id}), 200
+    except ScheduleConflictError as e:
+        return jsonify({'error': str(e), 'conflicts': e.conflicts}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@staff_bp.route('/theatres/<int:theatre_id>/showings/schedule', methods=['POST'])
+def schedule_showings(theatre_id):
+    """
+    Bulk Schedule Showings
+    ---
+    tags: [Showings Scheduling]
+    description: Schedules a batch of showings (e.g. a week's programming) for one theatre in a single request. Every slot is checked against existing showings and the rest of the batch, allowing for movie runtime plus a cleanup buffer. Nothing is created if any slot conflicts. Requires staff user_id in the body (admin only).
+    parameters:
+      - in: path
+        name: theatre_id
+        type: integer
+        required: true
+        description: The ID of the theatre whose auditoriums are being scheduled.
+      - in: body
+        name: schedule
+        schema:
+          type: object
+          required: [user_id, showings]
+          properties:
+            user_id: {type: integer, description: 'The staff manager user ID.'}
+            showings:
+              type: array
+              items: {$ref: '#/definitions/ShowingCreateEdit'}
+    responses:
+      201:
+        description: Showings created
+        schema:
+          type: object
+          properties:
+            message: {type: string}
+            showings:
+              type: array
+              items:
+                type: object
+                properties:
+                  showing_id: {type: integer}
+                  movie_id: {type: integer}
+                  auditorium_id: {type: integer}
+                  start_time: {type: string}
+      400:
+        description: Missing showings or invalid slot
+      404:
+        description: Movie/Auditorium not found or unauthorized
+      409:
+        description: One or more slots overlap; conflicts are listed
+    """
+    try:
+        service = StaffService(principal=get_principal())
+        data = request.json
+        if not isinstance(data.get('showings'), list) or not data['showings']:
+            return jsonify({"error": "Missing showings"}), 400
+        showings = service.schedule_showings(theatre_id=theatre_id, slots=data['showings'])
+        return jsonify({
+            "message": f"{len(showings)} showings scheduled",
+            "showings": [{
+                "showing_id": s.id,
+                "movie_id": s.movie_id,
+                "auditorium_id": s.auditorium_id,
+                "start_time": s.start_time.isoformat()
+            } for s in showings]
+        }), 201
+    except ScheduleConflictError as e:
+        return jsonify({'error': str(e), 'conflicts': e.conflicts}), 409
+    except ScheduleValidationError as e:
+        return jsonify({'error': str(e)}), 400
     except ValueError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
@@ -460,8 +588,7 @@ def remove_showing(showing_id):
         description: Showing not found or unauthorized
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         service.remove_showing(showing_id)
         return jsonify({"message":"Movie Showing successfully removed"}), 200
     except ValueError as e:
@@ -494,8 +621,7 @@ def set_availability():
         description: Staff member not found
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         if 'is_available' not in data:
             return jsonify({"error": "Missing is_available field"}), 400
@@ -539,8 +665,7 @@ def accept_delivery(delivery_id):
         description: Delivery or Staff not found
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         delivery = service.accept_delivery(delivery_id)
         return jsonify({"message": "Delivery accepted successfully"}), 200
     except ValueError as e:
@@ -581,8 +706,7 @@ def fulfill_delivery(delivery_id):
         description: Delivery or Staff not found
     """
     try:
-        user_id = get_user_id()
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         data = request.json
         delivery = service.fulfill_delivery(delivery_id)
         return jsonify({"message": f"Delivery fulfilled"}), 200
@@ -624,8 +748,7 @@ def list_staff_by_theatre(theatre_id):
         description: Theatre not found or unauthorized
     """
     try:
-        user_id = get_user_id()  
-        service = StaffService(user_id)
+        service = StaffService(principal=get_principal())
         staff = service.show_all_staff(theatre_id)
         return jsonify({
             "staff": [{
@@ -686,6 +809,69 @@ def list_deliveries_by_theatre(theatre_id):
         return jsonify({'error': str(e)}), 500
 
 
+@staff_bp.route('/theatres/<int:theatre_id>/delivery-stats', methods=['GET'])
+def get_theatre_delivery_stats(theatre_id):
+    """
+    Theatre Delivery Dashboard Stats
+    ---
+    tags: [Delivery Management]
+    description: Returns delivery counts by status, the age of the oldest pending delivery and per-15-minute throughput for a theatre. Served from incrementally maintained counters. Only staff of the theatre may view it.
+    parameters:
+      - in: body
+        name: user
+        schema:
+          type: object
+          required: [user_id]
+          properties:
+            user_id: {type: integer}
+      - in: path
+        name: theatre_id
+        type: integer
+        required: true
+        description: The ID of the theatre.
+      - in: query
+        name: windows
+        type: integer
+        default: 8
+        description: Number of 15-minute throughput windows to return (at most 96).
+    responses:
+      200:
+        description: Dashboard aggregates
+        schema:
+          type: object
+          properties:
+            theatre_id: {type: integer}
+            counts: {type: object}
+            oldest_pending_age_secs: {type: integer}
+            throughput_window_mins: {type: integer}
+            throughput:
+              type: array
+              items:
+                type: object
+                properties:
+                  window_start: {type: string}
+                  counts: {type: object}
+      400:
+        description: Invalid windows parameter
+      404:
+        description: Theatre not found or user is not staff of the theatre
+    """
+    try:
+        windows = request.args.get('windows', 8, type=int)
+        if windows is None or not 1 <= windows <= THROUGHPUT_MAX_WINDOWS:
+            return jsonify({'error': f'windows must be between 1 and {THROUGHPUT_MAX_WINDOWS}'}), 400
+        staff = StaffService(principal=get_principal()).validate_staff()
+        if staff.theatre_id != theatre_id:
+            return jsonify({'error': 'Unauthorized User - Not staff of this theatre'}), 404
+        service = DeliveryStatsService()
+        stats = service.get_delivery_stats(theatre_id, windows=windows)
+        return jsonify(stats), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @staff_bp.route('/staff/<int:staff_user_id>', methods=['GET'])
 def get_staff(staff_user_id):
     """
@@ -2,18 +2,13 @@ from flask import Blueprint, request, jsonify
 from app.models import *
 from app.app import db
 from app.services.supplier_service import SupplierService
+from app.identity import get_principal
 
 
 # Blueprint for supplier-related endpoints
 supplier_bp = Blueprint("suppliers", __name__, url_prefix="/api")
 
 
-# Helper function to get the current user's id
-def get_user_id():
-    data = request.json
-    return data.get('user_id')
-
-
 @supplier_bp.route('/suppliers/<int:supplier_id>', methods=['GET'])
 def get_supplier(supplier_id):
     """
@@ -73,8 +68,7 @@ def edit_supplier():
         description: Supplier not found
     """
     try:
-        user_id = get_user_id()
-        service = SupplierService(user_id)
+        service = SupplierService(principal=get_principal())
         data = request.json
         required_fields = ['company_name', 'company_address', 'contact_phone', 'is_open']
         if not all(field in data for field in required_fields):
@@ -117,8 +111,7 @@ def set_availability():
         description: Supplier not found
     """
     try:
-        user_id = get_user_id()
-        service = SupplierService(user_id)
+        service = SupplierService(principal=get_principal())
         data = request.json
         if 'is_open' not in data:
             return jsonify({"error": "Missing is_open field"}), 400
@@ -192,8 +185,7 @@ def add_product():
         description: Supplier not found
     """
     try:
-        user_id = get_user_id()
-        service = SupplierService(user_id)
+        service = SupplierService(principal=get_principal())
         data = request.json
         required_fields = ['name', 'unit_price', 'inventory_quantity', 'size', 'keywords', 'category', 'discount', 'is_available']
         if not all(field in data for field in required_fields):
@@ -246,8 +238,7 @@ def edit_product(product_id):
         description: Product or Supplier not found
     """
     try:
-        user_id = get_user_id()
-        service = SupplierService(user_id)
+        service = SupplierService(principal=get_principal())
         data = request.json
         required_fields = ['name', 'unit_price', 'inventory_quantity', 'size', 'keywords', 'category', 'discount', 'is_available']
         if not all(field in data for field in required_fields):
@@ -301,8 +292,7 @@ def remove_product(product_id):
         description: Product or Supplier not found
     """
     try:
-        user_id = get_user_id()
-        service = SupplierService(user_id)
+        service = SupplierService(principal=get_principal())
         service.remove_product(product_id)
         return jsonify({"message":"Product successfully removed"}), 200
     except ValueError as e:
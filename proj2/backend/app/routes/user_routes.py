@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from app.services.user_service import UserService
+from app.hashing import PasswordHashingBusy
 from datetime import timedelta
 
 
@@ -32,6 +33,8 @@ def register():
         description: Missing fields, invalid role, or duplicate email/phone
       500:
         description: Server error during registration
+      503:
+        description: Password hashing is saturated; retry shortly
     """
     try:
         data = request.get_json()
@@ -53,6 +56,8 @@ def register():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': 'User registration failed: ' + str(e)}), 500
 
@@ -80,6 +85,8 @@ def login():
         description: Invalid email or password
       500:
         description: Server error during login
+      503:
+        description: Password hashing is saturated; retry shortly
     """
     try:
         data = request.get_json()
@@ -106,6 +113,8 @@ def login():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': 'Login failed'}), 500
 
@@ -325,6 +334,8 @@ def change_password():
         description: Unauthorized (login required)
       500:
         description: Server error during password change
+      503:
+        description: Password hashing is saturated; retry shortly
     """
     try:
         data = request.get_json()
@@ -344,5 +355,7 @@ def change_password():
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    except PasswordHashingBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': 'Password change failed'}), 500
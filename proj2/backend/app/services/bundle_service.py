@@ -1,5 +1,6 @@
 from app.models import *
 from app.app import db
+from app.identity import principal_for
 from datetime import datetime
 
 class BundleService:
@@ -9,13 +10,15 @@ class BundleService:
     with their associated products.
     """
 
-    def __init__(self, user_id=None):
+    def __init__(self, user_id=None, principal=None):
         """Initialize the bundle service with the acting user context.
 
         Args:
             user_id: The id of the user performing actions (optional for read-only operations).
+            principal: Request principal (see app.identity); takes precedence over user_id.
         """
-        self.user_id = user_id
+        self.principal = principal or principal_for(user_id)
+        self.user_id = self.principal.user_id
 
     def validate_admin(self):
         """Ensure the current user is a staff admin.
@@ -29,7 +32,7 @@ class BundleService:
         if not self.user_id:
             raise ValueError("User authentication required")
         
-        admin = Staff.query.filter_by(user_id=self.user_id).first()
+        admin = self.principal.staff()
         if not admin or admin.role != 'admin':
             raise ValueError("Unauthorized - Admin access required")
         return admin
@@ -0,0 +1,348 @@
+from app.models import *
+from app.app import db
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.cache import get_cache
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+
+# Guards creation of the per-app puzzle catalog.
+_catalog_lock = threading.Lock()
+
+PUZZLE_TIERS = ('easy', 'medium', 'hard')
+
+# Changes whenever a puzzle row is added, removed, toggled or edited
+# Inserts raise MAX(id), deletes lower COUNT(*) and edits move MAX(last_updated),
+# all read from indexes without touching the script/answer text.
+_PUZZLE_FINGERPRINT = text("""
+    SELECT COUNT(*), MAX(id), MAX(last_updated) FROM code_puzzles
+""")
+
+
+class CouponService:
+    """Coupon lookups served from an in-process snapshot of every active coupon.
+
+    The snapshot (code -> coupon dict) is loaded with one query and kept in
+    the 'coupons' TTL cache, so both hits and misses are answered from memory:
+    probing unknown codes never reaches MySQL. ORM changes to coupons clear
+    the snapshot on commit (see register_coupon_cache_listeners); other
+    workers and raw SQL edits catch up within COUPON_CACHE_TTL_SECS.
+    """
+
+    def _active_coupons(self):
+        cache = get_cache('coupons', maxsize=1, ttl=int(current_app.config['COUPON_CACHE_TTL_SECS']))
+        return cache.get_or_set('active', self._load_active)
+
+    @staticmethod
+    def _load_active():
+        coupons = Coupons.query.filter_by(is_active=True).order_by(Coupons.id).all()
+        # Keys are case-folded to match MySQL's case-insensitive comparison of the old lookup
+        return {c.code.lower(): {'id': c.id, 'code': c.code, 'difficulty': c.difficulty,
+                                 'discount_percent': c.discount_percent} for c in coupons}
+
+    def get_active_coupon(self, code):
+        """Return an active coupon by code.
+
+        Args:
+            code: Coupon code as entered by the customer.
+
+        Returns:
+            dict | None: id, code, difficulty and discount_percent, or None if no active coupon has this code.
+        """
+        if not code:
+            return None
+        return self._active_coupons().get(str(code).lower())
+
+    def list_active_coupons(self):
+        """Return every active coupon, oldest first."""
+        return list(self._active_coupons().values())
+
+
+def invalidate_coupon_cache():
+    """Drop the active-coupon snapshot so the next lookup reloads it."""
+    get_cache('coupons', maxsize=1, ttl=int(current_app.config['COUPON_CACHE_TTL_SECS'])).clear()
+
+
+def _note_coupon_changes(session, flush_context, instances):
+    if any(isinstance(o, Coupons) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.info['coupons_changed'] = True
+
+
+def _clear_coupons_on_commit(session):
+    if session.info.pop('coupons_changed', False) and has_app_context():
+        invalidate_coupon_cache()
+
+
+def _forget_coupon_changes(session):
+    session.info.pop('coupons_changed', None)
+
+
+def register_coupon_cache_listeners():
+    """Clear the coupon snapshot whenever a commit creates, edits or deletes a coupon through the ORM.
+
+    Changes are noted at flush time and acted on only after commit, so a
+    rolled-back edit leaves the snapshot alone.
+    """
+    if not event.contains(Session, 'before_flush', _note_coupon_changes):
+        event.listen(Session, 'before_flush', _note_coupon_changes)
+    if not event.contains(Session, 'after_commit', _clear_coupons_on_commit):
+        event.listen(Session, 'after_commit', _clear_coupons_on_commit)
+    if not event.contains(Session, 'after_rollback', _forget_coupon_changes):
+        event.listen(Session, 'after_rollback', _forget_coupon_changes)
+
+
+def puzzle_tier(difficulty):
+    """Map a coupon difficulty (clamped to 1..10) to its puzzle folder: 1-3 easy, 4-6 medium, 7-10 hard."""
+    level = max(1, min(10, int(difficulty)))
+    if level <= 3:
+        return 'easy'
+    if level <= 6:
+        return 'medium'
+    return 'hard'
+
+
+class PuzzleCatalog:
+    """In-memory catalog of coupon puzzles from the code_puzzles table and the code_puzzle folders.
+
+    Puzzles are indexed by tier (easy/medium/hard) and by key: db:<id> for
+    table rows and <folder>/<name> for script files. Serving a puzzle is a
+    dict lookup; answers are checked from the signed token alone (see
+    verify_puzzle_token). The catalog reloads itself when the
+    table fingerprint or the folder listing/mtimes change, checked at most
+    every PUZZLE_CATALOG_RELOAD_SECS seconds.
+    """
+
+    def __init__(self):
+        """Create an empty catalog."""
+        # (by_tier, by_key) is replaced as a whole so lookups never see a half-applied reload
+        self._state = ({}, {})
+        self._fingerprint = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _root():
+        return current_app.config.get('CODE_PUZZLE_ROOT', os.path.join(current_app.root_path, 'code_puzzle'))
+
+    def _fingerprint_now(self):
+        """Return a cheap signature of both sources: one aggregate query and one stat per file."""
+        root = self._root()
+        files = []
+        for tier in PUZZLE_TIERS:
+            folder = os.path.join(root, tier)
+            if os.path.isdir(folder):
+                with os.scandir(folder) as entries:
+                    files.extend((tier, e.name, e.stat().st_mtime_ns) for e in entries
+                                 if e.name.endswith(('.py', '.txt')))
+        rows = tuple(db.session.execute(_PUZZLE_FINGERPRINT).one())
+        return root, rows, tuple(sorted(files))
+
+    def _load(self):
+        by_tier = {tier: {'db': [], 'file': []} for tier in PUZZLE_TIERS}
+        by_key = {}
+        for puzzle in CodePuzzles.query.filter_by(is_active=True).all():
+            entry = {'key': f"db:{puzzle.id}", 'folder': puzzle.folder, 'name': puzzle.name,
+                     'filename': f"{puzzle.folder}/{puzzle.name}.py", 'script': puzzle.script,
+                     'answer': (puzzle.answer or '').strip()}
+            by_key[entry['key']] = entry
+            if puzzle.folder in by_tier:
+                by_tier[puzzle.folder]['db'].append(entry)
+
+        root = self._root()
+        for tier in PUZZLE_TIERS:
+            folder = os.path.join(root, tier)
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                if not filename.endswith('.py'):
+                    continue
+                name = os.path.splitext(filename)[0]
+                with open(os.path.join(folder, filename), 'r', encoding='utf-8') as f:
+                    script = f.read()
+                answer_path = os.path.join(folder, name + '.txt')
+                answer = None
+                if os.path.exists(answer_path):
+                    with open(answer_path, 'r', encoding='utf-8') as f:
+                        answer = f.read().strip()
+                entry = {'key': f"{tier}/{name}", 'folder': tier, 'name': name, 'filename': filename,
+                         'script': script, 'answer': answer}
+                by_key[entry['key']] = entry
+                by_tier[tier]['file'].append(entry)
+        return by_tier, by_key
+
+    def refresh(self, force=False):
+        """Reload the catalog if either source changed since the last load.
+
+        Args:
+            force: Reload without comparing fingerprints.
+        """
+        fingerprint = self._fingerprint_now()
+        if not force and fingerprint == self._fingerprint:
+            return
+        state = self._load()
+        with self._lock:
+            self._state = state
+            self._fingerprint = fingerprint
+
+    def invalidate(self):
+        """Force a reload on the next lookup."""
+        with self._lock:
+            self._fingerprint = None
+            self.checked_at = None
+
+    def choose(self, difficulty):
+        """Pick a random puzzle for a coupon difficulty, preferring table rows over script files.
+
+        Args:
+            difficulty: Coupon difficulty (1..10).
+
+        Returns:
+            dict: key, folder, name, filename, script and answer of the puzzle.
+
+        Raises:
+            ValueError: If the tier has no puzzles.
+        """
+        by_tier, _ = self._state
+        tier = by_tier.get(puzzle_tier(difficulty), {})
+        candidates = tier.get('db') or tier.get('file')
+        if not candidates:
+            raise ValueError('No puzzles available')
+        return random.choice(candidates)
+
+
+def get_puzzle_catalog():
+    """Return the current app's puzzle catalog, loaded on first use and reloaded when its sources change.
+
+    Returns:
+        PuzzleCatalog: The catalog stored in app.extensions.
+    """
+    catalog = current_app.extensions.get('puzzle_catalog')
+    if catalog is None:
+        with _catalog_lock:
+            catalog = current_app.extensions.get('puzzle_catalog')
+            if catalog is None:
+                catalog = current_app.extensions['puzzle_catalog'] = PuzzleCatalog()
+    interval = int(current_app.config.get('PUZZLE_CATALOG_RELOAD_SECS', 10))
+    if catalog.checked_at is None or time.monotonic() - catalog.checked_at >= interval:
+        catalog.refresh()
+        catalog.checked_at = time.monotonic()
+    return catalog
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _token_secret():
+    return current_app.config['PUZZLE_TOKEN_SECRET'].encode()
+
+
+def _answer_digest(secret, nonce, answer):
+    """Keyed hash of an answer, salted with the token nonce so equal answers never share a digest."""
+    message = f"answer|{nonce}|{str(answer).strip()}".encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def issue_puzzle_token(puzzle, coupon_code):
+    """Return a signed token for a served puzzle.
+
+    The token is <payload>.<signature>, both base64url. The payload carries
+    the puzzle key, the coupon code, a nonce, an expiry and a keyed hash of
+    the expected answer salted with the nonce; the signature is an HMAC-SHA256
+    of the payload under PUZZLE_TOKEN_SECRET.
+
+    Args:
+        puzzle: Catalog entry from PuzzleCatalog.choose.
+        coupon_code: Code of the coupon the puzzle unlocks.
+
+    Returns:
+        str: The token.
+    """
+    secret = _token_secret()
+    nonce = secrets.token_urlsafe(12)
+    answer = puzzle['answer']
+    payload = {
+        'p': puzzle['key'],
+        'c': coupon_code,
+        'n': nonce,
+        'e': int(time.time()) + int(current_app.config['PUZZLE_TOKEN_TTL_SECS']),
+        'a': None if answer is None else _answer_digest(secret, nonce, answer),
+    }
+    body = _b64encode(json.dumps(payload, separators=(',', ':'), sort_keys=True).encode())
+    signature = _b64encode(hmac.new(secret, body.encode(), hashlib.sha256).digest())
+    return f"{body}.{signature}"
+
+
+def verify_puzzle_token(token, answer, coupon_code):
+    """Check a puzzle answer against its signed token, with no database or disk access.
+
+    Signature and answer digests are compared in constant time. Whether the
+    token was already spent is only known at checkout (see consume_puzzle_token).
+
+    Args:
+        token: Token returned with the puzzle.
+        answer: The client's answer.
+        coupon_code: Coupon being applied; must match the one the token was issued for.
+
+    Returns:
+        dict: The token claims (pass to consume_puzzle_token on checkout).
+
+    Raises:
+        ValueError: If the token is malformed, forged, expired, issued for
+            another coupon, or the answer is wrong.
+    """
+    secret = _token_secret()
+    try:
+        body, signature = token.split('.')
+        expected = _b64encode(hmac.new(secret, body.encode(), hashlib.sha256).digest())
+        valid = hmac.compare_digest(signature, expected)
+        claims = json.loads(_b64decode(body)) if valid else None
+    except Exception:
+        raise ValueError('Invalid puzzle token')
+    if not valid:
+        raise ValueError('Invalid puzzle token')
+    if claims.get('c') != coupon_code:
+        raise ValueError('Puzzle token was issued for a different coupon')
+    if claims.get('e', 0) < time.time():
+        raise ValueError('Puzzle token expired')
+    if claims.get('a') is None:
+        raise ValueError('Puzzle answer file not found')
+    if not hmac.compare_digest(claims['a'], _answer_digest(secret, claims['n'], answer)):
+        raise ValueError('Incorrect puzzle answer')
+    return claims
+
+
+def consume_puzzle_token(claims, delivery):
+    """Spend a verified token on a delivery so it cannot unlock another order.
+
+    The nonce is written to the delivery's unique puzzle_nonce column and
+    flushed, so the token is spent in the checkout transaction: it commits or
+    rolls back with the order, and two concurrent checkouts with the same
+    token cannot both succeed, whichever worker serves them.
+
+    Args:
+        claims: Result of verify_puzzle_token.
+        delivery: The pending, uncommitted delivery being checked out.
+
+    Raises:
+        ValueError: If the token was already used. The session must then be
+            rolled back.
+    """
+    delivery.puzzle_nonce = claims['n']
+    try:
+        db.session.flush()
+    except IntegrityError:
+        raise ValueError('Puzzle token already used')
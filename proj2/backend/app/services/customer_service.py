@@ -3,10 +3,10 @@ from app.app import db
 from app.services.user_service import UserService
 from app.services.staff_service import StaffService
 from app.services.driver_service import DriverService
+from app.services.showing_service import ShowingService
+from app.identity import get_role_record
+from app.services.coupon_service import CouponService, verify_puzzle_token, consume_puzzle_token
 import decimal
-import base64
-import os
-from app.models import Coupons, CodePuzzles
 from flask import current_app
 
 class CustomerService:
@@ -45,7 +45,7 @@ class CustomerService:
         Raises:
             ValueError: If no customer exists for the given user_id.
         """
-        customer = Customers.query.filter_by(user_id=user_id).first()
+        customer = get_role_record(Customers, user_id)
         if not customer:
             raise ValueError(f"Customer {user_id} not found")
         return customer
@@ -266,13 +266,18 @@ class CustomerService:
         if existing_showing:
             raise ValueError(f"Identical customer showing found")
 
+        theatre_id = db.session.query(Auditoriums.theatre_id).filter_by(id=seat.auditorium_id).scalar()
+
         customer_showing = CustomerShowings(
             customer_id=customer.user_id,
             movie_showing_id=movie_showing.id,
-            seat_id=seat.id
+            seat_id=seat.id,
+            auditorium_id=seat.auditorium_id,
+            theatre_id=theatre_id
         )
         db.session.add(customer_showing)
         db.session.commit()
+        ShowingService().invalidate_seatmap(movie_showing.id)
         return customer_showing
 
     def create_cart_item(self, customer_id, product_id=None, bundle_id=None, quantity=1):
@@ -471,7 +476,7 @@ class CustomerService:
     def create_delivery(self, customer_showing_id, payment_method_id, coupon_code=None, puzzle_token=None, puzzle_answer=None, skip_puzzle=False, ngo_id=None, donation_amount=None, donation_percentage=None):
         """Create a delivery from a customer's cart, optionally applying a coupon and donation.
 
-        This verifies puzzles (DB-backed or filesystem), computes discount_amount,
+        This verifies the signed puzzle token (and spends it on success), computes discount_amount,
         persists coupon metadata on the Delivery, calculates donation amount (either fixed amount or percentage of total),
         charges the post-discount total from the payment method (using Decimal arithmetic),
         then finalizes the delivery by decrementing inventory and assigning driver/staff.
@@ -480,7 +485,7 @@ class CustomerService:
             customer_showing_id: CustomerShowings id for whom the delivery is made.
             payment_method_id: PaymentMethods id to charge.
             coupon_code: Optional coupon code string to apply.
-            puzzle_token: Optional base64 token referencing a puzzle (db:<id> or path).
+            puzzle_token: Optional signed token returned with the puzzle.
             puzzle_answer: Optional answer string for the puzzle.
             skip_puzzle: If True, bypass puzzle verification for this coupon.
             ngo_id: Optional NGO id for donation.
@@ -504,13 +509,18 @@ class CustomerService:
         if payment_method.customer_id != customer_showing.customer_id:
             raise ValueError("Payment method does not belong to this customer")
 
-        seat = Seats.query.filter_by(id=customer_showing.seat_id).first()
-        if not seat:
-            raise ValueError(f"Seat {customer_showing.seat_id} not found")
+        # Venue is denormalized onto the booking; walk seat -> auditorium only for legacy rows
+        auditorium_id, theatre_id = customer_showing.auditorium_id, customer_showing.theatre_id
+        if theatre_id is None:
+            seat = Seats.query.filter_by(id=customer_showing.seat_id).first()
+            if not seat:
+                raise ValueError(f"Seat {customer_showing.seat_id} not found")
 
-        auditorium = Auditoriums.query.filter_by(id=seat.auditorium_id).first()
-        if not auditorium:
-            raise ValueError(f"Auditorium {seat.auditorium_id} not found")
+            auditorium = Auditoriums.query.filter_by(id=seat.auditorium_id).first()
+            if not auditorium:
+                raise ValueError(f"Auditorium {seat.auditorium_id} not found")
+            auditorium_id, theatre_id = auditorium.id, auditorium.theatre_id
+            customer_showing.auditorium_id, customer_showing.theatre_id = auditorium_id, theatre_id
 
         cart_items = CartItems.query.filter_by(customer_id=customer_showing.customer_id).all()
         if not cart_items:
@@ -521,13 +531,14 @@ class CustomerService:
 
         applied_coupon_id = None
         applied_coupon_code = None
+        puzzle_claims = None
         discount_amount = decimal.Decimal('0.00')
 
         # Debug: log incoming coupon/puzzle payload so we can verify what the UI sent
         current_app.logger.debug(f"create_delivery called with coupon_code={coupon_code} puzzle_token_present={bool(puzzle_token)} puzzle_answer_provided={puzzle_answer is not None} skip_puzzle={skip_puzzle}")
 
         if coupon_code:
-            c = Coupons.query.filter_by(code=coupon_code, is_active=True).first()
+            c = CouponService().get_active_coupon(coupon_code)
             if not c:
                 raise ValueError('Invalid coupon code')
 
@@ -535,37 +546,19 @@ class CustomerService:
                 if not puzzle_token or puzzle_answer is None:
                     raise ValueError('Puzzle token and answer required to apply coupon')
                 try:
-                    decoded = base64.b64decode(puzzle_token.encode()).decode()
-                    if decoded.startswith('db:'):
-                        pid = int(decoded.split(':', 1)[1])
-                        puzzle = CodePuzzles.query.get(pid)
-                        if not puzzle or not puzzle.is_active:
-                            raise ValueError('Puzzle not found')
-                        expected = (puzzle.answer or '').strip()
-                        if str(puzzle_answer).strip() != expected:
-                            raise ValueError('Incorrect puzzle answer')
-                    else:
-                        rel = decoded
-                        puzzle_dir = os.path.join(current_app.root_path, 'code_puzzle')
-                        answer_path = os.path.join(puzzle_dir, rel + '.txt')
-                        if not os.path.exists(answer_path):
-                            raise ValueError('Puzzle answer file not found')
-                        with open(answer_path, 'r', encoding='utf-8') as f:
-                            expected = f.read().strip()
-                        if str(puzzle_answer).strip() != expected:
-                            raise ValueError('Incorrect puzzle answer')
-                except Exception as e:
+                    puzzle_claims = verify_puzzle_token(puzzle_token, puzzle_answer, c['code'])
+                except ValueError as e:
                     raise ValueError('Puzzle verification failed: ' + str(e))
 
-            percent = decimal.Decimal(str(float(c.discount_percent)))
+            percent = decimal.Decimal(str(float(c['discount_percent'])))
             discount_amount = (total_price * percent) / decimal.Decimal('100.00')
             # Cap discount to the total price
             if discount_amount > total_price:
                 discount_amount = total_price
 
-            applied_coupon_id = c.id
-            applied_coupon_code = c.code
-            current_app.logger.debug(f"Coupon {c.code} found: percent={percent} discount_amount={discount_amount}")
+            applied_coupon_id = c['id']
+            applied_coupon_code = c['code']
+            current_app.logger.debug(f"Coupon {c['code']} found: percent={percent} discount_amount={discount_amount}")
 
         # Handle donation - either fixed amount or percentage
         final_donation_amount = decimal.Decimal('0.00')
@@ -619,6 +612,8 @@ class CustomerService:
             customer_showing_id=customer_showing.id,
             payment_method_id=payment_method.id,
             staff_id=None,
+            auditorium_id=auditorium_id,
+            theatre_id=theatre_id,
             total_price=total_price,
             coupon_id=applied_coupon_id,
             coupon_code=applied_coupon_code,
@@ -680,7 +675,15 @@ class CustomerService:
             current_app.logger.warning(f"DEBUG: Condition failed - ngo_id={ngo_id}, final_donation_amount={final_donation_amount}, check={final_donation_amount > decimal.Decimal('0.00') if final_donation_amount else False}")
 
         self.driver_service.try_assign_driver(delivery=delivery)
-        self.staff_service.try_assign_staff(theatre_id=auditorium.theatre_id, delivery=delivery)
+        self.staff_service.try_assign_staff(theatre_id=theatre_id, delivery=delivery)
+
+        # Spend the puzzle token last so a failed checkout can be retried with it
+        if puzzle_claims is not None:
+            try:
+                consume_puzzle_token(puzzle_claims, delivery)
+            except ValueError as e:
+                db.session.rollback()
+                raise ValueError('Puzzle verification failed: ' + str(e))
 
         db.session.commit()
         return delivery
@@ -721,7 +724,7 @@ class CustomerService:
         return delivery_item
 
     def cancel_delivery(self, delivery_id):
-        """Cancel a delivery, set driver availability, and refund the balance.
+        """Cancel a delivery, free the driver and staff member, and refund the balance.
 
         Args:
             delivery_id: Delivery id to cancel.
@@ -748,6 +751,8 @@ class CustomerService:
         current_balance = payment_method.balance if isinstance(payment_method.balance, decimal.Decimal) else decimal.Decimal(str(payment_method.balance))
         payment_method.balance = current_balance + decimal.Decimal(charged)
         self.driver_service.update_driver_status(user_id=delivery.driver_id, new_status='available')
+        if delivery.staff_id and delivery.delivery_status not in ('fulfilled', 'cancelled'):
+            self.staff_service.release_staff(delivery.staff_id)
         delivery.delivery_status = 'cancelled'
         db.session.commit()
         return delivery
@@ -768,15 +773,31 @@ class CustomerService:
         driver, delivery = self.driver_service.rate_driver(delivery_id=delivery_id, new_rating=rating)
         return delivery
 
-    def show_all_products(self):
+    def show_all_products(self, sort=None, theatre_id=None):
         """List all available products across open suppliers, sorted by supplier and name.
 
+        Args:
+            sort: None for supplier/name order, or 'popular' for units sold
+                over the last POPULARITY_WINDOW_HOURS (from the hourly sales
+                rollups), best first.
+            theatre_id: With sort='popular', rank by sales at this theatre only.
+
         Returns:
-            list[Products]: All available products ordered by supplier name and product name.
+            list[Products]: All available products in the requested order.
+
+        Raises:
+            ValueError: If sort is not recognised.
         """
+        if sort not in (None, 'popular'):
+            raise ValueError("sort must be 'popular'")
         products = Products.query.join(Suppliers, Products.supplier_id == Suppliers.user_id).filter(
             Products.is_available.is_(True)
         ).order_by(Suppliers.company_name.asc(), Products.name.asc()).all()
+        if sort == 'popular':
+            from app.services.sales_rollup_service import SalesRollupService
+            hours = int(current_app.config.get('POPULARITY_WINDOW_HOURS', 168))
+            units = SalesRollupService().get_units_sold(theatre_id=theatre_id, hours=hours)
+            products.sort(key=lambda p: -units.get(('product', p.id), 0))
         return products
 
     def get_all_deliveries(self, user_id):
@@ -867,11 +888,17 @@ class CustomerService:
                 if bundle:
                     items.append({"name": bundle.name + " (Bundle)", "quantity": item.quantity})
         
-        customer_showing = CustomerShowings.query.filter_by(id=delivery.customer_showing_id).first()
-        showing = MovieShowings.query.filter_by(id=customer_showing.movie_showing_id).first()
-        movie = Movies.query.filter_by(id=showing.movie_id).first()
-        auditorium = Auditoriums.query.filter_by(id=showing.auditorium_id).first()
-        theatre = Theatres.query.filter_by(id=auditorium.theatre_id).first()
+        movie_title, showing_auditorium_id = (
+            db.session.query(Movies.title, MovieShowings.auditorium_id)
+            .join(MovieShowings, MovieShowings.movie_id == Movies.id)
+            .join(CustomerShowings, CustomerShowings.movie_showing_id == MovieShowings.id)
+            .filter(CustomerShowings.id == delivery.customer_showing_id)
+            .first()
+        )
+        theatre_id = delivery.theatre_id
+        if theatre_id is None:
+            theatre_id = db.session.query(Auditoriums.theatre_id).filter_by(id=showing_auditorium_id).scalar()
+        theatre = Theatres.query.filter_by(id=theatre_id).first()
         
         # Build donation info - always include it, even if None
         donation_info = None
@@ -892,7 +919,7 @@ class CustomerService:
             "items": items,
             "theatre_name": theatre.name,
             "theatre_address": theatre.address,
-            "movie_title": movie.title,
+            "movie_title": movie_title,
             "donation": donation_info
         }
 
@@ -0,0 +1,239 @@
+from app.models import *
+from app.app import db
+from app.services.venue_service import delivery_at_theatre
+from sqlalchemy import event, inspect, text, literal_column
+from sqlalchemy.orm import Session
+from collections import Counter
+
+# Size of a throughput bucket in seconds (15 minutes).
+THROUGHPUT_WINDOW_SECS = 900
+
+# Most throughput windows the dashboard serves (24 hours); older rows are pruned.
+THROUGHPUT_MAX_WINDOWS = 96
+
+_UPSERT_COUNTER = text("""
+    INSERT INTO theatre_delivery_counters (theatre_id, delivery_status, delivery_count)
+    VALUES (:theatre_id, :status, :delta)
+    ON DUPLICATE KEY UPDATE delivery_count = delivery_count + VALUES(delivery_count)
+""")
+
+_UPSERT_THROUGHPUT = text("""
+    INSERT INTO theatre_delivery_throughput (theatre_id, window_start, delivery_status, transition_count)
+    VALUES (:theatre_id, FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP() / :window) * :window), :status, :delta)
+    ON DUPLICATE KEY UPDATE transition_count = transition_count + VALUES(transition_count)
+""")
+
+
+class DeliveryStatsService:
+    """Service layer for theatre-level delivery dashboard aggregates.
+
+    Counts per status and per 15-minute window are kept in small counter
+    tables that are updated in the same transaction as every delivery status
+    change (see register_delivery_stats_listeners), so reading the dashboard
+    costs a handful of primary-key lookups regardless of delivery history.
+    """
+
+    def get_status_counts(self, theatre_id):
+        """Return the live number of deliveries per status at a theatre.
+
+        Args:
+            theatre_id: Theatre identifier.
+
+        Returns:
+            dict[str, int]: Status to count, including zero for unseen statuses.
+        """
+        statuses = Deliveries.__table__.c.delivery_status.type.enums
+        counts = {status: 0 for status in statuses}
+        rows = TheatreDeliveryCounters.query.filter_by(theatre_id=theatre_id).all()
+        for row in rows:
+            counts[row.delivery_status] = max(0, row.delivery_count)
+        return counts
+
+    def get_oldest_pending_age(self, theatre_id):
+        """Return how long the oldest pending delivery at a theatre has waited.
+
+        Resolved from the (theatre_id, delivery_status, date_added) index;
+        legacy rows without a theatre_id are found through their seat.
+
+        Args:
+            theatre_id: Theatre identifier.
+
+        Returns:
+            int | None: Age in seconds, or None if nothing is pending.
+        """
+        oldest = (
+            db.session.query(func.min(Deliveries.date_added))
+            .filter(delivery_at_theatre(theatre_id), Deliveries.delivery_status == 'pending')
+            .scalar()
+        )
+        if oldest is None:
+            return None
+        age = db.session.query(func.timestampdiff(literal_column('SECOND'), oldest, func.now())).scalar()
+        return max(0, int(age))
+
+    def get_throughput(self, theatre_id, windows=8):
+        """Return per-window transition counts for the most recent windows.
+
+        Args:
+            theatre_id: Theatre identifier.
+            windows: Number of 15-minute windows to return, newest last.
+
+        Returns:
+            list[dict]: One entry per window with window_start and per-status counts.
+
+        Raises:
+            ValueError: If windows is not between 1 and THROUGHPUT_MAX_WINDOWS.
+        """
+        if not isinstance(windows, int) or not 1 <= windows <= THROUGHPUT_MAX_WINDOWS:
+            raise ValueError(f"windows must be between 1 and {THROUGHPUT_MAX_WINDOWS}")
+        since = _window_start(windows)
+        rows = (
+            TheatreDeliveryThroughput.query
+            .filter(TheatreDeliveryThroughput.theatre_id == theatre_id,
+                    TheatreDeliveryThroughput.window_start >= since)
+            .order_by(TheatreDeliveryThroughput.window_start.asc())
+            .all()
+        )
+        buckets = {}
+        for row in rows:
+            bucket = buckets.setdefault(row.window_start, {})
+            bucket[row.delivery_status] = row.transition_count
+        return [
+            {"window_start": window_start.isoformat(), "counts": counts}
+            for window_start, counts in buckets.items()
+        ]
+
+    def prune_throughput(self):
+        """Delete throughput windows older than the longest range the dashboard serves.
+
+        Does not commit; the caller owns the transaction.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        return (
+            TheatreDeliveryThroughput.query
+            .filter(TheatreDeliveryThroughput.window_start < _window_start(THROUGHPUT_MAX_WINDOWS))
+            .delete(synchronize_session=False)
+        )
+
+    def get_delivery_stats(self, theatre_id, windows=8):
+        """Return the dashboard payload for a theatre.
+
+        Args:
+            theatre_id: Theatre identifier.
+            windows: Number of 15-minute throughput windows to include.
+
+        Returns:
+            dict: Counts by status, oldest pending age in seconds and throughput.
+
+        Raises:
+            ValueError: If the theatre does not exist or windows is invalid.
+        """
+        theatre = Theatres.query.filter_by(id=theatre_id).first()
+        if not theatre:
+            raise ValueError(f"Theatre {theatre_id} not found")
+        return {
+            "theatre_id": theatre.id,
+            "counts": self.get_status_counts(theatre.id),
+            "oldest_pending_age_secs": self.get_oldest_pending_age(theatre.id),
+            "throughput_window_mins": THROUGHPUT_WINDOW_SECS // 60,
+            "throughput": self.get_throughput(theatre.id, windows=windows),
+        }
+
+
+def _window_start(windows):
+    """SQL expression for the start of the oldest of the last `windows` windows."""
+    return func.from_unixtime(
+        (func.floor(func.unix_timestamp() / THROUGHPUT_WINDOW_SECS) - (windows - 1)) * THROUGHPUT_WINDOW_SECS
+    )
+
+
+def _keep_previous_status(target, value, oldvalue, initiator):
+    """No-op setter hook; registering it loads the old status before assignment."""
+    return value
+
+
+def _status_change(delivery, state):
+    """Return (old_status, new_status) for a delivery in the current flush."""
+    instance_state = inspect(delivery)
+    history = instance_state.attrs.delivery_status.history
+    if state == 'new':
+        # Read the loaded value only; the server default 'pending' applies when unset.
+        return None, instance_state.dict.get('delivery_status') or 'pending'
+    if state == 'deleted':
+        old = (history.deleted or history.unchanged or [delivery.delivery_status])[0]
+        return old, None
+    if not history.has_changes():
+        return None, None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def _theatres_for(session, deliveries):
+    """Resolve theatre ids, keyed by customer showing, for legacy deliveries without one."""
+    theatres = {}
+    showing_ids = {d.customer_showing_id for d in deliveries
+                   if d.theatre_id is None and d.customer_showing_id}
+    if showing_ids:
+        rows = (
+            session.query(CustomerShowings.id, Auditoriums.theatre_id)
+            .join(Seats, Seats.id == CustomerShowings.seat_id)
+            .join(Auditoriums, Auditoriums.id == Seats.auditorium_id)
+            .filter(CustomerShowings.id.in_(showing_ids))
+            .all()
+        )
+        theatres.update(dict(rows))
+    return theatres
+
+
+def _apply_delivery_stats(session, flush_context, instances):
+    """Fold this flush's delivery status transitions into the counter tables."""
+    changes = []
+    for state, objects in (('new', session.new), ('dirty', session.dirty), ('deleted', session.deleted)):
+        for obj in objects:
+            if isinstance(obj, Deliveries):
+                old, new = _status_change(obj, state)
+                if old != new:
+                    changes.append((obj, old, new))
+    if not changes:
+        return
+
+    theatres = _theatres_for(session, [delivery for delivery, _, _ in changes])
+    counter_deltas = Counter()
+    throughput_deltas = Counter()
+    for delivery, old, new in changes:
+        theatre_id = delivery.theatre_id or theatres.get(delivery.customer_showing_id)
+        if theatre_id is None:
+            continue
+        if old:
+            counter_deltas[(theatre_id, old)] -= 1
+        if new:
+            counter_deltas[(theatre_id, new)] += 1
+            throughput_deltas[(theatre_id, new)] += 1
+
+    connection = session.connection()
+    for (theatre_id, status), delta in counter_deltas.items():
+        if delta:
+            connection.execute(_UPSERT_COUNTER, {"theatre_id": theatre_id, "status": status, "delta": delta})
+    for (theatre_id, status), delta in throughput_deltas.items():
+        connection.execute(_UPSERT_THROUGHPUT, {"theatre_id": theatre_id, "status": status,
+                                                "window": THROUGHPUT_WINDOW_SECS, "delta": delta})
+
+
+def register_delivery_stats_listeners():
+    """Keep the dashboard counters in step with ORM delivery changes.
+
+    Runs before each flush, after the venue columns are filled (see
+    register_venue_listeners), and writes through the session's connection, so
+    counters commit or roll back together with the delivery rows. The status
+    attribute keeps its previous value on assignment (active history) so a
+    transition is counted even when the delivery was expired by a commit.
+    Bulk UPDATE/DELETE statements bypass the ORM; rebuild_delivery_stats.py
+    recomputes the tables if they drift.
+    """
+    if not event.contains(Deliveries.delivery_status, 'set', _keep_previous_status):
+        event.listen(Deliveries.delivery_status, 'set', _keep_previous_status, active_history=True, retval=True)
+    if not event.contains(Session, 'before_flush', _apply_delivery_stats):
+        event.listen(Session, 'before_flush', _apply_delivery_stats)
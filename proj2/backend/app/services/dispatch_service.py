@@ -0,0 +1,230 @@
+from app.models import *
+from app.app import db
+from app.services.driver_service import DriverService
+from app.services.staff_service import StaffService
+from app.services.delivery_stats_service import DeliveryStatsService
+from flask import current_app
+from sqlalchemy import and_, or_, literal_column
+from collections import Counter
+import threading
+
+# Default service-level agreements (minutes a delivery may sit in a status
+# without any update before the sweeper treats it as stuck).
+DEFAULT_STALE_DELIVERY_SLA_MINUTES = {'pending': 10, 'accepted': 45}
+
+# Process-wide sweeper counters, shared by the background thread and the CLI.
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+class DispatchService:
+    """Service layer for recovering stuck deliveries and re-dispatching them.
+
+    Deliveries whose driver went offline stay 'accepted' forever and keep the
+    driver 'on_delivery'; deliveries created while no driver was free stay
+    'pending'. The sweeper finds both through the (delivery_status, last_updated)
+    index, releases the driver and staff member, and puts the delivery back
+    through driver/staff assignment in small committed batches.
+    """
+
+    def __init__(self):
+        """Initialize dependent services used by dispatch operations."""
+        self.driver_service = DriverService()
+        self.staff_service = StaffService(0)
+
+    def get_slas(self):
+        """Return the configured per-status SLAs in minutes.
+
+        Returns:
+            dict[str, int]: Mapping of delivery status to allowed idle minutes.
+        """
+        slas = dict(DEFAULT_STALE_DELIVERY_SLA_MINUTES)
+        slas.update(current_app.config.get('STALE_DELIVERY_SLA_MINUTES', {}))
+        return {status: int(minutes) for status, minutes in slas.items() if minutes}
+
+    def find_stale_deliveries(self, status, sla_minutes, limit, after=None):
+        """Return one batch of deliveries stuck in a status past the SLA.
+
+        Rows are locked with SKIP LOCKED so concurrent sweepers (several web
+        workers or a cron job) never process the same delivery twice.
+
+        Args:
+            status: Delivery status to scan.
+            sla_minutes: Minutes since last_updated after which a delivery is stale.
+            limit: Maximum number of rows to return.
+            after: Optional (last_updated, id) keyset cursor from the previous batch.
+
+        Returns:
+            list[Deliveries]: Stale deliveries, oldest first.
+        """
+        cutoff = func.timestampadd(literal_column('MINUTE'), -int(sla_minutes), func.now())
+        query = Deliveries.query.filter(
+            Deliveries.delivery_status == status,
+            Deliveries.last_updated < cutoff
+        )
+        if after:
+            last_updated, last_id = after
+            query = query.filter(or_(
+                Deliveries.last_updated > last_updated,
+                and_(Deliveries.last_updated == last_updated, Deliveries.id > last_id)
+            ))
+        return (
+            query.order_by(Deliveries.last_updated.asc(), Deliveries.id.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def get_theatre_id(self, delivery):
+        """Resolve the theatre a delivery belongs to.
+
+        Args:
+            delivery: Deliveries instance.
+
+        Returns:
+            int | None: The theatre id, or None if the booking chain is broken.
+        """
+        if delivery.theatre_id is not None:
+            return delivery.theatre_id
+        theatre_id = (
+            db.session.query(Auditoriums.theatre_id)
+            .join(Seats, Seats.auditorium_id == Auditoriums.id)
+            .join(CustomerShowings, CustomerShowings.seat_id == Seats.id)
+            .filter(CustomerShowings.id == delivery.customer_showing_id)
+            .scalar()
+        )
+        return theatre_id
+
+    def release_delivery(self, delivery):
+        """Detach the driver and staff member from a stuck delivery.
+
+        The driver is moved to the configured release status (default
+        'available') and the staff member gets their delivery slot back. The
+        delivery goes back to 'pending'. Nothing is committed here.
+
+        Args:
+            delivery: Deliveries instance to release.
+
+        Returns:
+            int | None: The released driver id, if any.
+        """
+        released_driver_id = delivery.driver_id
+        if delivery.driver_id:
+            driver = Drivers.query.filter_by(user_id=delivery.driver_id).first()
+            if driver and driver.duty_status == 'on_delivery':
+                driver.duty_status = current_app.config.get('STALE_DRIVER_RELEASE_STATUS', 'available')
+                self._incr('drivers_released')
+            delivery.driver_id = None
+        if delivery.staff_id:
+            if self.staff_service.release_staff(delivery.staff_id):
+                self._incr('staff_released')
+            delivery.staff_id = None
+        delivery.delivery_status = 'pending'
+        return released_driver_id
+
+    def redispatch(self, delivery, exclude_driver_ids=None):
+        """Run a pending delivery through driver and staff assignment again.
+
+        Args:
+            delivery: Deliveries instance in 'pending' status.
+            exclude_driver_ids: Driver ids that must not be picked again.
+
+        Returns:
+            bool: True if a driver was assigned.
+        """
+        assigned = self.driver_service.try_assign_driver(delivery=delivery, exclude_ids=exclude_driver_ids)
+        if not delivery.staff_id:
+            theatre_id = self.get_theatre_id(delivery)
+            if theatre_id is not None:
+                self.staff_service.try_assign_staff(theatre_id=theatre_id, delivery=delivery)
+        return assigned
+
+    def sweep_stale_deliveries(self, batch_size=None):
+        """Recover every delivery that has exceeded its status SLA.
+
+        'accepted' deliveries are released and re-dispatched, excluding the
+        driver who timed out; 'pending' deliveries are simply retried. Each
+        batch is committed on its own so locks are held briefly.
+
+        Throughput windows older than the dashboard serves are pruned at the
+        end of each run.
+
+        Args:
+            batch_size: Rows per batch; defaults to STALE_DELIVERY_BATCH_SIZE.
+
+        Returns:
+            dict: Counts for this run (found, requeued, reassigned).
+        """
+        batch_size = int(batch_size or current_app.config.get('STALE_DELIVERY_BATCH_SIZE', 100))
+        run = Counter()
+        for status, sla_minutes in self.get_slas().items():
+            cursor = None
+            while True:
+                batch = self.find_stale_deliveries(status, sla_minutes, batch_size, after=cursor)
+                if not batch:
+                    break
+                cursor = (batch[-1].last_updated, batch[-1].id)
+                for delivery in batch:
+                    run['found'] += 1
+                    exclude = None
+                    if delivery.delivery_status != 'pending':
+                        released_driver_id = self.release_delivery(delivery)
+                        exclude = [released_driver_id] if released_driver_id else None
+                        run['requeued'] += 1
+                    if self.redispatch(delivery, exclude_driver_ids=exclude):
+                        run['reassigned'] += 1
+                db.session.commit()
+                if len(batch) < batch_size:
+                    break
+        # Piggyback retention of the dashboard throughput windows on the periodic sweep
+        self._incr('throughput_pruned', DeliveryStatsService().prune_throughput())
+        db.session.commit()
+        self._incr('runs')
+        for key, value in run.items():
+            self._incr(f'stale_{key}', value)
+        return dict(found=run['found'], requeued=run['requeued'], reassigned=run['reassigned'])
+
+    @staticmethod
+    def _incr(key, value=1):
+        with _metrics_lock:
+            _metrics[key] += value
+
+    @staticmethod
+    def get_metrics():
+        """Return a snapshot of the process-wide sweeper counters.
+
+        Returns:
+            dict[str, int]: Counter name to value.
+        """
+        with _metrics_lock:
+            return dict(_metrics)
+
+
+def start_stale_delivery_sweeper(app):
+    """Start a daemon thread that runs the stale-delivery sweep periodically.
+
+    Args:
+        app: The Flask application whose context the sweeper should run in.
+
+    Returns:
+        threading.Thread: The started sweeper thread.
+    """
+    interval = int(app.config.get('STALE_DELIVERY_SWEEP_INTERVAL_SECS', 60))
+    stop_event = threading.Event()
+
+    def run():
+        while not stop_event.wait(interval):
+            with app.app_context():
+                try:
+                    DispatchService().sweep_stale_deliveries()
+                except Exception as e:
+                    db.session.rollback()
+                    DispatchService._incr('errors')
+                    app.logger.error(f"Stale delivery sweep failed: {e}", exc_info=True)
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='stale-delivery-sweeper', daemon=True)
+    thread.stop_event = stop_event
+    thread.start()
+    return thread
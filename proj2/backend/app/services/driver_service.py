@@ -1,6 +1,7 @@
 from app.models import *
 from app.app import db
 from app.services.user_service import UserService
+from app.identity import get_role_record
 import decimal
 
 class DriverService:
@@ -26,7 +27,7 @@ class DriverService:
         Raises:
             ValueError: If no driver exists for the provided id.
         """
-        driver = Drivers.query.filter_by(user_id=user_id).first()
+        driver = get_role_record(Drivers, user_id)
         if not driver:
             raise ValueError(f"Driver {user_id} not found")
         return driver
@@ -219,6 +220,37 @@ class DriverService:
         db.session.commit()
         return driver
     
+    def create_drivers_bulk(self, rows):
+        """Create many driver users and driver records at once.
+
+        Rows take the create_driver fields and go through the same validators.
+        License plates must also be unique across the batch and existing drivers.
+
+        Args:
+            rows: List of dicts with name, email, phone, birthday, password,
+                license_plate, vehicle_type, vehicle_color, duty_status, rating
+                and total_deliveries.
+
+        Returns:
+            list[dict]: Per-row results from UserService.create_users_bulk.
+
+        Raises:
+            ValueError: If the batch itself is invalid.
+        """
+        def build_role_values(row):
+            return {
+                'license_plate': self.validate_license_plate(license_plate=row.get('license_plate')),
+                'vehicle_type': self.validate_vehicle_type(vehicle_type=row.get('vehicle_type')),
+                'vehicle_color': self.validate_vehicle_color(vehicle_color=row.get('vehicle_color')),
+                'duty_status': self.validate_duty_status(duty_status=row.get('duty_status')),
+                'rating': self.validate_rating(rating=row.get('rating')),
+                'total_deliveries': self.validate_total_deliveries(total_deliveries=row.get('total_deliveries')),
+            }
+
+        return self.user_service.create_users_bulk(
+            rows, 'driver', Drivers, build_role_values, unique_role_fields=('license_plate',)
+        )
+
     def update_driver_details(self, user_id, license_plate, vehicle_type, vehicle_color):
         """Update a driver's plate, vehicle type, and color.
 
@@ -270,16 +302,22 @@ class DriverService:
         """
         return Drivers.query.filter(Drivers.duty_status == 'available').all()
     
-    def get_best_available_driver(self):
+    def get_best_available_driver(self, exclude_ids=None):
         """Return the highest-rated available driver.
 
+        Args:
+            exclude_ids: Optional iterable of driver user ids to skip.
+
         Returns:
             Drivers | None: The best available driver or None if none available.
         """
-        best_driver = Drivers.query.filter_by(duty_status='available').order_by(Drivers.rating.desc()).first()
+        query = Drivers.query.filter_by(duty_status='available')
+        if exclude_ids:
+            query = query.filter(Drivers.user_id.notin_(list(exclude_ids)))
+        best_driver = query.order_by(Drivers.rating.desc()).first()
         return best_driver
     
-    def try_assign_driver(self, delivery):
+    def try_assign_driver(self, delivery, exclude_ids=None):
         """Assign the best available driver to a delivery.
 
         Sets delivery.driver_id, updates delivery_status to 'accepted',
@@ -287,6 +325,8 @@ class DriverService:
 
         Args:
             delivery: A Deliveries model instance to be assigned.
+            exclude_ids: Optional iterable of driver user ids that must not
+                receive this delivery (e.g. a driver who just timed out on it).
 
         Returns:
             bool: True if assignment succeeded; False if no drivers available.
@@ -296,12 +336,13 @@ class DriverService:
         """
         if not delivery:
             raise ValueError("Delievry not found")
-        driver = self.get_best_available_driver()
+        driver = self.get_best_available_driver(exclude_ids=exclude_ids)
         if not driver:
             return False
         delivery.driver_id = driver.user_id
         delivery.delivery_status = 'accepted'
-        self.update_driver_status(user_id=delivery.driver_id, new_status='on_delivery')
+        # Leave the commit to the caller so batch callers keep their row locks.
+        driver.duty_status = 'on_delivery'
         return True
     
     def delete_driver(self, user_id):
@@ -352,6 +393,12 @@ class DriverService:
         driver.duty_status = 'available'
         db.session.commit()
         db.session.refresh(delivery)
+
+        # The customer's order history changed; refresh their recommendation on next view
+        from app.services.recommendation_service import invalidate_recommendations
+        customer_id = db.session.query(CustomerShowings.customer_id).filter(
+            CustomerShowings.id == delivery.customer_showing_id).scalar()
+        invalidate_recommendations(customer_id)
         return delivery
     
     def rate_driver(self, delivery_id, new_rating):
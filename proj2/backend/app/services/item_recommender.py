@@ -0,0 +1,284 @@
+from app.models import *
+from app.app import db
+from flask import current_app
+import numpy as np
+import threading
+import time
+
+# Guards creation of the per-app recommender.
+_recommender_lock = threading.Lock()
+
+
+class ItemRecommender:
+    """Item-to-item recommender built from delivery history, with no network calls.
+
+    Items are products and bundles. The model is a co-occurrence matrix: cell
+    (i, j) counts the deliveries that contained both i and j, and the
+    diagonal counts deliveries containing i (its popularity). A customer's
+    history is turned into a count vector h and every item is scored at once
+    as C @ h, so scoring is a single matrix-vector product.
+
+    The matrix is updated incrementally: each refresh reads delivery items
+    with an id above the last one folded in, minus an overlap window so rows
+    that commit out of id order are still picked up (ids already folded are
+    skipped). Deliveries cancelled after they were folded stay counted until
+    the next full rebuild.
+    """
+
+    def __init__(self, overlap=1000):
+        """Create an empty model.
+
+        Args:
+            overlap: How many delivery item ids behind the last one folded in
+                each refresh re-reads.
+        """
+        # (index, items, matrix) is replaced as a whole so scoring never sees a half-applied refresh
+        self._state = ({}, [], np.zeros((0, 0), dtype=np.float32))
+        self.overlap = overlap
+        self.last_delivery_item_id = 0
+        # Ids folded in within the overlap window, so re-reading them does not count them twice
+        self._recent_ids = set()
+        self.refreshed_at = None
+        self.built_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, batch_size=5000):
+        """Fold delivery items added since the last refresh into the matrix.
+
+        Cancelled deliveries are skipped. Rows are read in id order, batch_size
+        at a time, starting overlap ids behind the last one folded in; each
+        batch becomes a delivery x item incidence matrix B and the update is
+        C += B.T @ B.
+
+        Args:
+            batch_size: Delivery items read per query.
+
+        Returns:
+            int: Number of delivery items folded in.
+        """
+        with self._lock:
+            folded = 0
+            after = max(0, self.last_delivery_item_id - self.overlap)
+            while True:
+                rows = (
+                    db.session.query(DeliveryItems.id, DeliveryItems.delivery_id,
+                                     CartItems.product_id, CartItems.bundle_id)
+                    .join(CartItems, CartItems.id == DeliveryItems.cart_item_id)
+                    .join(Deliveries, Deliveries.id == DeliveryItems.delivery_id)
+                    .filter(DeliveryItems.id > after,
+                            Deliveries.delivery_status != 'cancelled')
+                    .order_by(DeliveryItems.id.asc())
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                full = len(rows) == batch_size
+                if full:
+                    # Leave the last delivery for the next batch so its items are folded together
+                    whole = [row for row in rows if row[1] != rows[-1][1]]
+                    rows = whole or rows
+                after = rows[-1][0]
+                new = [row for row in rows if row[0] not in self._recent_ids]
+                if new:
+                    self._fold(new)
+                    folded += len(new)
+                    self._recent_ids.update(row[0] for row in new)
+                self.last_delivery_item_id = max(self.last_delivery_item_id, after)
+                if not full:
+                    break
+            floor = self.last_delivery_item_id - self.overlap
+            self._recent_ids = {item_id for item_id in self._recent_ids if item_id > floor}
+            self.refreshed_at = time.monotonic()
+            return folded
+
+    def rebuild(self, batch_size=5000):
+        """Rebuild the matrix from the whole delivery history.
+
+        Drops counts from deliveries cancelled after they were folded in. The
+        new model is built aside and swapped in, so scoring keeps using the
+        old one meanwhile.
+
+        Args:
+            batch_size: Delivery items read per query.
+
+        Returns:
+            int: Number of delivery items folded in.
+        """
+        fresh = ItemRecommender(overlap=self.overlap)
+        folded = fresh.refresh(batch_size=batch_size)
+        with self._lock:
+            self._state = fresh._state
+            self.last_delivery_item_id = fresh.last_delivery_item_id
+            self._recent_ids = fresh._recent_ids
+            self.refreshed_at = self.built_at = time.monotonic()
+        return folded
+
+    def fit(self, rows):
+        """Fold the given delivery item rows into the matrix, without reading the database.
+
+        Used to train on a chosen subset of history, e.g. the training split
+        of an offline evaluation.
+
+        Args:
+            rows: (delivery item id, delivery id, product id, bundle id) tuples;
+                all items of a delivery must be in the same call.
+        """
+        with self._lock:
+            self._fold(rows)
+
+    def _fold(self, rows):
+        index, items, matrix = self._state
+        index, items = dict(index), list(items)
+        deliveries = {}
+        for _, delivery_id, product_id, bundle_id in rows:
+            key = ('product', product_id) if product_id else ('bundle', bundle_id)
+            if key not in index:
+                index[key] = len(items)
+                items.append(key)
+            deliveries.setdefault(delivery_id, set()).add(index[key])
+
+        size = len(items)
+        incidence = np.zeros((len(deliveries), size), dtype=np.float32)
+        for row, positions in enumerate(deliveries.values()):
+            incidence[row, list(positions)] = 1.0
+        updated = incidence.T @ incidence
+        updated[:matrix.shape[0], :matrix.shape[1]] += matrix
+        self._state = (index, items, updated)
+
+    @property
+    def items(self):
+        """Item keys ('product' | 'bundle', id) known to the model."""
+        return self._state[1]
+
+    def popularity(self):
+        """Return how many deliveries contained each known item.
+
+        Returns:
+            dict: Item key ('product' | 'bundle', id) to delivery count.
+        """
+        _, items, matrix = self._state
+        counts = np.diagonal(matrix)
+        return {key: float(counts[i]) for i, key in enumerate(items)}
+
+    def score(self, history, exclude_history=True):
+        """Score every known item against a customer's history.
+
+        Args:
+            history: dict mapping item key ('product' | 'bundle', id) to how
+                often the customer ordered it.
+            exclude_history: Drop items the customer already ordered.
+
+        Returns:
+            list[tuple]: (item key, score) pairs, best first. New customers
+            get items ranked by popularity.
+        """
+        index, items, matrix = self._state
+        if not items:
+            return []
+        vector = np.zeros(len(items), dtype=np.float32)
+        for key, count in history.items():
+            position = index.get(key)
+            if position is not None:
+                vector[position] = count
+
+        if vector.any():
+            scores = matrix @ vector
+            if exclude_history:
+                scores[vector > 0] = 0.0
+        else:
+            scores = np.diagonal(matrix).copy()
+
+        order = np.argsort(-scores, kind='stable')
+        return [(items[i], float(scores[i])) for i in order if scores[i] > 0]
+
+
+def get_item_recommender():
+    """Return the current app's item recommender, refreshing it when due.
+
+    A full rebuild runs at most every ITEM_RECOMMENDER_REBUILD_SECS seconds;
+    in between the model is refreshed incrementally at most every
+    ITEM_RECOMMENDER_REFRESH_SECS seconds.
+
+    Returns:
+        ItemRecommender: The recommender stored in app.extensions.
+    """
+    recommender = current_app.extensions.get('item_recommender')
+    if recommender is None:
+        with _recommender_lock:
+            recommender = current_app.extensions.get('item_recommender')
+            if recommender is None:
+                recommender = current_app.extensions['item_recommender'] = ItemRecommender(
+                    overlap=int(current_app.config.get('ITEM_RECOMMENDER_OVERLAP_ROWS', 1000)))
+    now = time.monotonic()
+    rebuild_interval = int(current_app.config.get('ITEM_RECOMMENDER_REBUILD_SECS', 3600))
+    interval = int(current_app.config.get('ITEM_RECOMMENDER_REFRESH_SECS', 60))
+    if recommender.built_at is None or now - recommender.built_at >= rebuild_interval:
+        recommender.rebuild()
+    elif now - recommender.refreshed_at >= interval:
+        recommender.refresh()
+    return recommender
+
+
+def get_customer_item_history(user_id):
+    """Return how often a customer ordered each product and bundle.
+
+    Args:
+        user_id: Customer's user id.
+
+    Returns:
+        dict: Item key ('product' | 'bundle', id) to order count.
+    """
+    rows = (
+        db.session.query(CartItems.product_id, CartItems.bundle_id, func.count(DeliveryItems.id))
+        .join(DeliveryItems, DeliveryItems.cart_item_id == CartItems.id)
+        .join(Deliveries, Deliveries.id == DeliveryItems.delivery_id)
+        .join(CustomerShowings, CustomerShowings.id == Deliveries.customer_showing_id)
+        .filter(CustomerShowings.customer_id == user_id, Deliveries.delivery_status != 'cancelled')
+        .group_by(CartItems.product_id, CartItems.bundle_id)
+        .all()
+    )
+    return {(('product', product_id) if product_id else ('bundle', bundle_id)): count
+            for product_id, bundle_id, count in rows}
+
+
+def recommend_items(user_id, limit=5):
+    """Recommend available menu items for a customer from delivery co-occurrence.
+
+    Args:
+        user_id: Customer's user id.
+        limit: Maximum number of items returned.
+
+    Returns:
+        list[dict]: Items with type, id, name, category, price and reason, best first.
+    """
+    history = get_customer_item_history(user_id)
+    ranked = []
+    if not history:
+        # New customers get what is selling now, read from the hourly rollups
+        from app.services.sales_rollup_service import SalesRollupService
+        hours = int(current_app.config.get('POPULARITY_WINDOW_HOURS', 168))
+        top = SalesRollupService().get_top_sellers(hours=hours, limit=limit * 4)
+        ranked = [((row['item_type'], row['item_id']), float(row['units_sold'])) for row in top]
+    if not ranked:
+        ranked = get_item_recommender().score(history)
+
+    product_ids = [item_id for (kind, item_id), _ in ranked if kind == 'product']
+    bundle_ids = [item_id for (kind, item_id), _ in ranked if kind == 'bundle']
+    products = {p.id: p for p in Products.query.filter(Products.id.in_(product_ids), Products.is_available.is_(True))} if product_ids else {}
+    bundles = {b.id: b for b in SnackBundles.query.filter(SnackBundles.id.in_(bundle_ids), SnackBundles.is_available.is_(True))} if bundle_ids else {}
+
+    reason = "Often ordered with your usual picks" if history else "Popular with other moviegoers"
+    results = []
+    for (kind, item_id), _ in ranked:
+        if kind == 'product' and item_id in products:
+            product = products[item_id]
+            results.append({"type": "product", "id": product.id, "name": product.name,
+                            "category": product.category, "price": float(product.unit_price), "reason": reason})
+        elif kind == 'bundle' and item_id in bundles:
+            bundle = bundles[item_id]
+            results.append({"type": "bundle", "id": bundle.id, "name": bundle.name,
+                            "category": "bundle", "price": float(bundle.total_price), "reason": reason})
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,239 @@
+from flask import current_app
+from mistralai import Mistral
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from abc import ABC, abstractmethod
+import httpx
+import threading
+import time
+
+# Guards creation of the per-app LLM gateway.
+_gateway_lock = threading.Lock()
+
+
+class LLMUnavailable(Exception):
+    """Raised when an LLM call is skipped, rejected, times out or fails."""
+
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing, then probes it again later.
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call is refused for reset_timeout seconds. The first call after that is
+    let through as a probe (half-open): success closes the breaker, failure
+    opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """Create a closed breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker.
+            reset_timeout: Seconds the breaker stays open before a probe.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half_open'."""
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self):
+        """Return True if a call may go out now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        """Close the breaker and reset the failure count."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """Count a failure, opening the breaker at the threshold or on a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class RecommendationBackend(ABC):
+    """Interface for the model that writes recommendation text."""
+
+    @abstractmethod
+    def complete(self, prompt, timeout):
+        """Return the model's raw reply to prompt.
+
+        Args:
+            prompt: Full prompt text.
+            timeout: Seconds the call may take.
+        """
+
+    def close(self):
+        """Release connections held by the backend."""
+
+
+class MistralBackend(RecommendationBackend):
+    """Mistral chat completions over one long-lived, pooled HTTP client."""
+
+    def __init__(self, api_key, model="mistral-medium", server_url=None, timeout=8.0, max_connections=20):
+        """Create the client.
+
+        Args:
+            api_key: Mistral API key.
+            model: Model name.
+            server_url: Override for the API base URL (e.g. fake_llm_server.py).
+            timeout: Default per-call timeout in seconds.
+            max_connections: Size of the HTTP connection pool.
+        """
+        self.model = model
+        self._http = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.client = Mistral(api_key=api_key, server_url=server_url, client=self._http,
+                              timeout_ms=int(timeout * 1000))
+
+    def complete(self, prompt, timeout):
+        response = self.client.chat.complete(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            timeout_ms=int(timeout * 1000),
+        )
+        return response.choices[0].message.content
+
+    def close(self):
+        self._http.close()
+
+
+class LLMGateway:
+    """Runs backend calls off the request thread with a deadline, a breaker and coalescing.
+
+    Calls run on a small thread pool and callers wait at most timeout
+    seconds for the reply. Concurrent calls with the same key share one
+    in-flight request. Calls are refused without waiting while the breaker
+    is open or when workers + queue_size calls are already pending.
+    """
+
+    def __init__(self, backend, timeout=8.0, workers=8, queue_size=16, breaker=None):
+        """Create the gateway.
+
+        Args:
+            backend: RecommendationBackend doing the actual call.
+            timeout: Default deadline in seconds.
+            workers: Threads making backend calls.
+            queue_size: Calls allowed to wait for a free thread.
+            breaker: CircuitBreaker, defaults to a new one.
+        """
+        self.backend = backend
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._inflight = {}
+        # Reentrant: a call that finishes immediately runs its done callback under this lock
+        self._lock = threading.RLock()
+
+    def call(self, key, prompt, timeout=None):
+        """Return the backend's reply, sharing the call with concurrent callers of the same key.
+
+        Args:
+            key: Coalescing key, e.g. the customer's user id.
+            prompt: Prompt sent when this caller starts the call.
+            timeout: Deadline in seconds, defaults to the gateway's.
+
+        Raises:
+            LLMUnavailable: If the breaker is open, the gateway is saturated,
+                the deadline passes or the backend fails.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    raise LLMUnavailable("LLM gateway is busy")
+                if not self.breaker.allow():
+                    self._slots.release()
+                    raise LLMUnavailable("LLM circuit is open")
+                try:
+                    future = self._executor.submit(self._call, prompt, timeout)
+                except BaseException:
+                    self._slots.release()
+                    raise
+                self._inflight[key] = future
+                future.add_done_callback(lambda done: self._finish(key, done))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise LLMUnavailable(f"LLM did not answer within {timeout}s")
+        except Exception as e:
+            raise LLMUnavailable(str(e)) from e
+
+    def _call(self, prompt, timeout):
+        started = time.monotonic()
+        try:
+            reply = self.backend.complete(prompt, timeout)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        # A reply that came back after the deadline counts against the backend
+        if time.monotonic() - started > timeout:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return reply
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        self._slots.release()
+
+    def shutdown(self):
+        """Stop the worker threads and close the backend's connections."""
+        self._executor.shutdown(wait=False)
+        self.backend.close()
+
+
+def get_llm_gateway(api_key, model):
+    """Return the current app's LLM gateway, creating it from config on first use.
+
+    Args:
+        api_key: Mistral API key used when the gateway is first created.
+        model: Model name used when the gateway is first created.
+
+    Returns:
+        LLMGateway: The gateway stored in app.extensions.
+    """
+    gateway = current_app.extensions.get('llm_gateway')
+    if gateway is None:
+        with _gateway_lock:
+            gateway = current_app.extensions.get('llm_gateway')
+            if gateway is None:
+                config = current_app.config
+                timeout = float(config.get('LLM_TIMEOUT_SECS', 8))
+                backend = MistralBackend(api_key, model=model, server_url=config.get('MISTRAL_SERVER_URL'),
+                                         timeout=timeout, max_connections=int(config.get('LLM_MAX_CONNECTIONS', 20)))
+                breaker = CircuitBreaker(failure_threshold=int(config.get('LLM_BREAKER_FAILURES', 5)),
+                                         reset_timeout=float(config.get('LLM_BREAKER_RESET_SECS', 30)))
+                gateway = current_app.extensions['llm_gateway'] = LLMGateway(
+                    backend, timeout=timeout, workers=int(config.get('LLM_WORKERS', 8)),
+                    queue_size=int(config.get('LLM_QUEUE_SIZE', 16)), breaker=breaker)
+    return gateway
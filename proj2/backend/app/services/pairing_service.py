@@ -0,0 +1,293 @@
+from app.models import *
+from app.app import db
+from flask import current_app
+import numpy as np
+import re
+import threading
+import time
+
+# Guards creation of the per-app pairing index.
+_index_lock = threading.Lock()
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'of', 'in', 'on', 'with', 'for', 'to', 'or', 'by', 'at', 'from'})
+
+
+def _tokens(*fields):
+    """Lowercase word tokens of the given text fields, without stopwords."""
+    words = []
+    for field in fields:
+        if field:
+            words.extend(word for word in _TOKEN.findall(str(field).lower()) if word not in _STOPWORDS)
+    return words
+
+
+def _movie_doc(movie):
+    return _tokens(movie.genre, movie.genre, movie.keywords)
+
+
+def _product_doc(product):
+    return _tokens(product.name, product.category, product.keywords)
+
+
+class PairingIndex:
+    """Movie-to-snack pairings from TF-IDF keyword similarity.
+
+    Movies (genre, weighted twice, and keywords) and available products
+    (name, category and keywords) are embedded as L2-normalised TF-IDF
+    vectors over a shared vocabulary. Their cosine similarities are one
+    matrix product, and the top-K products per movie are kept in a dict, so a
+    lookup does no maths at all.
+
+    Catalog edits are folded in incrementally: a changed movie recomputes
+    its row, a changed product its column, reusing the vocabulary and IDF of
+    the last full build. An edit that brings in an unseen word triggers a
+    full rebuild, as does the periodic refresh, which also corrects IDF drift.
+    """
+
+    def __init__(self, top_k=10):
+        """Create an empty index.
+
+        Args:
+            top_k: Pairings kept per movie.
+        """
+        self.top_k = top_k
+        self._state = None
+        self._pending = set()
+        # _lock guards _pending and the state swap; _update_lock serializes
+        # build and apply_pending so one writer's state never overwrites another's
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self.built_at = None
+
+    def build(self):
+        """Rebuild the whole index from the catalog (two queries)."""
+        with self._update_lock:
+            self._build()
+
+    def _build(self):
+        # Edits queued after this point may not be in the queries below, so they stay pending
+        with self._lock:
+            covered = set(self._pending)
+        movies = Movies.query.all()
+        products = Products.query.filter_by(is_available=True).all()
+        movie_docs = [_movie_doc(m) for m in movies]
+        product_docs = [_product_doc(p) for p in products]
+
+        docs = movie_docs + product_docs
+        vocab = {word: i for i, word in enumerate(sorted({word for doc in docs for word in doc}))}
+        df = np.zeros(len(vocab), dtype=np.float32)
+        for doc in docs:
+            df[[vocab[word] for word in set(doc)]] += 1
+        idf = np.log((1 + len(docs)) / (1 + df)) + 1
+
+        state = {'vocab': vocab, 'idf': idf}
+        state['movie_ids'] = [m.id for m in movies]
+        state['movies'] = self._vectorize(state, movie_docs)
+        state['product_ids'] = [p.id for p in products]
+        state['products'] = self._vectorize(state, product_docs)
+        state['info'] = {p.id: self._product_info(p) for p in products}
+        state['similarity'] = state['movies'] @ state['products'].T
+        state['top'] = self._rank(state)
+        with self._lock:
+            self._state = state
+            self._pending -= covered
+            self.built_at = time.monotonic()
+
+    @staticmethod
+    def _product_info(product):
+        return {'type': 'product', 'id': product.id, 'name': product.name,
+                'category': product.category, 'price': float(product.unit_price)}
+
+    @staticmethod
+    def _vectorize(state, docs):
+        """Turn token lists into L2-normalised sublinear TF-IDF rows."""
+        vocab, idf = state['vocab'], state['idf']
+        counts = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            np.add.at(counts[row], [vocab[word] for word in doc], 1.0)
+        weights = np.where(counts > 0, 1.0 + np.log(np.maximum(counts, 1.0)), 0.0) * idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        return (weights / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+    def _rank(self, state, rows=None):
+        """Return {movie_id: [(product_id, score), ...]} for the given similarity rows (default all)."""
+        similarity, product_ids = state['similarity'], state['product_ids']
+        rows = range(len(state['movie_ids'])) if rows is None else rows
+        top = {}
+        k = min(self.top_k, len(product_ids))
+        for row in rows:
+            scores = similarity[row]
+            if k == 0:
+                top[state['movie_ids'][row]] = []
+                continue
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best], kind='stable')]
+            top[state['movie_ids'][row]] = [(product_ids[i], float(scores[i])) for i in best if scores[i] > 0]
+        return top
+
+    def mark_changed(self, kind, item_id):
+        """Queue a catalog edit ('movie' or 'product') to fold in on the next lookup."""
+        with self._lock:
+            self._pending.add((kind, item_id))
+
+    def apply_pending(self):
+        """Fold queued edits into the index, rebuilding fully if one introduces a new word.
+
+        Edits are dequeued only once the new state is published, so an edit
+        queued while another thread folds is picked up by the next call.
+        """
+        # Unlocked peek so lookups with nothing queued never wait on a fold
+        if not self._pending:
+            return
+        with self._update_lock:
+            with self._lock:
+                pending = set(self._pending)
+            if not pending or self._state is None:
+                return
+            state = dict(self._state)
+            for kind, item_id in sorted(pending):
+                if kind == 'movie':
+                    ok = self._update_movie(state, item_id)
+                else:
+                    ok = self._update_product(state, item_id)
+                if not ok:
+                    self._build()
+                    return
+            state['top'] = self._rank(state)
+            with self._lock:
+                self._state = state
+                self._pending -= pending
+
+    def _update_movie(self, state, movie_id):
+        movie = Movies.query.filter_by(id=movie_id).first()
+        ids = list(state['movie_ids'])
+        row = ids.index(movie_id) if movie_id in ids else None
+        if movie is None:
+            if row is not None:
+                del ids[row]
+                state['movies'] = np.delete(state['movies'], row, axis=0)
+                state['similarity'] = np.delete(state['similarity'], row, axis=0)
+            state['movie_ids'] = ids
+            return True
+        doc = _movie_doc(movie)
+        if any(word not in state['vocab'] for word in doc):
+            return False
+        vector = self._vectorize(state, [doc])
+        scores = vector @ state['products'].T
+        if row is None:
+            ids.append(movie_id)
+            state['movies'] = np.vstack([state['movies'], vector])
+            state['similarity'] = np.vstack([state['similarity'], scores])
+        else:
+            state['movies'] = state['movies'].copy()
+            state['movies'][row] = vector[0]
+            state['similarity'] = state['similarity'].copy()
+            state['similarity'][row] = scores[0]
+        state['movie_ids'] = ids
+        return True
+
+    def _update_product(self, state, product_id):
+        product = Products.query.filter_by(id=product_id).first()
+        ids = list(state['product_ids'])
+        column = ids.index(product_id) if product_id in ids else None
+        info = dict(state['info'])
+        if product is None or not product.is_available:
+            if column is not None:
+                del ids[column]
+                info.pop(product_id, None)
+                state['products'] = np.delete(state['products'], column, axis=0)
+                state['similarity'] = np.delete(state['similarity'], column, axis=1)
+            state['product_ids'], state['info'] = ids, info
+            return True
+        doc = _product_doc(product)
+        if any(word not in state['vocab'] for word in doc):
+            return False
+        vector = self._vectorize(state, [doc])
+        scores = state['movies'] @ vector.T
+        if column is None:
+            ids.append(product_id)
+            state['products'] = np.vstack([state['products'], vector])
+            state['similarity'] = np.hstack([state['similarity'], scores])
+        else:
+            state['products'] = state['products'].copy()
+            state['products'][column] = vector[0]
+            state['similarity'] = state['similarity'].copy()
+            state['similarity'][:, column] = scores[:, 0]
+        info[product_id] = self._product_info(product)
+        state['product_ids'], state['info'] = ids, info
+        return True
+
+    def pairings(self, movie_id, limit=5):
+        """Return the best-matching products for a movie.
+
+        Args:
+            movie_id: Movie primary key.
+            limit: Maximum number of products returned (at most top_k).
+
+        Returns:
+            list[dict]: Product type/id/name/category/price plus score, best first.
+        """
+        state = self._state
+        if state is None:
+            return []
+        return [dict(state['info'][product_id], score=round(score, 4))
+                for product_id, score in state['top'].get(movie_id, [])[:limit]]
+
+
+def get_pairing_index():
+    """Return the current app's pairing index, built on first use and folded up to date.
+
+    A full rebuild runs at most every PAIRING_REBUILD_SECS seconds; edits
+    queued by mark_pairings_changed are applied incrementally in between.
+
+    Returns:
+        PairingIndex: The index stored in app.extensions.
+    """
+    index = current_app.extensions.get('pairing_index')
+    if index is None:
+        with _index_lock:
+            index = current_app.extensions.get('pairing_index')
+            if index is None:
+                index = current_app.extensions['pairing_index'] = PairingIndex(
+                    top_k=int(current_app.config.get('PAIRING_TOP_K', 10)))
+    interval = int(current_app.config.get('PAIRING_REBUILD_SECS', 3600))
+    if index.built_at is None or time.monotonic() - index.built_at >= interval:
+        index.build()
+    else:
+        index.apply_pending()
+    return index
+
+
+def mark_pairings_changed(kind, item_id):
+    """Tell the pairing index a movie or product was added, edited or removed.
+
+    Args:
+        kind: 'movie' or 'product'.
+        item_id: Its primary key.
+    """
+    index = current_app.extensions.get('pairing_index')
+    if index is not None:
+        index.mark_changed(kind, item_id)
+
+
+def get_showing_pairings(showing_id, limit=5):
+    """Return snack pairings for the movie of a showing, without any LLM call.
+
+    Args:
+        showing_id: MovieShowings primary key.
+        limit: Maximum number of products returned.
+
+    Returns:
+        dict: showing_id, movie_id and the list of pairings.
+
+    Raises:
+        ValueError: If the showing does not exist or limit is invalid.
+    """
+    if not isinstance(limit, int) or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    movie_id = db.session.query(MovieShowings.movie_id).filter(MovieShowings.id == showing_id).scalar()
+    if movie_id is None:
+        raise ValueError(f"Showing {showing_id} not found")
+    return {'showing_id': showing_id, 'movie_id': movie_id,
+            'pairings': get_pairing_index().pairings(movie_id, limit=limit)}
@@ -0,0 +1,239 @@
+from app.models import *
+from app.app import db
+from app.services.item_recommender import ItemRecommender
+from app.services.llm_backend import LLMUnavailable, RecommendationBackend
+from app.services.recommendation_service import RecommendationService, _estimate_tokens
+from abc import ABC, abstractmethod
+from collections import Counter
+import json
+import math
+import time
+
+
+class EvalDataset:
+    """Delivery history split into training orders and one held-out order per customer.
+
+    Each customer's most recent non-cancelled delivery with items is held
+    out; everything before it is their history. Training rows (used to fit
+    local models) are every delivery that is not held out, so nothing a
+    backend is scored on leaks into what it learns from.
+    """
+
+    def __init__(self, min_history=1):
+        """Load the dataset in one query.
+
+        Args:
+            min_history: Earlier orders a customer needs to be evaluated.
+        """
+        rows = (
+            db.session.query(DeliveryItems.id, DeliveryItems.delivery_id, Deliveries.date_added,
+                             CustomerShowings.customer_id, CartItems.product_id, CartItems.bundle_id)
+            .join(Deliveries, Deliveries.id == DeliveryItems.delivery_id)
+            .join(CustomerShowings, CustomerShowings.id == Deliveries.customer_showing_id)
+            .join(CartItems, CartItems.id == DeliveryItems.cart_item_id)
+            .filter(Deliveries.delivery_status != 'cancelled')
+            .order_by(DeliveryItems.delivery_id.asc(), DeliveryItems.id.asc())
+            .all()
+        )
+        orders = {}
+        for item_id, delivery_id, date_added, customer_id, product_id, bundle_id in rows:
+            key = ('product', product_id) if product_id else ('bundle', bundle_id)
+            customer_orders = orders.setdefault(customer_id, {})
+            order = customer_orders.setdefault(delivery_id, {'date': date_added, 'items': []})
+            order['items'].append(key)
+
+        self.customers = {}
+        held_out = set()
+        for customer_id, customer_orders in orders.items():
+            delivery_ids = list(customer_orders)
+            if len(delivery_ids) - 1 < min_history:
+                continue
+            last = delivery_ids[-1]
+            held_out.add(last)
+            self.customers[customer_id] = {
+                'history': [customer_orders[d] for d in delivery_ids[:-1]],
+                'target': set(customer_orders[last]['items']),
+            }
+        self.training_rows = [(item_id, delivery_id, product_id, bundle_id)
+                              for item_id, delivery_id, _, _, product_id, bundle_id in rows
+                              if delivery_id not in held_out]
+
+        self.names = {('product', p.id): (p.name, p.category) for p in Products.query.all()}
+        self.names.update({('bundle', b.id): (b.name, 'Bundle') for b in SnackBundles.query.all()})
+        self.catalog = set(self.names)
+
+    def history_counts(self, customer_id):
+        """Return item key -> times ordered in the customer's history."""
+        return Counter(key for order in self.customers[customer_id]['history'] for key in order['items'])
+
+    def order_history(self, customer_id):
+        """Return the customer's history in RecommendationService's prompt format."""
+        return [{
+            'date': order['date'].isoformat() if order['date'] else "Unknown",
+            'items': [f"{self.names[key][0]} ({self.names[key][1]})" for key in order['items'] if key in self.names],
+        } for order in self.customers[customer_id]['history']]
+
+
+class EvalBackend(ABC):
+    """A recommender under evaluation: fit on training data, then rank items per customer."""
+
+    name = 'base'
+
+    def fit(self, dataset):
+        """Learn from dataset.training_rows."""
+
+    @abstractmethod
+    def recommend(self, dataset, customer_id, k):
+        """Return up to k item keys, best first, and the tokens spent (0 for local models).
+
+        Returns:
+            tuple: (list of item keys, (prompt tokens, completion tokens)).
+        """
+
+
+class PopularityBackend(EvalBackend):
+    """Most-delivered items the customer has not ordered before."""
+
+    name = 'popular'
+
+    def fit(self, dataset):
+        self.model = ItemRecommender()
+        self.model.fit(dataset.training_rows)
+
+    def recommend(self, dataset, customer_id, k):
+        seen = dataset.history_counts(customer_id)
+        ranked = self.model.score({})
+        return [key for key, _ in ranked if key not in seen][:k], (0, 0)
+
+
+class CoOccurrenceBackend(EvalBackend):
+    """The local item-to-item recommender (RECOMMENDATION_BACKEND='local')."""
+
+    name = 'local'
+
+    def __init__(self, exclude_history=False):
+        self.exclude_history = exclude_history
+
+    def fit(self, dataset):
+        self.model = ItemRecommender()
+        self.model.fit(dataset.training_rows)
+
+    def recommend(self, dataset, customer_id, k):
+        ranked = self.model.score(dataset.history_counts(customer_id), exclude_history=self.exclude_history)
+        return [key for key, _ in ranked[:k]], (0, 0)
+
+
+class StubLLMBackend(RecommendationBackend):
+    """Offline stand-in for the LLM: recommends the first menu items in the prompt."""
+
+    def __init__(self, picks=3, delay=0.0):
+        self.picks = picks
+        self.delay = delay
+
+    def complete(self, prompt, timeout):
+        time.sleep(self.delay)
+        products = next((line[len("Products: "):] for line in prompt.splitlines() if line.startswith("Products: ")), "")
+        names = [item.rsplit(" ($", 1)[0] for item in products.split(", ") if item][:self.picks]
+        return json.dumps({"recommendations": "You might enjoy " + ", ".join(names) + "!"})
+
+
+class LLMPromptBackend(EvalBackend):
+    """The LLM path: RecommendationService's prompt, sent through an LLMGateway.
+
+    The reply is prose, so recommended items are the menu items it names,
+    in the order they are mentioned.
+    """
+
+    name = 'llm'
+
+    def __init__(self, gateway, timeout=None):
+        """Create the backend.
+
+        Args:
+            gateway: LLMGateway wrapping the real or stub backend.
+            timeout: Per-call deadline, defaults to the gateway's.
+        """
+        self.gateway = gateway
+        self.timeout = timeout
+        # Only the prompt builders are used; the key is never sent anywhere from here
+        self.service = RecommendationService(api_key='offline-eval')
+
+    def fit(self, dataset):
+        # Rank the menu from the training split only, like the local backends
+        model = ItemRecommender()
+        model.fit(dataset.training_rows)
+        self.menu_data = self.service._get_menu_items(popularity=model.popularity())
+        self.menu_data['section'] = self.service._render_menu_section(self.menu_data)
+
+    def recommend(self, dataset, customer_id, k):
+        prompt = self.service._format_prompt(self.menu_data, dataset.order_history(customer_id))
+        try:
+            reply = self.gateway.call(customer_id, prompt, timeout=self.timeout)
+        except LLMUnavailable:
+            return [], (_estimate_tokens(prompt), 0)
+        try:
+            text = json.loads(reply).get('recommendations', '')
+        except (json.JSONDecodeError, AttributeError):
+            text = reply
+        lowered = text.lower()
+        mentioned = sorted((lowered.find(name.lower()), key) for key, (name, _) in dataset.names.items()
+                           if name and name.lower() in lowered)
+        return [key for _, key in mentioned][:k], (_estimate_tokens(prompt), _estimate_tokens(reply))
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def evaluate(backend, dataset, k=5, input_price_per_1m=0.0, output_price_per_1m=0.0, limit=None):
+    """Replay held-out orders against a backend and report its metrics.
+
+    Args:
+        backend: EvalBackend to evaluate.
+        dataset: EvalDataset to replay.
+        k: Recommendations scored per customer.
+        input_price_per_1m: Price per million prompt tokens.
+        output_price_per_1m: Price per million completion tokens.
+        limit: Evaluate at most this many customers.
+
+    Returns:
+        dict: users, hit_rate_at_k, coverage, latency_ms (p50/p95/p99/mean)
+        and cost_per_1k_users.
+    """
+    backend.fit(dataset)
+    customer_ids = sorted(dataset.customers)[:limit] if limit else sorted(dataset.customers)
+    hits = 0
+    recommended = set()
+    latencies = []
+    prompt_tokens = completion_tokens = 0
+    for customer_id in customer_ids:
+        started = time.perf_counter()
+        items, (tokens_in, tokens_out) = backend.recommend(dataset, customer_id, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        items = items[:k]
+        prompt_tokens += tokens_in
+        completion_tokens += tokens_out
+        recommended.update(items)
+        if dataset.customers[customer_id]['target'] & set(items):
+            hits += 1
+
+    users = len(customer_ids)
+    cost = (prompt_tokens * input_price_per_1m + completion_tokens * output_price_per_1m) / 1_000_000
+    return {
+        'backend': backend.name,
+        'users': users,
+        'k': k,
+        'hit_rate_at_k': hits / users if users else 0.0,
+        'coverage': len(recommended) / len(dataset.catalog) if dataset.catalog else 0.0,
+        'latency_ms': {
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'mean': sum(latencies) / users if users else 0.0,
+        },
+        'cost_per_1k_users': cost * 1000 / users if users else 0.0,
+    }
@@ -1,96 +1,235 @@
 from app.models import *
 from app.app import db
-from mistralai import Mistral
+from app.cache import get_cache
+from app.services.item_recommender import get_item_recommender, recommend_items
+from app.services.llm_backend import LLMUnavailable, get_llm_gateway
+from flask import current_app
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from collections import Counter
+import hashlib
 import os
 import json
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Most recent orders included in the LLM prompt.
+HISTORY_ORDER_LIMIT = 5
+
+_UPSERT_RECOMMENDATION = text("""
+    INSERT INTO customer_recommendations (user_id, recommendation, menu_version, generated_at)
+    VALUES (:user_id, :recommendation, :menu_version, :generated_at)
+    ON DUPLICATE KEY UPDATE recommendation = VALUES(recommendation),
+        menu_version = VALUES(menu_version), generated_at = VALUES(generated_at)
+""")
+
+# Guards the set of users whose recommendation is being refreshed, and creation of the refresh pool.
+_refresh_lock = threading.Lock()
+
+
+def _estimate_tokens(text):
+    # Roughly four characters per token for English text; avoids shipping a tokenizer
+    return (len(text) + 3) // 4
+
+
+def _refresh_pool(app):
+    """Return the app's (executor, slots) for background refreshes, created on first use.
+
+    slots bounds running plus queued refreshes to RECOMMENDATION_REFRESH_WORKERS
+    + RECOMMENDATION_REFRESH_QUEUE_SIZE.
+    """
+    pool = app.extensions.get('recommendation_refresh_pool')
+    if pool is None:
+        with _refresh_lock:
+            pool = app.extensions.get('recommendation_refresh_pool')
+            if pool is None:
+                workers = int(app.config.get('RECOMMENDATION_REFRESH_WORKERS', 2))
+                queue_size = int(app.config.get('RECOMMENDATION_REFRESH_QUEUE_SIZE', 8))
+                pool = app.extensions['recommendation_refresh_pool'] = (
+                    ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recommendation-refresh'),
+                    threading.BoundedSemaphore(workers + queue_size),
+                )
+    return pool
+
+
+def _recommendation_cache():
+    ttl = int(current_app.config.get('RECOMMENDATION_CACHE_TTL_SECS', 1800))
+    stale = int(current_app.config.get('RECOMMENDATION_STALE_SECS', 3600))
+    # Entries outlive their TTL by the stale window so they can be served while refreshing
+    return get_cache('recommendations', maxsize=int(current_app.config.get('RECOMMENDATION_CACHE_SIZE', 4096)),
+                     ttl=ttl + stale)
+
+
+def invalidate_recommendations(user_id):
+    """Mark a customer's cached recommendation stale, e.g. after they complete a delivery.
+
+    The stale text is still served once more while a fresh one is generated
+    in the background.
+
+    Args:
+        user_id: Customer's user id.
+    """
+    entry = _recommendation_cache().get(user_id)
+    if entry is not None:
+        entry['stale'] = True
+
 
 class RecommendationService:
     """Service layer for generating personalized menu recommendations using Mistral LLM."""
     
-    def __init__(self):
-        """Initialize the recommendation service with Mistral API client."""
-        api_key = os.getenv('MISTRAL_API_KEY')
+    def __init__(self, api_key=None):
+        """Initialize the recommendation service; the LLM gateway is shared per app.
+
+        Args:
+            api_key: Mistral API key, defaults to MISTRAL_API_KEY.
+        """
+        api_key = api_key or os.getenv('MISTRAL_API_KEY')
         if not api_key:
             raise ValueError("MISTRAL_API_KEY environment variable not set")
-        self.client = Mistral(api_key=api_key)
+        self.api_key = api_key
         self.model = "mistral-medium"  # or "mistral-small"
-    
-    def _get_user_order_history(self, user_id: int) -> List[Dict]:
-        """Retrieve user's past order history with items."""
-        from app.services.customer_service import CustomerService
-        customer_service = CustomerService()
-        
-        deliveries = customer_service.get_all_deliveries(user_id=user_id)
-        order_history = []
-        
-        for delivery in deliveries:
-            delivery_items = DeliveryItems.query.filter_by(delivery_id=delivery.id).all()
-            items = []
-            
-            for di in delivery_items:
-                cart_item = CartItems.query.filter_by(id=di.cart_item_id).first()
-                if cart_item:
-                    if cart_item.product_id:
-                        product = Products.query.get(cart_item.product_id)
-                        if product:
-                            items.append(f"{product.name} ({product.category})")
-                    elif cart_item.bundle_id:
-                        bundle = SnackBundles.query.get(cart_item.bundle_id)
-                        if bundle:
-                            items.append(f"{bundle.name} (Bundle)")
-            
-            if items:
-                order_history.append({
-                    'date': delivery.date_added.isoformat() if delivery.date_added else "Unknown",
-                    'items': items
-                })
-        
-        print(order_history)
-        
-        return order_history
-    
-    def _get_menu_items(self) -> Dict:
-        """Retrieve all available menu items and bundles."""
-        products = Products.query.filter_by(is_available=True).all()
-        products_data = [f"{p.name} (${p.unit_price})" for p in products]
-        
-        from app.services.bundle_service import BundleService
-        bundle_service = BundleService()
-        bundles = bundle_service.get_all_bundles(include_unavailable=False)
-        bundles_data = [f"{b['name']} (${b['total_price']})" for b in bundles]
-        print("Priting bundles data:", bundles_data)
-        
-        return {
-            'products': products_data,
-            'bundles': bundles_data
-        }
-    
-    def _format_prompt(self, menu_data: Dict, order_history: List[Dict]) -> str:
-        """Format the prompt for Mistral LLM to request ONLY text."""
-        prompt = """You are a friendly and helpful assistant for a movie theater concession stand. 
-Your task is to provide a short, personalized paragraph recommending food and snacks based on a customer's order history.
 
-AVAILABLE MENU:
+    @property
+    def gateway(self):
+        """Return the app's LLM gateway (pooled client, deadlines, circuit breaker)."""
+        return get_llm_gateway(self.api_key, self.model)
 
-Products: """ + ", ".join(menu_data['products']) + """
+    def _get_user_order_history(self, user_id: int, limit: int = HISTORY_ORDER_LIMIT) -> List[Dict]:
+        """Return the customer's latest orders with their item names, oldest first.
 
-Bundles: """ + ", ".join(menu_data['bundles']) + """
+        The latest deliveries that have items are picked in a derived table
+        (LIMIT pushed into SQL) and joined to their cart lines and
+        product/bundle names, so the whole history costs one query.
 
-CUSTOMER ORDER HISTORY:
+        Args:
+            user_id: Customer's user id.
+            limit: Number of most recent orders to include.
+
+        Returns:
+            list[dict]: One entry per order with 'date' and 'items' (e.g. "Popcorn (snacks)").
+        """
+        has_items = db.session.query(DeliveryItems.id).filter(DeliveryItems.delivery_id == Deliveries.id).exists()
+        latest = (
+            db.session.query(Deliveries.id.label('delivery_id'), Deliveries.date_added.label('date_added'))
+            .join(CustomerShowings, CustomerShowings.id == Deliveries.customer_showing_id)
+            .filter(CustomerShowings.customer_id == user_id, has_items)
+            .order_by(Deliveries.id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        rows = (
+            db.session.query(latest.c.delivery_id, latest.c.date_added,
+                             Products.name, Products.category, SnackBundles.name)
+            .join(DeliveryItems, DeliveryItems.delivery_id == latest.c.delivery_id)
+            .join(CartItems, CartItems.id == DeliveryItems.cart_item_id)
+            .outerjoin(Products, Products.id == CartItems.product_id)
+            .outerjoin(SnackBundles, SnackBundles.id == CartItems.bundle_id)
+            .order_by(latest.c.delivery_id.asc(), DeliveryItems.id.asc())
+            .all()
+        )
+
+        orders = {}
+        for delivery_id, date_added, product_name, category, bundle_name in rows:
+            order = orders.setdefault(delivery_id, {
+                'date': date_added.isoformat() if date_added else "Unknown",
+                'items': []
+            })
+            if product_name:
+                order['items'].append(f"{product_name} ({category})")
+            elif bundle_name:
+                order['items'].append(f"{bundle_name} (Bundle)")
+        return [order for order in orders.values() if order['items']]
+
+    def _get_menu_items(self, popularity: Optional[Dict] = None) -> Dict:
+        """Return the menu shown to the LLM, compressed to fit the prompt token budget.
+
+        Available products and bundles are loaded in two queries and ranked
+        by how many deliveries contained them (from the local item
+        recommender, unless a popularity dict is given). The top RECOMMENDATION_MENU_TOP_K of each product
+        category and of the bundles are then taken rank by rank, across
+        categories, until RECOMMENDATION_MENU_TOKEN_BUDGET is spent, so the
+        menu section stays the same size however large the catalog grows.
+
+        Args:
+            popularity: Optional item key -> delivery count used for ranking.
+
+        Returns:
+            dict: 'products' and 'bundles' lists of "Name ($price)" strings.
+        """
+        config = current_app.config
+        top_k = int(config.get('RECOMMENDATION_MENU_TOP_K', 5))
+        budget = int(config.get('RECOMMENDATION_MENU_TOKEN_BUDGET', 300))
+        if popularity is None:
+            popularity = get_item_recommender().popularity()
+
+        groups = {}
+        for p in Products.query.filter_by(is_available=True).all():
+            groups.setdefault(p.category, []).append(
+                ('products', p.category, f"{p.name} (${p.unit_price})", popularity.get(('product', p.id), 0.0)))
+        for b in SnackBundles.query.filter_by(is_available=True).all():
+            groups.setdefault(None, []).append(
+                ('bundles', '', f"{b.name} (${b.total_price})", popularity.get(('bundle', b.id), 0.0)))
+        for items in groups.values():
+            items.sort(key=lambda item: (-item[3], item[2]))
+
+        chosen, spent = [], 0
+        for rank in range(top_k):
+            for items in groups.values():
+                if rank < len(items):
+                    cost = _estimate_tokens(items[rank][2] + ", ")
+                    if spent + cost <= budget:
+                        chosen.append(items[rank])
+                        spent += cost
+
+        # Sorted so the menu version only changes when the chosen items do
+        chosen.sort(key=lambda item: (item[0], item[1], item[2]))
+        menu = {'products': [], 'bundles': []}
+        for section, _, text, _ in chosen:
+            menu[section].append(text)
+        return menu
+
+    def _render_menu_section(self, menu_data: Dict) -> str:
+        """Render the AVAILABLE MENU part of the prompt."""
+        return ("AVAILABLE MENU:\n\nProducts: " + ", ".join(menu_data['products'])
+                + "\n\nBundles: " + ", ".join(menu_data['bundles']) + "\n")
+
+    def _render_history_section(self, order_history: List[Dict]) -> str:
+        """Render the CUSTOMER ORDER HISTORY part of the prompt from an aggregate.
+
+        Items are counted across the latest orders and only the
+        RECOMMENDATION_HISTORY_TOP_ITEMS most frequent are listed, followed
+        by the most recent order, so the section has a fixed upper size.
+        """
+        section = "CUSTOMER ORDER HISTORY:\n\n"
+        orders = order_history[-HISTORY_ORDER_LIMIT:]
+        if not orders:
+            return section + "No previous orders (New Customer).\n"
+        counts = Counter(item for order in orders for item in order['items'])
+        top_items = int(current_app.config.get('RECOMMENDATION_HISTORY_TOP_ITEMS', 8))
+        usual = ", ".join(f"{item} x{count}" for item, count in counts.most_common(top_items))
+        latest = orders[-1]
+        return (section + f"- Orders considered: {len(orders)}\n"
+                + f"- Usually orders: {usual}\n"
+                + f"- Most recent order ({latest['date']}): {', '.join(latest['items'][:top_items])}\n")
+
+    def _format_prompt(self, menu_data: Dict, order_history: List[Dict]) -> str:
+        """Format the prompt for Mistral LLM to request ONLY text.
+
+        The menu section is pre-rendered once per menu snapshot (see
+        _get_menu_snapshot) and reused for every customer.
+        """
+        menu_section = menu_data.get('section') or self._render_menu_section(menu_data)
+        prompt = """You are a friendly and helpful assistant for a movie theater concession stand. 
+Your task is to provide a short, personalized paragraph recommending food and snacks based on a customer's order history.
+
+""" + menu_section + "\n" + self._render_history_section(order_history)
 
-"""
-        if order_history:
-            for order in order_history[-5:]:  # Limit to last 5 orders for brevity
-                prompt += f"- Date {order['date']}: {', '.join(order['items'])}\n"
-        else:
-            prompt += "No previous orders (New Customer).\n"
-        
         prompt += """
 Based on this history, write a friendly recommendation. 
 - If they are a new customer, recommend a popular bundle.
@@ -107,52 +246,229 @@ Example:
 }
 """
         return prompt
-    
+
+    def _get_menu_snapshot(self) -> Tuple[Dict, str]:
+        """Return the menu (with its rendered prompt section) and its version, cached briefly."""
+        cache = get_cache('menu_snapshot', maxsize=1,
+                          ttl=int(current_app.config.get('RECOMMENDATION_MENU_TTL_SECS', 60)))
+
+        def load():
+            menu_data = self._get_menu_items()
+            version = hashlib.sha1(json.dumps(menu_data, sort_keys=True).encode()).hexdigest()
+            menu_data['section'] = self._render_menu_section(menu_data)
+            return menu_data, version
+
+        return cache.get_or_set('menu', load)
+
     def get_recommendations(self, user_id: int) -> Dict:
-        """Generate text-based personalized recommendations."""
+        """Return personalized recommendations, served from a per-user cache.
+
+        Entries are keyed by user and remember the menu version they were
+        generated from. On a cache miss the row precomputed by
+        precompute_recommendations.py is read by primary key and cached. A
+        fresh entry is returned as is; one that is past
+        RECOMMENDATION_CACHE_TTL_SECS, built from an older menu, or marked
+        stale by invalidate_recommendations is still returned while a
+        background refresh replaces it. Only a miss waits for the LLM, and
+        fallback answers are not cached. With RECOMMENDATION_BACKEND='local'
+        the LLM is skipped and item ids come straight from the local
+        co-occurrence recommender, which is also the fallback when the LLM fails.
+        """
         # Validate customer exists
         customer = Customers.query.filter_by(user_id=user_id).first()
         if not customer:
             raise ValueError(f"Customer with user_id {user_id} not found")
-        
-        # Get menu data and order history
-        menu_data = self._get_menu_items()
+
+        menu_data, menu_version = self._get_menu_snapshot()
+        if current_app.config.get('RECOMMENDATION_BACKEND', 'llm') == 'local':
+            row = self._load_precomputed(user_id)
+            if row is not None and row.menu_version == menu_version:
+                return row.recommendation
+            return {'type': 'items', 'recommendations': recommend_items(user_id)}
+
+        cache = _recommendation_cache()
+        entry = cache.get(user_id)
+        if entry is None:
+            row = self._load_precomputed(user_id)
+            if row is not None:
+                self._store(user_id, row.menu_version, row.recommendation)
+                entry = cache.get(user_id)
+        if entry is not None:
+            ttl = int(current_app.config.get('RECOMMENDATION_CACHE_TTL_SECS', 1800))
+            fresh = (not entry['stale'] and entry['menu_version'] == menu_version
+                     and time.monotonic() - entry['generated_at'] < ttl)
+            if not fresh:
+                self._refresh_in_background(user_id)
+            return entry['value']
+
+        value, cacheable = self._generate_recommendations(user_id, menu_data)
+        if cacheable:
+            self._store(user_id, menu_version, value)
+        return value
+
+    def _load_precomputed(self, user_id: int):
+        """Return the customer's precomputed row, or None if missing or older than the max age."""
+        row = db.session.get(CustomerRecommendations, user_id)
+        max_age = timedelta(hours=int(current_app.config.get('RECOMMENDATION_PRECOMPUTED_MAX_AGE_HOURS', 36)))
+        if row is None or datetime.utcnow() - row.generated_at > max_age:
+            return None
+        return row
+
+    def get_active_customer_ids(self, after_user_id: int = 0, limit: int = 500) -> List[int]:
+        """Return the next page of active customer ids, keyset-paginated by user id.
+
+        Args:
+            after_user_id: Last id of the previous page (0 for the first page).
+            limit: Page size.
+        """
+        rows = (
+            db.session.query(Customers.user_id)
+            .join(Users, Users.id == Customers.user_id)
+            .filter(Customers.user_id > after_user_id, Users.account_status == 'active')
+            .order_by(Customers.user_id.asc())
+            .limit(limit)
+            .all()
+        )
+        return [user_id for (user_id,) in rows]
+
+    def compute_recommendation(self, user_id: int, menu_data: Dict) -> Tuple[Dict, bool]:
+        """Compute a recommendation with the configured backend, bypassing every cache.
+
+        Used by the batch precompute job.
+
+        Returns:
+            tuple: (response dict, whether it is worth storing).
+        """
+        if current_app.config.get('RECOMMENDATION_BACKEND', 'llm') == 'local':
+            return {'type': 'items', 'recommendations': recommend_items(user_id)}, True
+        return self._generate_recommendations(user_id, menu_data)
+
+    def save_precomputed(self, results: List[Tuple[int, Dict]], menu_version: str) -> int:
+        """Upsert precomputed recommendations in one statement and commit.
+
+        Args:
+            results: (user_id, recommendation) pairs.
+            menu_version: Version of the menu the recommendations were built from.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if not results:
+            return 0
+        generated_at = datetime.utcnow().replace(microsecond=0)
+        db.session.execute(_UPSERT_RECOMMENDATION, [
+            {'user_id': user_id, 'recommendation': json.dumps(value),
+             'menu_version': menu_version, 'generated_at': generated_at}
+            for user_id, value in results
+        ])
+        db.session.commit()
+        return len(results)
+
+    def _store(self, user_id: int, menu_version: str, value: Dict) -> None:
+        _recommendation_cache().set(user_id, {
+            'value': value,
+            'menu_version': menu_version,
+            'generated_at': time.monotonic(),
+            'stale': False,
+        })
+
+    def _refresh_in_background(self, user_id: int) -> None:
+        """Regenerate a user's recommendation off the request thread, once at a time per user.
+
+        Refreshes run on a small shared pool; when it is full the refresh is
+        dropped and the caller keeps serving the stale value. Runs inline when
+        RECOMMENDATION_REFRESH_ASYNC is false (tests).
+        """
+        app = current_app._get_current_object()
+        refreshing = app.extensions.setdefault('recommendation_refreshing', set())
+        with _refresh_lock:
+            if user_id in refreshing:
+                return
+            refreshing.add(user_id)
+
+        def refresh():
+            try:
+                with app.app_context():
+                    menu_data, menu_version = self._get_menu_snapshot()
+                    value, cacheable = self._generate_recommendations(user_id, menu_data)
+                    if cacheable:
+                        self._store(user_id, menu_version, value)
+            except Exception as e:
+                app.logger.warning("Recommendation refresh for user %s failed: %s", user_id, e)
+            finally:
+                with _refresh_lock:
+                    refreshing.discard(user_id)
+
+        if not app.config.get('RECOMMENDATION_REFRESH_ASYNC', True):
+            refresh()
+            return
+
+        executor, slots = _refresh_pool(app)
+        if not slots.acquire(blocking=False):
+            with _refresh_lock:
+                refreshing.discard(user_id)
+            return
+        try:
+            future = executor.submit(refresh)
+        except BaseException:
+            slots.release()
+            with _refresh_lock:
+                refreshing.discard(user_id)
+            raise
+        future.add_done_callback(lambda done: slots.release())
+
+    def _generate_recommendations(self, user_id: int, menu_data: Dict) -> Tuple[Dict, bool]:
+        """Call the LLM for a user's recommendation.
+
+        The call goes through the app's LLMGateway; a timeout, open circuit
+        or backend error falls back to the local recommender.
+
+        Returns:
+            tuple: (response dict, whether it is worth caching).
+        """
         order_history = self._get_user_order_history(user_id)
         
         # Format prompt
         prompt = self._format_prompt(menu_data, order_history)
         
         try:
-            # Call Mistral API
-            response = self.client.chat.complete(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"}  # Force JSON response
-            )
-            
-            # Parse response
-            content = response.choices[0].message.content
+            # Concurrent requests for the same user share one call, bounded by LLM_TIMEOUT_SECS
+            content = self.gateway.call(user_id, prompt)
+        except LLMUnavailable as e:
+            current_app.logger.warning("LLM recommendation for user %s unavailable: %s", user_id, e)
+            return self._fallback_recommendation(user_id)
+
+        # Content may be None or a list of content chunks; only plain text is usable
+        if not isinstance(content, str):
+            current_app.logger.warning("LLM recommendation for user %s had unexpected content %r", user_id, type(content))
+            return self._fallback_recommendation(user_id)
+
+        try:
             parsed_response = json.loads(content)
-            
-            # Return simple text structure
-            return {
-                'type': 'text',
-                'recommendations': parsed_response.get('recommendations', "Check out our latest menu items!")
-            }
-                
         except json.JSONDecodeError:
-            # If JSON parsing fails, return the raw content if possible
-            return {
-                'type': 'text',
-                'recommendations': content if 'content' in locals() else "We recommend checking out our bundles tab!"
-            }
-        except Exception as e:
-            # Return a fallback message instead of crashing
-            return {
-                'type': 'text',
-                'recommendations': "We're having trouble reaching our AI chef right now, but our Popcorn Combo is always a winner!"
-            }
+            # If JSON parsing fails, return the raw content
+            return {'type': 'text', 'recommendations': content}, True
+
+        if not isinstance(parsed_response, dict):
+            current_app.logger.warning("LLM recommendation for user %s was JSON but not an object", user_id)
+            return self._fallback_recommendation(user_id)
 
+        # Return simple text structure
+        return {
+            'type': 'text',
+            'recommendations': parsed_response.get('recommendations', "Check out our latest menu items!")
+        }, True
 
+    def _fallback_recommendation(self, user_id: int) -> Tuple[Dict, bool]:
+        """Recommend without the LLM: the local co-occurrence recommender, then a fixed message.
+
+        Returns:
+            tuple: (response dict, False) since a fallback is not worth caching.
+        """
+        items = recommend_items(user_id)
+        if items:
+            return {'type': 'items', 'recommendations': items}, False
+        return {
+            'type': 'text',
+            'recommendations': "We're having trouble reaching our AI chef right now, but our Popcorn Combo is always a winner!"
+        }, False
@@ -0,0 +1,166 @@
+from app.models import *
+from app.app import db
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from collections import Counter
+
+# Size of a sales bucket in seconds (one hour).
+SALES_BUCKET_SECS = 3600
+
+_UPSERT_SALES = text("""
+    INSERT INTO theatre_item_sales_hourly (theatre_id, hour_start, item_type, item_id, units_sold)
+    VALUES (:theatre_id, FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(COALESCE(:sold_at, NOW())) / :bucket) * :bucket),
+            :item_type, :item_id, :delta)
+    ON DUPLICATE KEY UPDATE units_sold = units_sold + VALUES(units_sold)
+""")
+
+
+class SalesRollupService:
+    """Service layer for "what's popular" queries over hourly sales rollups.
+
+    Units sold per product/bundle per theatre per hour are kept in
+    theatre_item_sales_hourly, updated in the same transaction that creates
+    delivery items or cancels a delivery (see register_sales_rollup_listeners).
+    A window of N hours is answered by summing at most N buckets per item
+    instead of scanning DeliveryItems and CartItems.
+    """
+
+    def get_top_sellers(self, theatre_id=None, hours=24, limit=10, item_type=None):
+        """Return the best-selling items over the last `hours` hours.
+
+        Args:
+            theatre_id: Restrict to one theatre (None = all theatres).
+            hours: Window length in hours, including the current hour.
+            limit: Maximum number of items returned.
+            item_type: 'product' or 'bundle' to restrict the kind of item.
+
+        Returns:
+            list[dict]: item_type, item_id and units_sold, best first.
+
+        Raises:
+            ValueError: If hours, limit or item_type is invalid.
+        """
+        if not isinstance(hours, int) or hours < 1:
+            raise ValueError("hours must be a positive integer")
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError("limit must be a positive integer")
+        if item_type not in (None, 'product', 'bundle'):
+            raise ValueError("item_type must be 'product' or 'bundle'")
+
+        rows = self._window_totals(theatre_id, hours, item_type).limit(limit).all()
+        return [{'item_type': kind, 'item_id': item_id, 'units_sold': int(total)} for kind, item_id, total in rows]
+
+    def get_units_sold(self, theatre_id=None, hours=24):
+        """Return units sold per item over the last `hours` hours.
+
+        Args:
+            theatre_id: Restrict to one theatre (None = all theatres).
+            hours: Window length in hours, including the current hour.
+
+        Returns:
+            dict: ('product' | 'bundle', id) to units sold.
+
+        Raises:
+            ValueError: If hours is invalid.
+        """
+        if not isinstance(hours, int) or hours < 1:
+            raise ValueError("hours must be a positive integer")
+        rows = self._window_totals(theatre_id, hours).all()
+        return {(kind, item_id): int(total) for kind, item_id, total in rows}
+
+    def _window_totals(self, theatre_id, hours, item_type=None):
+        since = func.from_unixtime(
+            (func.floor(func.unix_timestamp() / SALES_BUCKET_SECS) - (hours - 1)) * SALES_BUCKET_SECS
+        )
+        units = func.sum(TheatreItemSalesHourly.units_sold)
+        query = (
+            db.session.query(TheatreItemSalesHourly.item_type, TheatreItemSalesHourly.item_id, units)
+            .filter(TheatreItemSalesHourly.hour_start >= since)
+        )
+        if theatre_id is not None:
+            query = query.filter(TheatreItemSalesHourly.theatre_id == theatre_id)
+        if item_type is not None:
+            query = query.filter(TheatreItemSalesHourly.item_type == item_type)
+        return (
+            query.group_by(TheatreItemSalesHourly.item_type, TheatreItemSalesHourly.item_id)
+            .having(units > 0)
+            .order_by(units.desc(), TheatreItemSalesHourly.item_type.asc(), TheatreItemSalesHourly.item_id.asc())
+        )
+
+
+def _sales_deltas(session):
+    """Collect (theatre_id, sold_at, item_type, item_id) -> units for this flush."""
+    deltas = Counter()
+
+    new_items = [o for o in session.new if isinstance(o, DeliveryItems) and o.delivery_id and o.cart_item_id]
+    if new_items:
+        cart_items = {
+            cart_item_id: (product_id, bundle_id, quantity)
+            for cart_item_id, product_id, bundle_id, quantity in (
+                session.query(CartItems.id, CartItems.product_id, CartItems.bundle_id, CartItems.quantity)
+                .filter(CartItems.id.in_({o.cart_item_id for o in new_items}))
+            )
+        }
+        deliveries = {
+            delivery_id: (theatre_id, status)
+            for delivery_id, theatre_id, status in (
+                session.query(Deliveries.id, Deliveries.theatre_id, Deliveries.delivery_status)
+                .filter(Deliveries.id.in_({o.delivery_id for o in new_items}))
+            )
+        }
+        for item in new_items:
+            if item.cart_item_id not in cart_items or item.delivery_id not in deliveries:
+                continue
+            product_id, bundle_id, quantity = cart_items[item.cart_item_id]
+            theatre_id, status = deliveries[item.delivery_id]
+            if theatre_id is None or status == 'cancelled':
+                continue
+            key = ('product', product_id) if product_id else ('bundle', bundle_id)
+            deltas[(theatre_id, None) + key] += quantity
+
+    # Cancelling a delivery takes its units back out of the hour it was sold in
+    cancelled = [o for o in session.dirty if isinstance(o, Deliveries) and o.theatre_id is not None
+                 and _cancelled_in_flush(o)]
+    if cancelled:
+        sold_at = {d.id: d.date_added for d in cancelled}
+        theatres = {d.id: d.theatre_id for d in cancelled}
+        rows = (
+            session.query(DeliveryItems.delivery_id, CartItems.product_id, CartItems.bundle_id, CartItems.quantity)
+            .join(CartItems, CartItems.id == DeliveryItems.cart_item_id)
+            .filter(DeliveryItems.delivery_id.in_(sold_at))
+            .all()
+        )
+        for delivery_id, product_id, bundle_id, quantity in rows:
+            key = ('product', product_id) if product_id else ('bundle', bundle_id)
+            deltas[(theatres[delivery_id], sold_at[delivery_id]) + key] -= quantity
+    return deltas
+
+
+def _cancelled_in_flush(delivery):
+    history = inspect(delivery).attrs.delivery_status.history
+    return (history.added and history.added[0] == 'cancelled'
+            and history.deleted and history.deleted[0] != 'cancelled')
+
+
+def _apply_sales_rollups(session, flush_context, instances):
+    """Fold this flush's new delivery items and cancellations into the hourly rollups."""
+    deltas = _sales_deltas(session)
+    if not deltas:
+        return
+    connection = session.connection()
+    for (theatre_id, sold_at, item_type, item_id), delta in deltas.items():
+        if delta:
+            connection.execute(_UPSERT_SALES, {"theatre_id": theatre_id, "sold_at": sold_at, "bucket": SALES_BUCKET_SECS,
+                                               "item_type": item_type, "item_id": item_id, "delta": delta})
+
+
+def register_sales_rollup_listeners():
+    """Keep the hourly sales rollups in step with ORM delivery item changes.
+
+    Runs before each flush, after the venue columns are filled (see
+    register_venue_listeners), and writes through the session's
+    connection so rollups commit or roll back with the checkout. Bulk SQL
+    bypasses the ORM; rebuild_sales_rollups.py recomputes the table.
+    """
+    if not event.contains(Session, 'before_flush', _apply_sales_rollups):
+        event.listen(Session, 'before_flush', _apply_sales_rollups)
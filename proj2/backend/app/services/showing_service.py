@@ -0,0 +1,213 @@
+from app.models import *
+from app.app import db
+from app.cache import get_cache
+from flask import current_app
+from datetime import datetime, timedelta
+import base64
+
+
+class ShowingService:
+    """Read-side operations for movie showings used by the booking UI."""
+
+    def _seatmap_cache(self):
+        return get_cache(
+            'seatmap',
+            maxsize=int(current_app.config.get('SEATMAP_CACHE_SIZE', 1024)),
+            ttl=int(current_app.config.get('SEATMAP_CACHE_TTL_SECS', 30)),
+        )
+
+    def get_seatmap(self, showing_id):
+        """Return the seat layout and occupancy for a showing, cached per showing.
+
+        Args:
+            showing_id: MovieShowings id.
+
+        Returns:
+            dict: Compact seat map (see build_seatmap).
+
+        Raises:
+            ValueError: If the showing does not exist.
+        """
+        cache = self._seatmap_cache()
+        seatmap = cache.get(showing_id)
+        if seatmap is None:
+            seatmap = self.build_seatmap(showing_id)
+            cache.set(showing_id, seatmap)
+        return seatmap
+
+    def invalidate_seatmap(self, showing_id):
+        """Drop the cached seat map for a showing after its bookings change.
+
+        Args:
+            showing_id: MovieShowings id.
+        """
+        self._seatmap_cache().delete(showing_id)
+
+    def build_seatmap(self, showing_id):
+        """Build the compact seat map for a showing from the database.
+
+        Seats are ordered by (aisle, number); each aisle is sent as runs of
+        consecutive seat numbers, and occupancy is one bit per seat in that
+        order (most significant bit first), base64-encoded. A 500-seat
+        auditorium fits in well under a kilobyte.
+
+        Args:
+            showing_id: MovieShowings id.
+
+        Returns:
+            dict: showing_id, auditorium_id, seat_count, booked_count, layout
+            (list of {aisle, ranges: [[first, last], ...]}) and occupancy (base64).
+
+        Raises:
+            ValueError: If the showing does not exist.
+        """
+        showing = MovieShowings.query.filter_by(id=showing_id).first()
+        if not showing:
+            raise ValueError(f"Movie Showing {showing_id} not found")
+
+        seats = (
+            db.session.query(Seats.id, Seats.aisle, Seats.number)
+            .filter(Seats.auditorium_id == showing.auditorium_id)
+            .order_by(Seats.aisle.asc(), Seats.number.asc())
+            .all()
+        )
+        # Covered by the unique (movie_showing_id, seat_id) index
+        booked = {
+            seat_id for (seat_id,) in
+            db.session.query(CustomerShowings.seat_id).filter(CustomerShowings.movie_showing_id == showing.id)
+        }
+
+        layout = []
+        bits = bytearray((len(seats) + 7) // 8)
+        booked_count = 0
+        for index, (seat_id, aisle, number) in enumerate(seats):
+            if not layout or layout[-1]["aisle"] != aisle:
+                layout.append({"aisle": aisle, "ranges": [[number, number]]})
+            else:
+                ranges = layout[-1]["ranges"]
+                if ranges[-1][1] + 1 == number:
+                    ranges[-1][1] = number
+                else:
+                    ranges.append([number, number])
+            if seat_id in booked:
+                bits[index // 8] |= 0x80 >> (index % 8)
+                booked_count += 1
+
+        return {
+            "showing_id": showing.id,
+            "auditorium_id": showing.auditorium_id,
+            "seat_count": len(seats),
+            "booked_count": booked_count,
+            "layout": layout,
+            "occupancy": base64.b64encode(bytes(bits)).decode(),
+        }
+
+    def _showtimes_cache(self):
+        return get_cache(
+            'showtimes',
+            maxsize=int(current_app.config.get('SHOWTIMES_CACHE_SIZE', 512)),
+            ttl=int(current_app.config.get('SHOWTIMES_CACHE_TTL_SECS', 300)),
+        )
+
+    def get_showtimes(self, theatre_id, start=None, end=None):
+        """Return the movies and showings starting at a theatre within a time window.
+
+        Showings are cached per (theatre, calendar day); uncached days in the
+        window are loaded with one range query that walks the
+        (auditorium_id, start_time) index of the theatre's auditoriums, so the
+        cost depends on the window, not on the theatre's showing history.
+
+        Args:
+            theatre_id: Theatre identifier.
+            start: Window start (naive datetime); defaults to now.
+            end: Window end, exclusive; defaults to one day after start.
+
+        Returns:
+            dict: theatre_id, from, to and movies, each with its showings in start order.
+
+        Raises:
+            ValueError: If the theatre does not exist or the window is empty or
+                longer than SHOWTIMES_MAX_DAYS.
+        """
+        theatre = Theatres.query.filter_by(id=theatre_id).first()
+        if not theatre:
+            raise ValueError(f"Theatre {theatre_id} not found")
+
+        start = start or datetime.now().replace(microsecond=0)
+        end = end or start + timedelta(days=1)
+        if end <= start:
+            raise ValueError("Showtimes window must end after it starts")
+        max_days = int(current_app.config.get('SHOWTIMES_MAX_DAYS', 14))
+        if end - start > timedelta(days=max_days):
+            raise ValueError(f"Showtimes window cannot exceed {max_days} days")
+
+        days = []
+        day = start.date()
+        while datetime.combine(day, datetime.min.time()) < end:
+            days.append(day)
+            day += timedelta(days=1)
+
+        cache = self._showtimes_cache()
+        by_day = {}
+        missing = []
+        for day in days:
+            rows = cache.get((theatre.id, day))
+            if rows is None:
+                missing.append(day)
+            else:
+                by_day[day] = rows
+        if missing:
+            loaded = self._load_showtimes(theatre.id, missing[0], missing[-1] + timedelta(days=1))
+            for day in missing:
+                by_day[day] = loaded.get(day, ())
+                cache.set((theatre.id, day), by_day[day])
+
+        movies = {}
+        for day in days:
+            for showing_id, auditorium_id, start_time, movie in by_day[day]:
+                if start <= start_time < end:
+                    entry = movies.setdefault(movie["movie_id"], dict(movie, showings=[]))
+                    entry["showings"].append({
+                        "showing_id": showing_id,
+                        "auditorium_id": auditorium_id,
+                        "start_time": start_time.isoformat(),
+                    })
+        return {
+            "theatre_id": theatre.id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "movies": list(movies.values()),
+        }
+
+    def _load_showtimes(self, theatre_id, start_day, end_day):
+        """Load showings for [start_day, end_day) grouped by start date, in start order."""
+        rows = (
+            db.session.query(MovieShowings.id, MovieShowings.auditorium_id, MovieShowings.start_time,
+                             Movies.id, Movies.title, Movies.genre, Movies.length_mins, Movies.rating)
+            .join(Auditoriums, Auditoriums.id == MovieShowings.auditorium_id)
+            .join(Movies, Movies.id == MovieShowings.movie_id)
+            .filter(Auditoriums.theatre_id == theatre_id,
+                    MovieShowings.start_time >= datetime.combine(start_day, datetime.min.time()),
+                    MovieShowings.start_time < datetime.combine(end_day, datetime.min.time()))
+            .order_by(MovieShowings.start_time.asc(), MovieShowings.auditorium_id.asc())
+            .all()
+        )
+        by_day = {}
+        for showing_id, auditorium_id, start_time, movie_id, title, genre, length_mins, rating in rows:
+            movie = {"movie_id": movie_id, "title": title, "genre": genre,
+                     "length_mins": length_mins, "rating": float(rating)}
+            by_day.setdefault(start_time.date(), []).append((showing_id, auditorium_id, start_time, movie))
+        return {day: tuple(items) for day, items in by_day.items()}
+
+    def invalidate_showtimes(self, theatre_id, start_time):
+        """Drop a theatre's cached showtimes for the day of a showing that changed.
+
+        Args:
+            theatre_id: Theatre whose listing changed.
+            start_time: Start time of the added, moved or removed showing.
+        """
+        self._showtimes_cache().delete((theatre_id, start_time.date()))
+
+    def clear_showtimes(self):
+        """Drop every cached showtimes listing (e.g. after a movie is edited or removed)."""
+        self._showtimes_cache().clear()
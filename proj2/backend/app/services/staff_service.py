@@ -1,7 +1,31 @@
 from app.models import *
 from app.app import db
 from app.services.user_service import UserService
-from datetime import datetime
+from app.services.showing_service import ShowingService
+from app.services.pairing_service import mark_pairings_changed
+from app.services.venue_service import delivery_at_theatre
+from app.identity import principal_for
+from flask import current_app
+from sqlalchemy import insert, tuple_
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+
+class ScheduleValidationError(ValueError):
+    """Raised when a showing batch is empty or a slot is malformed."""
+
+
+class ScheduleConflictError(ValueError):
+    """Raised when proposed showings overlap each other or existing showings.
+
+    Attributes:
+        conflicts: List of dicts describing each overlapping pair.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} scheduling conflict(s) found")
+
 
 class StaffService:
     
@@ -9,13 +33,15 @@ class StaffService:
     and delivery maintenance operations.
     """
 
-    def __init__(self, user_id):
+    def __init__(self, user_id=None, principal=None):
         """Initialize the staff service with the acting user context.
 
         Args:
             user_id: The id of the user performing actions (authorization context).
+            principal: Request principal (see app.identity); takes precedence over user_id.
         """
-        self.user_id = user_id
+        self.principal = principal or principal_for(user_id)
+        self.user_id = self.principal.user_id
         self.user_service = UserService()
 
     def validate_admin(self):
@@ -27,7 +53,7 @@ class StaffService:
         Raises:
             ValueError: If the user is not a staff admin.
         """
-        admin = Staff.query.filter_by(user_id=self.user_id).first()
+        admin = self.principal.staff()
         if not admin or admin.role != 'admin':
             raise ValueError("Unauthorized User - Not an admin")
         return admin
@@ -41,7 +67,7 @@ class StaffService:
         Raises:
             ValueError: If the user is not a staff member.
         """
-        staff = Staff.query.filter_by(user_id=self.user_id).first()
+        staff = self.principal.staff()
         if not staff:
             raise ValueError("Unauthorized User - Not a staff member")
         return staff
@@ -77,6 +103,52 @@ class StaffService:
         db.session.commit()
         return staff
 
+    def add_staff_bulk(self, rows):
+        """Create many staff users and staff records at once (admin only).
+
+        Args:
+            rows: List of dicts with the add_staff fields (name, email, phone,
+                birthday, password, theatre_id, role). theatre_id may be an
+                integer or a numeric string.
+
+        Returns:
+            list[dict]: Per-row results from UserService.create_users_bulk.
+
+        Raises:
+            ValueError: If the acting user is not admin or the batch itself is invalid.
+        """
+        admin = self.validate_admin()
+
+        if not isinstance(rows, list):
+            raise ValueError("Rows must be a non-empty list")
+        def parse_theatre_id(value):
+            # JSON clients may send ids as strings ("3"); bools are ints in Python but not ids
+            if isinstance(value, bool):
+                raise ValueError("theatre_id must be an integer")
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError("theatre_id must be an integer")
+
+        theatre_ids = set()
+        for row in rows:
+            if isinstance(row, dict):
+                try:
+                    theatre_ids.add(parse_theatre_id(row.get('theatre_id')))
+                except ValueError:
+                    pass
+        theatres = {theatre_id for (theatre_id,) in db.session.query(Theatres.id).filter(Theatres.id.in_(theatre_ids))}
+
+        def build_role_values(row):
+            if row.get('role') not in ['admin', 'runner']:
+                raise ValueError("Invalid role. Must be 'admin' or 'runner'.")
+            theatre_id = parse_theatre_id(row.get('theatre_id'))
+            if theatre_id not in theatres:
+                raise ValueError(f"Theatre {theatre_id} not found")
+            return {'theatre_id': theatre_id, 'role': row['role'], 'is_available': True}
+
+        return self.user_service.create_users_bulk(rows, 'staff', Staff, build_role_values)
+
     def remove_staff(self, staff_user_id):
         """Remove a staff user and associated staff record (admin only).
 
@@ -151,6 +223,7 @@ class StaffService:
         movie = Movies(title=title, genre=genre, length_mins=length_mins, release_year=release_year, keywords=keywords, rating=rating)
         db.session.add(movie)
         db.session.commit()
+        mark_pairings_changed('movie', movie.id)
         return movie
 
     def edit_movie(self, movie_id, title, genre, length_mins, release_year, keywords, rating):
@@ -184,6 +257,8 @@ class StaffService:
         movie.keywords = keywords
         movie.rating = rating
         db.session.commit()
+        ShowingService().clear_showtimes()
+        mark_pairings_changed('movie', movie_id)
         return movie
 
     def remove_movie(self, movie_id):
@@ -206,6 +281,8 @@ class StaffService:
         
         db.session.delete(movie)
         db.session.commit()
+        ShowingService().clear_showtimes()
+        mark_pairings_changed('movie', movie_id)
 
     def add_showing(self, movie_id, auditorium_id, start_time):
         """Create a movie showing (admin only).
@@ -221,6 +298,7 @@ class StaffService:
         Raises:
             ValueError: If acting user is not admin, movie/auditorium missing,
                 or start_time is not a datetime.
+            ScheduleConflictError: If the showing overlaps another in the auditorium.
         """
         admin = self.validate_admin()
 
@@ -232,10 +310,18 @@ class StaffService:
             raise ValueError(f"Auditorium {auditorium_id} not found")
         if not isinstance(start_time, datetime):
             raise ValueError(f"Movie start time must be in DateTime format")
+
+        start_time = self._naive(start_time)
+        conflicts = self.find_showing_conflicts([
+            {"movie_id": movie.id, "auditorium_id": auditorium.id, "start_time": start_time, "length_mins": movie.length_mins}
+        ])
+        if conflicts:
+            raise ScheduleConflictError(conflicts)
         
         showing = MovieShowings(movie_id=movie_id, auditorium_id=auditorium_id, start_time=start_time)
         db.session.add(showing)
         db.session.commit()
+        ShowingService().invalidate_showtimes(auditorium.theatre_id, start_time)
         return showing
 
     def edit_showing(self, showing_id, movie_id, auditorium_id, start_time):
@@ -253,6 +339,7 @@ class StaffService:
         Raises:
             ValueError: If acting user is not admin, any id not found,
                 or start_time is not a datetime.
+            ScheduleConflictError: If the new slot overlaps another showing.
         """
         admin = self.validate_admin()
 
@@ -269,13 +356,184 @@ class StaffService:
         
         if not isinstance(start_time, datetime):
             raise ValueError(f"Movie start time must be in DateTime format")
+
+        start_time = self._naive(start_time)
+        conflicts = self.find_showing_conflicts([
+            {"movie_id": movie.id, "auditorium_id": auditorium.id, "start_time": start_time, "length_mins": movie.length_mins}
+        ], ignore_ids={showing.id})
+        if conflicts:
+            raise ScheduleConflictError(conflicts)
         
+        previous_theatre_id = db.session.query(Auditoriums.theatre_id).filter(Auditoriums.id == showing.auditorium_id).scalar()
+        previous_start_time = showing.start_time
+
         showing.movie_id = movie_id
         showing.auditorium_id = auditorium_id
         showing.start_time = start_time
         db.session.commit()
+        showing_service = ShowingService()
+        showing_service.invalidate_seatmap(showing.id)
+        showing_service.invalidate_showtimes(previous_theatre_id, previous_start_time)
+        showing_service.invalidate_showtimes(auditorium.theatre_id, start_time)
         return showing
 
+    @staticmethod
+    def _naive(value):
+        """Drop timezone info so start times compare with stored (naive) DATETIMEs."""
+        return value.replace(tzinfo=None) if value.tzinfo else value
+
+    def get_cleanup_buffer(self):
+        """Return the minimum gap between showings in one auditorium.
+
+        Returns:
+            timedelta: SHOWING_CLEANUP_BUFFER_MINS (default 15 minutes).
+        """
+        return timedelta(minutes=int(current_app.config.get('SHOWING_CLEANUP_BUFFER_MINS', 15)))
+
+    def find_showing_conflicts(self, slots, ignore_ids=None):
+        """Detect overlaps between proposed slots and existing showings.
+
+        Each auditorium's existing and proposed intervals (start to
+        start + runtime + cleanup buffer) are sorted by start and swept once,
+        comparing each interval with the furthest-reaching one before it, so a
+        week of slots costs O(n log n) plus one range query on the
+        (auditorium_id, start_time) unique index.
+
+        Args:
+            slots: Iterable of dicts with movie_id, auditorium_id, start_time
+                (naive datetime) and length_mins.
+            ignore_ids: Optional existing showing ids to leave out (e.g. the
+                showing being edited).
+
+        Returns:
+            list[dict]: One entry per overlapping pair; empty if none.
+        """
+        slots = list(slots)
+        if not slots:
+            return []
+        buffer = self.get_cleanup_buffer()
+        longest = timedelta(minutes=db.session.query(func.max(Movies.length_mins)).scalar() or 0)
+        window_start = min(slot['start_time'] for slot in slots) - longest - buffer
+        window_end = max(slot['start_time'] + timedelta(minutes=slot['length_mins']) for slot in slots) + buffer
+
+        existing = (
+            db.session.query(MovieShowings.id, MovieShowings.auditorium_id, MovieShowings.start_time, Movies.length_mins)
+            .join(Movies, Movies.id == MovieShowings.movie_id)
+            .filter(MovieShowings.auditorium_id.in_({slot['auditorium_id'] for slot in slots}),
+                    MovieShowings.start_time >= window_start,
+                    MovieShowings.start_time < window_end)
+            .all()
+        )
+
+        intervals = defaultdict(list)
+        for showing_id, auditorium_id, start, length_mins in existing:
+            if ignore_ids and showing_id in ignore_ids:
+                continue
+            intervals[auditorium_id].append((start, start + timedelta(minutes=length_mins) + buffer, {"showing_id": showing_id}))
+        for index, slot in enumerate(slots):
+            start = slot['start_time']
+            intervals[slot['auditorium_id']].append((start, start + timedelta(minutes=slot['length_mins']) + buffer, {"slot": index}))
+
+        conflicts = []
+        for auditorium_id, items in intervals.items():
+            items.sort(key=lambda item: item[0])
+            reach = None
+            for start, end, ref in items:
+                if reach is not None and start < reach[1] and ("slot" in ref or "slot" in reach[2]):
+                    conflicts.append({
+                        "auditorium_id": auditorium_id,
+                        "start_time": start.isoformat(),
+                        "conflicts_with_start_time": reach[0].isoformat(),
+                        **ref,
+                        **{f"conflicts_with_{key}": value for key, value in reach[2].items()},
+                    })
+                if reach is None or end > reach[1]:
+                    reach = (start, end, ref)
+        return conflicts
+
+    def schedule_showings(self, theatre_id, slots):
+        """Validate and bulk-create a batch of showings for one theatre (admin only).
+
+        Auditorium rows are locked for the duration so concurrent schedulers
+        cannot interleave; all slots are checked for overlap with each other
+        and with existing showings, then inserted with a single multi-row
+        INSERT. Nothing is written if any slot is invalid or conflicts.
+
+        Args:
+            theatre_id: Theatre that owns every auditorium in the batch.
+            slots: List of dicts with movie_id, auditorium_id and start_time
+                (datetime or ISO 8601 string).
+
+        Returns:
+            list[MovieShowings]: The created showings in start-time order.
+
+        Raises:
+            ValueError: If acting user is not admin or any movie/auditorium
+                does not exist.
+            ScheduleValidationError: If the batch is empty or a slot is malformed.
+            ScheduleConflictError: If any slot overlaps another showing.
+        """
+        admin = self.validate_admin()
+        if not slots:
+            raise ScheduleValidationError("No showings to schedule")
+
+        parsed = []
+        for index, slot in enumerate(slots):
+            try:
+                start_time = slot['start_time']
+                if isinstance(start_time, str):
+                    start_time = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
+                if not isinstance(start_time, datetime):
+                    raise TypeError
+                parsed.append({"movie_id": int(slot['movie_id']), "auditorium_id": int(slot['auditorium_id']),
+                               "start_time": self._naive(start_time)})
+            except (KeyError, TypeError, ValueError):
+                raise ScheduleValidationError(f"Showing {index} must include movie_id, auditorium_id and an ISO 8601 start_time")
+
+        auditorium_ids = {slot['auditorium_id'] for slot in parsed}
+        auditoriums = (
+            Auditoriums.query
+            .filter(Auditoriums.id.in_(auditorium_ids), Auditoriums.theatre_id == theatre_id)
+            .with_for_update()
+            .all()
+        )
+        missing = auditorium_ids - {auditorium.id for auditorium in auditoriums}
+        if missing:
+            db.session.rollback()
+            raise ValueError(f"Auditorium(s) {sorted(missing)} not found in theatre {theatre_id}")
+
+        movie_ids = {slot['movie_id'] for slot in parsed}
+        lengths = dict(db.session.query(Movies.id, Movies.length_mins).filter(Movies.id.in_(movie_ids)).all())
+        missing = movie_ids - set(lengths)
+        if missing:
+            db.session.rollback()
+            raise ValueError(f"Movie(s) {sorted(missing)} not found")
+        for slot in parsed:
+            slot['length_mins'] = lengths[slot['movie_id']]
+
+        conflicts = self.find_showing_conflicts(parsed)
+        if conflicts:
+            db.session.rollback()
+            raise ScheduleConflictError(conflicts)
+
+        db.session.execute(insert(MovieShowings), [
+            {"movie_id": slot['movie_id'], "auditorium_id": slot['auditorium_id'], "start_time": slot['start_time']}
+            for slot in parsed
+        ])
+        db.session.commit()
+        showing_service = ShowingService()
+        for slot in parsed:
+            showing_service.invalidate_showtimes(theatre_id, slot['start_time'])
+
+        keys = [(slot['auditorium_id'], slot['start_time']) for slot in parsed]
+        showings = (
+            MovieShowings.query
+            .filter(tuple_(MovieShowings.auditorium_id, MovieShowings.start_time).in_(keys))
+            .order_by(MovieShowings.start_time.asc(), MovieShowings.auditorium_id.asc())
+            .all()
+        )
+        return showings
+
     def remove_showing(self, showing_id):
         """Delete a movie showing by id (admin only).
 
@@ -294,8 +552,14 @@ class StaffService:
         if not showing:
             raise ValueError(f"Movie Showing {showing_id} not found")
         
+        theatre_id = db.session.query(Auditoriums.theatre_id).filter(Auditoriums.id == showing.auditorium_id).scalar()
+        start_time = showing.start_time
+
         db.session.delete(showing)
         db.session.commit()
+        showing_service = ShowingService()
+        showing_service.invalidate_seatmap(showing_id)
+        showing_service.invalidate_showtimes(theatre_id, start_time)
 
     def set_availability(self, is_available):
         """Set the current staff member's availability.
@@ -318,8 +582,8 @@ class StaffService:
     def accept_delivery(self, delivery_id):
         """Accept a pending delivery for the current staff member.
 
-        Sets the delivery staff_id, moves status to 'accepted', and marks
-        the staff member unavailable.
+        Sets the delivery staff_id, moves status to 'accepted', and takes one
+        of the staff member's delivery slots.
 
         Args:
             delivery_id: Delivery primary key.
@@ -341,7 +605,7 @@ class StaffService:
         if delivery.delivery_status != 'pending':
             raise ValueError("Delivery not available to accept")
 
-        self.set_availability(False)
+        self._take_slot(staff)
         delivery.staff_id = staff.user_id
         delivery.delivery_status = 'accepted'
         db.session.commit()
@@ -368,10 +632,29 @@ class StaffService:
             raise ValueError("Delivery status must be 'delivered' to be fulfilled")
 
         delivery.delivery_status = 'fulfilled'
-        self.set_availability(True)
+        self.release_staff(delivery.staff_id or staff.user_id)
         db.session.commit()
         return delivery
     
+    def get_max_concurrent_deliveries(self):
+        """Return how many deliveries one staff member may hold at once.
+
+        Returns:
+            int: The configured limit (STAFF_MAX_CONCURRENT_DELIVERIES, at least 1).
+        """
+        return max(1, int(current_app.config.get('STAFF_MAX_CONCURRENT_DELIVERIES', 1)))
+
+    def _take_slot(self, staff):
+        """Count one more active delivery against a staff member.
+
+        The staff member leaves the queue once the concurrency limit is reached.
+        Touching the row also bumps last_updated, which moves them to the back
+        of their theatre's queue.
+        """
+        staff.active_deliveries = (staff.active_deliveries or 0) + 1
+        if staff.active_deliveries >= self.get_max_concurrent_deliveries():
+            staff.is_available = False
+
     def get_available_staff(self, theatre_id):
         """Return the next available staff member at a theatre (oldest update first).
 
@@ -381,14 +664,67 @@ class StaffService:
         Returns:
             Staff | None: The selected staff member or None if none available.
         """
-        staff = Staff.query.filter_by(theatre_id=theatre_id, is_available=True).order_by(Staff.last_updated.asc(), Staff.user_id.asc()).all()
+        staff = (
+            Staff.query.filter_by(theatre_id=theatre_id, is_available=True)
+            .order_by(Staff.last_updated.asc(), Staff.user_id.asc())
+            .first()
+        )
+        return staff
+
+    def claim_available_staff(self, theatre_id):
+        """Claim the least-recently-used available staff member at a theatre.
+
+        Reads the head of the theatre's queue through the
+        (theatre_id, is_available, last_updated) index with
+        LIMIT 1 FOR UPDATE SKIP LOCKED, so concurrent checkouts claim
+        different staff members instead of blocking on or double-booking
+        the same one. The caller commits.
+
+        Args:
+            theatre_id: Theatre identifier.
+
+        Returns:
+            Staff | None: The claimed staff member or None if none available.
+        """
+        staff = (
+            Staff.query.filter_by(theatre_id=theatre_id, is_available=True)
+            .order_by(Staff.last_updated.asc(), Staff.user_id.asc())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
         if staff:
-            staff = staff[0]
+            self._take_slot(staff)
         return staff
-    
+
+    def release_staff(self, staff_user_id):
+        """Return one delivery slot to a staff member.
+
+        A staff member who left the queue because they hit the concurrency
+        limit rejoins it; one who went unavailable by choice stays out. The
+        caller commits.
+
+        Args:
+            staff_user_id: Staff user id to release.
+
+        Returns:
+            Staff | None: The updated staff record, or None if not found.
+        """
+        staff = Staff.query.filter_by(user_id=staff_user_id).with_for_update().first()
+        if not staff:
+            return None
+        was_full = (staff.active_deliveries or 0) >= self.get_max_concurrent_deliveries()
+        staff.active_deliveries = max(0, (staff.active_deliveries or 0) - 1)
+        if was_full:
+            staff.is_available = True
+        return staff
+
     def try_assign_staff(self, theatre_id, delivery):
         """Assign an available staff member to a delivery if possible.
 
+        The caller is responsible for committing, so the assignment lands in
+        the same transaction as the delivery itself.
+
         Args:
             theatre_id: Theatre to search at.
             delivery: Delivery instance to assign.
@@ -401,14 +737,10 @@ class StaffService:
         """
         if not delivery:
             raise ValueError("Delivery not found")
-        staff = self.get_available_staff(theatre_id=theatre_id)
-        print(staff)
+        staff = self.claim_available_staff(theatre_id=theatre_id)
         if not staff:
             return False
         delivery.staff_id = staff.user_id
-        ss = StaffService(staff.user_id)
-        ss.set_availability(False)
-        db.session.commit()
         return True
     
     def show_all_staff(self, theatre_id):
@@ -443,10 +775,7 @@ class StaffService:
         self.validate_staff()
         deliveries = (
             Deliveries.query
-            .join(CustomerShowings, Deliveries.customer_showing_id == CustomerShowings.id)
-            .join(Seats, CustomerShowings.seat_id == Seats.id)
-            .join(Auditoriums, Seats.auditorium_id == Auditoriums.id)
-            .filter(Auditoriums.theatre_id == theatre_id)
+            .filter(delivery_at_theatre(theatre_id))
             .order_by(Deliveries.delivery_status.asc(), Deliveries.id.desc())
             .all()
         )
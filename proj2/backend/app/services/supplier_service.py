@@ -1,5 +1,7 @@
 from app.models import *
 from app.app import db
+from app.identity import principal_for
+from app.services.pairing_service import mark_pairings_changed
 
 
 class SupplierService:
@@ -9,13 +11,15 @@ class SupplierService:
     update supplier details, manage products, and list open suppliers.
     """
 
-    def __init__(self, user_id):
+    def __init__(self, user_id=None, principal=None):
         """Initialize the supplier service with acting user context.
 
         Args:
             user_id: The supplier's user id used for authorization and filtering.
+            principal: Request principal (see app.identity); takes precedence over user_id.
         """
-        self.user_id = user_id
+        self.principal = principal or principal_for(user_id)
+        self.user_id = self.principal.user_id
 
     def validate_supplier(self):
         """Validate that the current user id belongs to a supplier.
@@ -26,7 +30,7 @@ class SupplierService:
         Raises:
             ValueError: If the supplier record does not exist.
         """
-        supplier = Suppliers.query.filter_by(user_id=self.user_id).first()
+        supplier = self.principal.supplier()
         if not supplier:
             raise ValueError(f"Supplier {self.user_id} not found")
         return supplier
@@ -129,6 +133,7 @@ class SupplierService:
         )
         db.session.add(product)
         db.session.commit()
+        mark_pairings_changed('product', product.id)
         return product
 
     def edit_product(self, product_id, name, unit_price, inventory_quantity, size, keywords, category, discount, is_available):
@@ -165,6 +170,7 @@ class SupplierService:
         product.discount = discount
         product.is_available = is_available
         db.session.commit()
+        mark_pairings_changed('product', product_id)
         return product
 
     def remove_product(self, product_id):
@@ -186,6 +192,7 @@ class SupplierService:
 
         db.session.delete(product)
         db.session.commit()
+        mark_pairings_changed('product', product_id)
 
     def get_all_suppliers(self):
         """Return all open suppliers ordered by company name.
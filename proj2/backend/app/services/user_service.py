@@ -1,17 +1,25 @@
 from app.models import Users
 from app.app import db
-from argon2 import PasswordHasher
+from app.identity import invalidate_user_principal
+from app.hashing import get_password_hasher
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+def _unique_key(value):
+    """Normalize a value for uniqueness checks the way MySQL's case-insensitive collation compares it."""
+    return str(value).strip().casefold()
+
 
 class UserService:
     """Service for managing users: creation, retrieval, authentication, and updates.
     
     This module encapsulates user-related operations and password handling using Argon2.
+    Hashing runs on the app's bounded pool (see app.hashing), so these methods
+    may raise PasswordHashingBusy when it is saturated.
     """
 
-    def __init__(self):
-        """Initialize dependencies (password hasher)."""
-        self.ph = PasswordHasher()
-
     def generate_password_hash(self, password):
         """Generate a secure Argon2 hash for a plaintext password.
 
@@ -21,7 +29,7 @@ class UserService:
         Returns:
             str: Encoded Argon2 hash string.
         """
-        password_hash = self.ph.hash(password)
+        password_hash = get_password_hasher().hash(password)
         return password_hash
 
     def check_password_hash(self, password_hash, password):
@@ -34,12 +42,8 @@ class UserService:
         Returns:
             bool: True if the password matches the hash; otherwise False.
         """
-        try:
-            self.ph.verify(password_hash, password)
-            return True
-        except:
-            return False
-        
+        return get_password_hasher().verify(password_hash, password)
+
     def validate_credentials(self, email, password):
         """Validate user credentials and return the user if valid.
 
@@ -61,6 +65,12 @@ class UserService:
 
         if not self.check_password_hash(password_hash=user.password_hash, password=password):
             return None
+
+        # Upgrade hashes made with older argon2 parameters while the plaintext is at hand
+        hasher = get_password_hasher()
+        if hasher.needs_rehash(user.password_hash):
+            user.password_hash = hasher.hash(password)
+            db.session.commit()
         return user
 
     def create_user(self, name, email, phone, birthday, password, role):
@@ -108,6 +118,108 @@ class UserService:
         db.session.commit()
         return user
     
+    def create_users_bulk(self, rows, role, role_model, build_role_values, unique_role_fields=()):
+        """Create many users plus their role rows (Staff, Drivers, ...) in one transaction.
+
+        Each row is validated on its own, then the batch is checked against
+        existing emails, phones and any unique_role_fields with one IN query
+        per column. Passwords of the valid rows are hashed in parallel on the
+        hashing pool and users and role rows are inserted as two multi-row
+        statements. Invalid rows are reported and skipped; valid rows are created.
+
+        Args:
+            rows: List of dicts with name, email, phone, birthday, password and role fields.
+            role: Users.role for every row, e.g. 'staff'.
+            role_model: Model of the role table keyed by user_id.
+            build_role_values: Callable(row) -> dict of role_model column values;
+                raises ValueError for an invalid row.
+            unique_role_fields: role_model columns that must not repeat (e.g. license_plate).
+
+        Returns:
+            list[dict]: One result per input row, in order: {"index", "status": "created",
+            "user_id"} or {"index", "status": "error", "error"}.
+
+        Raises:
+            ValueError: If rows is not a non-empty list within BULK_ONBOARDING_MAX_ROWS,
+                or the batch raced with a concurrent insert of the same email/phone.
+        """
+        max_rows = int(current_app.config.get('BULK_ONBOARDING_MAX_ROWS', 500))
+        if not isinstance(rows, list) or not rows:
+            raise ValueError("Rows must be a non-empty list")
+        if len(rows) > max_rows:
+            raise ValueError(f"At most {max_rows} rows can be created per request")
+
+        results = [None] * len(rows)
+        pending = {}
+        seen = {}
+        unique_fields = ('email', 'phone') + tuple(unique_role_fields)
+        for index, row in enumerate(rows):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("Row must be an object")
+                if not all(row.get(field) for field in ('name', 'email', 'phone', 'birthday', 'password')):
+                    raise ValueError("Fields cannot be empty")
+                try:
+                    birthday = datetime.strptime(str(row['birthday']), '%Y-%m-%d').date()
+                except ValueError:
+                    raise ValueError("Birthday must be YYYY-MM-DD")
+                role_values = build_role_values(row)
+                values = {'email': row['email'], 'phone': row['phone']}
+                values.update({field: role_values[field] for field in unique_role_fields})
+                keys = [(field, _unique_key(values[field])) for field in unique_fields]
+                for key in keys:
+                    if key in seen:
+                        raise ValueError(f"Duplicate {key[0].replace('_', ' ')} in batch (row {seen[key]})")
+                for key in keys:
+                    seen[key] = index
+                pending[index] = {
+                    'user': {'name': row['name'], 'email': row['email'], 'phone': row['phone'],
+                             'birthday': birthday, 'role': role},
+                    'role_values': role_values,
+                    'password': row['password'],
+                }
+            except ValueError as e:
+                results[index] = {"index": index, "status": "error", "error": str(e)}
+
+        # One query per unique column for the whole batch
+        taken = set()
+        for field in unique_fields:
+            model = role_model if field in unique_role_fields else Users
+            column = getattr(model, field)
+            wanted = {(item['role_values'] if model is role_model else item['user'])[field] for item in pending.values()}
+            if wanted:
+                taken.update((field, _unique_key(value)) for (value,) in db.session.query(column).filter(column.in_(wanted)))
+        for index, item in list(pending.items()):
+            for field in unique_fields:
+                value = (item['role_values'] if field in unique_role_fields else item['user'])[field]
+                if (field, _unique_key(value)) in taken:
+                    label = field.replace('_', ' ').capitalize()
+                    results[index] = {"index": index, "status": "error", "error": f"{label} already in use"}
+                    del pending[index]
+                    break
+
+        if pending:
+            hashes = get_password_hasher().hash_many([item['password'] for item in pending.values()])
+            user_rows = [dict(item['user'], password_hash=password_hash)
+                         for item, password_hash in zip(pending.values(), hashes)]
+            try:
+                db.session.execute(insert(Users), user_rows)
+                ids = dict(
+                    db.session.query(Users.email, Users.id)
+                    .filter(Users.email.in_([user['email'] for user in user_rows]))
+                    .all()
+                )
+                db.session.execute(insert(role_model), [
+                    dict(item['role_values'], user_id=ids[item['user']['email']]) for item in pending.values()
+                ])
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                raise ValueError("Batch conflicts with concurrently created users, please retry")
+            for index, item in pending.items():
+                results[index] = {"index": index, "status": "created", "user_id": ids[item['user']['email']]}
+        return results
+
     def delete_user(self, user_id):
         """Delete a user by id.
 
@@ -126,6 +238,7 @@ class UserService:
         
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_principal(user_id)
         return True
     
     def get_user(self, user_id):
@@ -176,6 +289,7 @@ class UserService:
         user.birthday = birthday
 
         db.session.commit()
+        invalidate_user_principal(user.id)
         return user
     
     def change_password(self, user_id, current_password, new_password):
@@ -201,4 +315,32 @@ class UserService:
         
         user.password_hash = self.generate_password_hash(new_password)
         db.session.commit()
+        invalidate_user_principal(user.id)
+        return user
+
+    def set_account_status(self, user_id, account_status):
+        """Activate or deactivate a user account.
+
+        Deactivated accounts are logged out on their next request.
+
+        Args:
+            user_id: The user's primary key.
+            account_status: 'active' or 'inactive'.
+
+        Returns:
+            Users: The updated user record.
+
+        Raises:
+            ValueError: If the user is missing or the status is invalid.
+        """
+        if account_status not in ['active', 'inactive']:
+            raise ValueError("Account status must be active or inactive")
+
+        user = self.get_user(user_id=user_id)
+        if not user:
+            raise ValueError(f"User {user_id} not found")
+
+        user.account_status = account_status
+        db.session.commit()
+        invalidate_user_principal(user.id)
         return user
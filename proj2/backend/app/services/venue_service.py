@@ -0,0 +1,70 @@
+from app.models import *
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.orm import Session
+
+
+def delivery_at_theatre(theatre_id):
+    """Return a filter matching deliveries placed at a theatre.
+
+    Uses the denormalized deliveries.theatre_id column. Legacy rows that
+    backfill_venue_columns.py has not reached yet (theatre_id NULL) are
+    matched through their booking's seat and auditorium instead.
+
+    Args:
+        theatre_id: Theatre identifier.
+
+    Returns:
+        ColumnElement: Boolean SQL expression on Deliveries.
+    """
+    legacy_showings = (
+        select(CustomerShowings.id)
+        .join(Seats, Seats.id == CustomerShowings.seat_id)
+        .join(Auditoriums, Auditoriums.id == Seats.auditorium_id)
+        .where(Auditoriums.theatre_id == theatre_id)
+    )
+    return or_(
+        Deliveries.theatre_id == theatre_id,
+        and_(Deliveries.theatre_id.is_(None), Deliveries.customer_showing_id.in_(legacy_showings)),
+    )
+
+
+def _fill_venue_columns(session, flush_context, instances):
+    """Populate denormalized auditorium/theatre ids on new bookings and deliveries.
+
+    Services set these explicitly; this covers rows created elsewhere (fixtures,
+    scripts) with at most one query per table per flush.
+    """
+    showings = [o for o in session.new if isinstance(o, CustomerShowings) and o.theatre_id is None and o.seat_id]
+    if showings:
+        rows = (
+            session.query(Seats.id, Auditoriums.id, Auditoriums.theatre_id)
+            .join(Auditoriums, Auditoriums.id == Seats.auditorium_id)
+            .filter(Seats.id.in_({o.seat_id for o in showings}))
+            .all()
+        )
+        venues = {seat_id: (auditorium_id, theatre_id) for seat_id, auditorium_id, theatre_id in rows}
+        for showing in showings:
+            showing.auditorium_id, showing.theatre_id = venues.get(showing.seat_id, (None, None))
+
+    deliveries = [o for o in session.new if isinstance(o, Deliveries) and o.theatre_id is None and o.customer_showing_id]
+    if deliveries:
+        rows = (
+            session.query(CustomerShowings.id, Seats.auditorium_id, Auditoriums.theatre_id)
+            .join(Seats, Seats.id == CustomerShowings.seat_id)
+            .join(Auditoriums, Auditoriums.id == Seats.auditorium_id)
+            .filter(CustomerShowings.id.in_({o.customer_showing_id for o in deliveries}))
+            .all()
+        )
+        venues = {showing_id: (auditorium_id, theatre_id) for showing_id, auditorium_id, theatre_id in rows}
+        for delivery in deliveries:
+            delivery.auditorium_id, delivery.theatre_id = venues.get(delivery.customer_showing_id, (None, None))
+
+
+def register_venue_listeners():
+    """Fill the denormalized venue columns on new rows before each flush.
+
+    Must be registered before the delivery stats and sales rollup listeners,
+    which read these columns in the same flush.
+    """
+    if not event.contains(Session, 'before_flush', _fill_venue_columns):
+        event.listen(Session, 'before_flush', _fill_venue_columns)
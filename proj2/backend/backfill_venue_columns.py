@@ -0,0 +1,189 @@
+"""
+Add and backfill the denormalized theatre_id/auditorium_id columns on
+customer_showings and deliveries.
+
+Columns and indexes are added if missing, then existing rows are filled in
+small primary-key ranges, each committed on its own, so the backfill can run
+against a live database without long row locks. last_updated is preserved.
+Re-running is safe: only rows still missing a theatre_id are touched.
+
+Usage:
+  python backfill_venue_columns.py                       # all databases
+  python backfill_venue_columns.py --chunk-size 2000 --pause 0.1
+"""
+import argparse
+import time
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (table, column name, column definition)
+COLUMNS_TO_ADD = [
+    ("customer_showings", "auditorium_id", "BIGINT DEFAULT NULL"),
+    ("customer_showings", "theatre_id", "BIGINT DEFAULT NULL"),
+    ("deliveries", "auditorium_id", "BIGINT DEFAULT NULL"),
+    ("deliveries", "theatre_id", "BIGINT DEFAULT NULL"),
+]
+
+# (table, index name, column list)
+INDEXES_TO_ADD = [
+    ("customer_showings", "idx_customer_showings_theatre", "(theatre_id, movie_showing_id)"),
+    ("deliveries", "idx_deliveries_theatre_status", "(theatre_id, delivery_status, date_added)"),
+]
+
+# (table, column, referenced table)
+FOREIGN_KEYS_TO_ADD = [
+    ("customer_showings", "auditorium_id", "auditoriums"),
+    ("customer_showings", "theatre_id", "theatres"),
+    ("deliveries", "auditorium_id", "auditoriums"),
+    ("deliveries", "theatre_id", "theatres"),
+]
+
+BACKFILL_STATEMENTS = {
+    "customer_showings": """
+        UPDATE customer_showings cs
+        JOIN seats s ON s.id = cs.seat_id
+        JOIN auditoriums a ON a.id = s.auditorium_id
+        SET cs.auditorium_id = a.id, cs.theatre_id = a.theatre_id, cs.last_updated = cs.last_updated
+        WHERE cs.id >= %s AND cs.id < %s AND cs.theatre_id IS NULL
+    """,
+    "deliveries": """
+        UPDATE deliveries d
+        JOIN customer_showings cs ON cs.id = d.customer_showing_id
+        JOIN seats s ON s.id = cs.seat_id
+        JOIN auditoriums a ON a.id = s.auditorium_id
+        SET d.auditorium_id = a.id, d.theatre_id = a.theatre_id, d.last_updated = d.last_updated
+        WHERE d.id >= %s AND d.id < %s AND d.theatre_id IS NULL
+    """,
+}
+
+
+def add_schema(cursor, connection, db_name):
+    """Add the venue columns, indexes and foreign keys if they don't exist."""
+    for table_name, column_name, column_def in COLUMNS_TO_ADD:
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (db_name, table_name, column_name))
+        if cursor.fetchone()[0] == 0:
+            print(f"Adding column: {table_name}.{column_name}")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
+            connection.commit()
+            print(f"  ✓ Added {column_name}")
+        else:
+            print(f"  - Column {table_name}.{column_name} already exists, skipping")
+
+    for table_name, index_name, columns in INDEXES_TO_ADD:
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (db_name, table_name, index_name))
+        if cursor.fetchone()[0] == 0:
+            print(f"Adding index: {table_name}.{index_name}")
+            cursor.execute(f"CREATE INDEX {index_name} ON {table_name} {columns}")
+            connection.commit()
+            print(f"  ✓ Added {index_name}")
+        else:
+            print(f"  - Index {index_name} already exists, skipping")
+
+    for table_name, column_name, ref_table in FOREIGN_KEYS_TO_ADD:
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            AND REFERENCED_TABLE_NAME = %s
+        """, (db_name, table_name, column_name, ref_table))
+        if cursor.fetchone()[0] == 0:
+            print(f"Adding foreign key: {table_name}.{column_name} -> {ref_table}")
+            # Skipping the check lets MySQL add the key in place instead of copying the table
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            cursor.execute(f"ALTER TABLE {table_name} ADD FOREIGN KEY ({column_name}) REFERENCES {ref_table}(id)")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            connection.commit()
+            print(f"  ✓ Added foreign key on {column_name}")
+        else:
+            print(f"  - Foreign key on {table_name}.{column_name} already exists, skipping")
+
+
+def backfill_table(cursor, connection, table_name, chunk_size, pause):
+    """Fill venue columns for one table in primary-key ranges of chunk_size."""
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table_name} WHERE theatre_id IS NULL")
+    low, high = cursor.fetchone()
+    if low is None:
+        print(f"  - {table_name}: nothing to backfill")
+        return 0
+
+    updated = 0
+    start = low
+    while start <= high:
+        cursor.execute(BACKFILL_STATEMENTS[table_name], (start, start + chunk_size))
+        connection.commit()
+        updated += cursor.rowcount
+        start += chunk_size
+        if pause:
+            time.sleep(pause)
+    print(f"  ✓ {table_name}: backfilled {updated} rows")
+    return updated
+
+
+def migrate_database(db_name, chunk_size, pause):
+    """Add venue columns to a database and backfill existing rows."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        add_schema(cursor, connection, db_name)
+        # Bookings first so new deliveries created mid-run already find a venue
+        backfill_table(cursor, connection, "customer_showings", chunk_size, pause)
+        backfill_table(cursor, connection, "deliveries", chunk_size, pause)
+
+        cursor.close()
+        connection.close()
+        print(f"\nMigration completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error migrating {db_name}: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add and backfill theatre/auditorium columns")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Primary-key range updated per transaction")
+    parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between chunks")
+    args = parser.parse_args()
+
+    print("Starting migration to denormalize theatre/auditorium ids...\n")
+
+    # Migrate all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Migrating: {db_name}")
+        print(f"{'='*50}")
+        migrate_database(db_name, args.chunk_size, args.pause)
+
+    print("\n" + "="*50)
+    print("All migrations completed!")
+    print("="*50)
@@ -6,7 +6,9 @@ load_dotenv()
 # Schema table names
 tables = ['theatres', 'auditoriums', 'seats', 'users', 'staff', 'movies', 'movie_showings',
           'customers', 'customer_showings', 'payment_methods', 'drivers', 'suppliers',
-          'products', 'deliveries', 'cart_items', 'delivery_items', 'coupons', 'snack_bundles', 'bundle_items']
+          'products', 'deliveries', 'cart_items', 'delivery_items', 'coupons', 'snack_bundles', 'bundle_items',
+          'theatre_delivery_counters', 'theatre_delivery_throughput', 'customer_recommendations',
+          'theatre_item_sales_hourly']
 
 
 # Drop a single table with foreign key checks temporarily disabled 
@@ -119,10 +121,12 @@ def create_tables(db):
             theatre_id BIGINT NOT NULL,
             role ENUM('admin', 'runner') NOT NULL,
             is_available BOOLEAN NOT NULL DEFAULT FALSE,
+            active_deliveries INT UNSIGNED NOT NULL DEFAULT 0,
             date_added DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
             last_updated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-            FOREIGN KEY (theatre_id) REFERENCES theatres(id)
+            FOREIGN KEY (theatre_id) REFERENCES theatres(id),
+            INDEX idx_staff_queue (theatre_id, is_available, last_updated)
             )"""
 
     # Movies: catalog with rating constraint 0–5
@@ -167,12 +171,17 @@ def create_tables(db):
                         customer_id BIGINT NOT NULL,
                         movie_showing_id BIGINT NOT NULL,
                         seat_id BIGINT NOT NULL,
+                        auditorium_id BIGINT DEFAULT NULL,
+                        theatre_id BIGINT DEFAULT NULL,
                         date_added DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
                         last_updated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                         FOREIGN KEY (customer_id) REFERENCES customers(user_id) ON DELETE CASCADE,
                         FOREIGN KEY (movie_showing_id) REFERENCES movie_showings(id) ON DELETE CASCADE,
                         FOREIGN KEY (seat_id) REFERENCES seats(id),
-                        CONSTRAINT unique_movie_seat UNIQUE(movie_showing_id, seat_id)
+                        FOREIGN KEY (auditorium_id) REFERENCES auditoriums(id),
+                        FOREIGN KEY (theatre_id) REFERENCES theatres(id),
+                        CONSTRAINT unique_movie_seat UNIQUE(movie_showing_id, seat_id),
+                        INDEX idx_customer_showings_theatre (theatre_id, movie_showing_id)
                         )"""
 
     # Payment methods: balances, expiration checks, and default flag
@@ -248,6 +257,8 @@ def create_tables(db):
             customer_showing_id BIGINT NOT NULL,
             payment_method_id BIGINT NOT NULL,
             staff_id BIGINT,
+            auditorium_id BIGINT DEFAULT NULL,
+            theatre_id BIGINT DEFAULT NULL,
             payment_status ENUM('pending', 'completed', 'failed') DEFAULT 'pending' NOT NULL,
             total_price DECIMAL(12,2) NOT NULL,
             coupon_id BIGINT DEFAULT NULL,
@@ -257,6 +268,7 @@ def create_tables(db):
             ngo_name VARCHAR(128) DEFAULT NULL,
             donation_amount DECIMAL(12,2) NOT NULL DEFAULT 0.00,
             donation_percentage DECIMAL(5,2) DEFAULT NULL,
+            puzzle_nonce VARCHAR(32) DEFAULT NULL,
             delivery_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             delivery_status ENUM('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit', 
                         'delivered', 'fulfilled', 'cancelled') DEFAULT 'pending' NOT NULL,
@@ -267,7 +279,12 @@ def create_tables(db):
             FOREIGN KEY (customer_showing_id) REFERENCES customer_showings(id) ON DELETE CASCADE,
             FOREIGN KEY (payment_method_id) REFERENCES payment_methods(id),
             FOREIGN KEY (staff_id) REFERENCES staff(user_id),
-            CONSTRAINT check_total_price CHECK (total_price >= 0.00)
+            FOREIGN KEY (auditorium_id) REFERENCES auditoriums(id),
+            FOREIGN KEY (theatre_id) REFERENCES theatres(id),
+            CONSTRAINT check_total_price CHECK (total_price >= 0.00),
+            INDEX idx_deliveries_status_updated (delivery_status, last_updated),
+            INDEX idx_deliveries_theatre_status (theatre_id, delivery_status, date_added),
+            CONSTRAINT unique_delivery_puzzle_nonce UNIQUE (puzzle_nonce)
             )"""
 
     # Snack bundles: combo packages with discounted pricing
@@ -342,7 +359,9 @@ def create_tables(db):
                     script TEXT NOT NULL,
                     answer TEXT NOT NULL,
                     is_active BOOLEAN NOT NULL DEFAULT TRUE,
-                    date_added DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    date_added DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    last_updated DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+                    INDEX idx_code_puzzles_last_updated (last_updated)
                     )"""
 
     # NGO donations: track total donations per NGO
@@ -354,6 +373,49 @@ def create_tables(db):
                     CONSTRAINT check_ngo_donation_amount CHECK (total_amount_donated >= 0.00)
                     )"""
 
+    # Delivery dashboard counters: live count per theatre/status, kept in step with deliveries
+    theatre_delivery_counters = """CREATE TABLE IF NOT EXISTS theatre_delivery_counters (
+                    theatre_id BIGINT NOT NULL,
+                    delivery_status ENUM('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit',
+                        'delivered', 'fulfilled', 'cancelled') NOT NULL,
+                    delivery_count INT NOT NULL DEFAULT 0,
+                    last_updated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    PRIMARY KEY (theatre_id, delivery_status),
+                    FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+                    )"""
+
+    # Delivery dashboard throughput: transitions into each status per 15-minute window
+    theatre_delivery_throughput = """CREATE TABLE IF NOT EXISTS theatre_delivery_throughput (
+                    theatre_id BIGINT NOT NULL,
+                    window_start DATETIME NOT NULL,
+                    delivery_status ENUM('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit',
+                        'delivered', 'fulfilled', 'cancelled') NOT NULL,
+                    transition_count INT UNSIGNED NOT NULL DEFAULT 0,
+                    PRIMARY KEY (theatre_id, window_start, delivery_status),
+                    FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+                    )"""
+
+    # Customer recommendations: precomputed off-peak, stamped with the menu version they were built from
+    customer_recommendations = """CREATE TABLE IF NOT EXISTS customer_recommendations (
+                    user_id BIGINT PRIMARY KEY,
+                    recommendation JSON NOT NULL,
+                    menu_version CHAR(40) NOT NULL,
+                    generated_at DATETIME NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES customers(user_id) ON DELETE CASCADE
+                    )"""
+
+    # Item sales rollups: units sold per product/bundle per theatre per hour
+    theatre_item_sales_hourly = """CREATE TABLE IF NOT EXISTS theatre_item_sales_hourly (
+                    theatre_id BIGINT NOT NULL,
+                    hour_start DATETIME NOT NULL,
+                    item_type ENUM('product', 'bundle') NOT NULL,
+                    item_id BIGINT NOT NULL,
+                    units_sold INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (theatre_id, hour_start, item_type, item_id),
+                    INDEX idx_item_sales_hour (hour_start),
+                    FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+                    )"""
+
     # Execute DDL statements in dependency order
     cursor_object.execute(theatres)
     cursor_object.execute(auditoriums)
@@ -376,6 +438,10 @@ def create_tables(db):
     cursor_object.execute(coupons)
     cursor_object.execute(code_puzzles)
     cursor_object.execute(ngo_donations)
+    cursor_object.execute(theatre_delivery_counters)
+    cursor_object.execute(theatre_delivery_throughput)
+    cursor_object.execute(customer_recommendations)
+    cursor_object.execute(theatre_item_sales_hourly)
 
     # Persist schema changes and close the connection
     db.commit()
@@ -0,0 +1,83 @@
+"""Replay delivery history to compare recommendation backends offline.
+
+Each customer's most recent order is held out and every backend is asked
+for K items from the rest of their history. Reports hit-rate@K (the held-out
+order contains a recommended item), catalog coverage, per-user latency
+percentiles and LLM cost per 1k users.
+
+Backends:
+  popular    most-delivered items the customer has not ordered
+  local      the co-occurrence recommender (RECOMMENDATION_BACKEND='local')
+  llm-stub   the LLM prompt pipeline against an offline stub model
+  llm        the LLM prompt pipeline against Mistral (or MISTRAL_SERVER_URL,
+             e.g. fake_llm_server.py)
+
+Usage:
+  python evaluate_recommendations.py
+  python evaluate_recommendations.py --backends local,llm-stub -k 3 --stub-latency-ms 300
+  python evaluate_recommendations.py --backends llm --limit 200 --input-price 0.4 --output-price 2.0 --json
+"""
+import argparse
+import json
+import os
+from app.app import create_app
+from app.services.llm_backend import LLMGateway, get_llm_gateway
+from app.services.recommendation_eval import (
+    EvalDataset, PopularityBackend, CoOccurrenceBackend, LLMPromptBackend, StubLLMBackend, evaluate,
+)
+
+
+def build_backend(name, args):
+    if name == 'popular':
+        return PopularityBackend()
+    if name == 'local':
+        return CoOccurrenceBackend()
+    if name == 'llm-stub':
+        backend = LLMPromptBackend(LLMGateway(StubLLMBackend(delay=args.stub_latency_ms / 1000), timeout=args.timeout))
+        backend.name = 'llm-stub'
+        return backend
+    if name == 'llm':
+        api_key = os.getenv('MISTRAL_API_KEY')
+        if not api_key:
+            raise SystemExit("MISTRAL_API_KEY must be set for the llm backend")
+        return LLMPromptBackend(get_llm_gateway(api_key, args.model), timeout=args.timeout)
+    raise SystemExit(f"Unknown backend {name!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline recommendation evaluation")
+    parser.add_argument('--env', default='development', help="App config name (development/testing/production)")
+    parser.add_argument('--backends', default='popular,local,llm-stub', help="Comma-separated backends to compare")
+    parser.add_argument('-k', type=int, default=5, help="Recommendations scored per customer")
+    parser.add_argument('--limit', type=int, default=None, help="Evaluate at most N customers")
+    parser.add_argument('--min-history', type=int, default=1, help="Earlier orders a customer needs")
+    parser.add_argument('--model', default='mistral-medium', help="Model for the llm backend")
+    parser.add_argument('--timeout', type=float, default=None, help="Per-call LLM deadline in seconds")
+    parser.add_argument('--stub-latency-ms', type=float, default=0, help="Simulated latency of the stub LLM")
+    parser.add_argument('--input-price', type=float, default=0.0, help="Price per 1M prompt tokens")
+    parser.add_argument('--output-price', type=float, default=0.0, help="Price per 1M completion tokens")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    with app.app_context():
+        dataset = EvalDataset(min_history=args.min_history)
+        results = [
+            evaluate(build_backend(name.strip(), args), dataset, k=args.k, limit=args.limit,
+                     input_price_per_1m=args.input_price, output_price_per_1m=args.output_price)
+            for name in args.backends.split(',') if name.strip()
+        ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'backend':<10} {'users':>6} {'hit@' + str(args.k):>7} {'coverage':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'$/1k users':>11}")
+    for r in results:
+        latency = r['latency_ms']
+        print(f"{r['backend']:<10} {r['users']:>6} {r['hit_rate_at_k']:>7.3f} {r['coverage']:>9.3f} "
+              f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} {r['cost_per_1k_users']:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
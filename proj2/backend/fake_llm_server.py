@@ -0,0 +1,103 @@
+"""Local stand-in for the Mistral chat completions API, for tests and load tests.
+
+Answers POST /v1/chat/completions with a Mistral-shaped reply whose content
+is a {"recommendations": ...} JSON object, after a configurable delay. Errors
+and hangs can be injected to exercise the LLM deadline and circuit breaker.
+
+Usage:
+  python fake_llm_server.py                                   # port 8089, 200ms replies
+  python fake_llm_server.py --latency-ms 800 --jitter-ms 400
+  python fake_llm_server.py --error-rate 0.2 --hang-rate 0.05
+
+Then point the backend at it:
+  MISTRAL_SERVER_URL=http://127.0.0.1:8089 MISTRAL_API_KEY=fake python run.py
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLIES = [
+    "Since you enjoy popcorn, try pairing it with a large soda!",
+    "Our nachos go great with whatever you ordered last time.",
+    "New here? The Movie Night bundle is our most popular pick.",
+]
+
+
+def make_handler(latency_ms, jitter_ms, error_rate, hang_rate, hang_secs):
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.path.rstrip('/') != '/v1/chat/completions':
+                return self._send(404, {'message': 'Not found'})
+
+            roll = random.random()
+            if roll < hang_rate:
+                time.sleep(hang_secs)
+            else:
+                time.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+            if roll >= hang_rate and roll < hang_rate + error_rate:
+                return self._send(503, {'message': 'Service unavailable (injected)'})
+
+            prompt = ' '.join(m.get('content', '') for m in body.get('messages', []))
+            content = json.dumps({'recommendations': random.choice(REPLIES)})
+            self._send(200, {
+                'id': f'fake-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': len(prompt.split()),
+                    'completion_tokens': len(content.split()),
+                    'total_tokens': len(prompt.split()) + len(content.split()),
+                },
+            })
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeLLMHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Mistral chat completions server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=200, help="Mean reply latency")
+    parser.add_argument('--jitter-ms', type=float, default=50, help="Uniform +/- jitter around the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Fraction of requests that hang")
+    parser.add_argument('--hang-secs', type=float, default=30.0, help="How long a hanging request sleeps")
+    args = parser.parse_args()
+
+    handler = make_handler(args.latency_ms, args.jitter_ms, args.error_rate, args.hang_rate, args.hang_secs)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Fake LLM listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Migration script to add the columns and indexes used by delivery dispatch.
+Run this script to update existing databases created before the stale-delivery
+sweeper and the per-theatre staff queue.
+"""
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (table, column name, column definition)
+COLUMNS_TO_ADD = [
+    ("staff", "active_deliveries", "INT UNSIGNED NOT NULL DEFAULT 0 AFTER is_available"),
+]
+
+# (table, index name, column list)
+INDEXES_TO_ADD = [
+    ("deliveries", "idx_deliveries_status_updated", "(delivery_status, last_updated)"),
+    ("staff", "idx_staff_queue", "(theatre_id, is_available, last_updated)"),
+]
+
+# Seed staff.active_deliveries from deliveries that are still open; last_updated
+# is preserved so the queue order does not change.
+BACKFILL_ACTIVE_DELIVERIES = """
+    UPDATE staff s
+    LEFT JOIN (
+        SELECT staff_id, COUNT(*) AS open_count
+        FROM deliveries
+        WHERE staff_id IS NOT NULL AND delivery_status NOT IN ('fulfilled', 'cancelled')
+        GROUP BY staff_id
+    ) d ON d.staff_id = s.user_id
+    SET s.active_deliveries = COALESCE(d.open_count, 0), s.last_updated = s.last_updated
+"""
+
+
+def migrate_database(db_name):
+    """Add dispatch columns and indexes if they don't exist."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        for table_name, column_name, column_def in COLUMNS_TO_ADD:
+            # Check if column exists
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = %s
+                AND COLUMN_NAME = %s
+            """, (db_name, table_name, column_name))
+
+            exists = cursor.fetchone()[0] > 0
+
+            if not exists:
+                print(f"Adding column: {table_name}.{column_name}")
+                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
+                cursor.execute(BACKFILL_ACTIVE_DELIVERIES)
+                connection.commit()
+                print(f"  ✓ Added {column_name}")
+            else:
+                print(f"  - Column {column_name} already exists, skipping")
+
+        for table_name, index_name, columns in INDEXES_TO_ADD:
+            # Check if index exists
+            cursor.execute("""
+                SELECT COUNT(*)
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = %s
+                AND TABLE_NAME = %s
+                AND INDEX_NAME = %s
+            """, (db_name, table_name, index_name))
+
+            exists = cursor.fetchone()[0] > 0
+
+            if not exists:
+                print(f"Adding index: {table_name}.{index_name}")
+                cursor.execute(f"CREATE INDEX {index_name} ON {table_name} {columns}")
+                connection.commit()
+                print(f"  ✓ Added {index_name}")
+            else:
+                print(f"  - Index {index_name} already exists, skipping")
+
+        cursor.close()
+        connection.close()
+        print(f"\nMigration completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error migrating {db_name}: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    print("Starting migration to add dispatch columns and indexes...\n")
+
+    # Migrate all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Migrating: {db_name}")
+        print(f"{'='*50}")
+        migrate_database(db_name)
+
+    print("\n" + "="*50)
+    print("All migrations completed!")
+    print("="*50)
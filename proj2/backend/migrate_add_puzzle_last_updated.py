@@ -0,0 +1,84 @@
+"""
+Migration script to add the last_updated column to the code_puzzles table.
+The puzzle catalog fingerprints the table by COUNT(*), MAX(id) and
+MAX(last_updated) to notice edits cheaply. Run this before deploying.
+"""
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate_database(db_name):
+    """Add code_puzzles.last_updated and its index if they don't exist."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'code_puzzles' AND COLUMN_NAME = 'last_updated'
+        """, (db_name,))
+        if cursor.fetchone()[0] == 0:
+            print("Adding column: last_updated")
+            cursor.execute("ALTER TABLE code_puzzles ADD COLUMN last_updated DATETIME(6) NOT NULL "
+                           "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+            connection.commit()
+            print("  ✓ Added last_updated")
+        else:
+            print("  - Column last_updated already exists, skipping")
+
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'code_puzzles' AND INDEX_NAME = 'idx_code_puzzles_last_updated'
+        """, (db_name,))
+        if cursor.fetchone()[0] == 0:
+            print("Adding index: idx_code_puzzles_last_updated")
+            cursor.execute("CREATE INDEX idx_code_puzzles_last_updated ON code_puzzles (last_updated)")
+            connection.commit()
+            print("  ✓ Added idx_code_puzzles_last_updated")
+        else:
+            print("  - Index idx_code_puzzles_last_updated already exists, skipping")
+
+        cursor.close()
+        connection.close()
+        print(f"\nMigration completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error migrating {db_name}: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("Starting migration to add last_updated to code_puzzles table...\n")
+
+    # Migrate all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Migrating: {db_name}")
+        print(f"{'='*50}")
+        migrate_database(db_name)
+
+    print("\n" + "="*50)
+    print("All migrations completed!")
+    print("="*50)
@@ -0,0 +1,83 @@
+"""
+Migration script to add the puzzle_nonce column to the deliveries table.
+Checkout records the spent coupon puzzle token here; the unique constraint
+makes each token unlock at most one order. Run this before deploying.
+"""
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def migrate_database(db_name):
+    """Add deliveries.puzzle_nonce and its unique constraint if they don't exist."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'deliveries' AND COLUMN_NAME = 'puzzle_nonce'
+        """, (db_name,))
+        if cursor.fetchone()[0] == 0:
+            print("Adding column: puzzle_nonce")
+            cursor.execute("ALTER TABLE deliveries ADD COLUMN puzzle_nonce VARCHAR(32) DEFAULT NULL AFTER donation_percentage")
+            connection.commit()
+            print("  ✓ Added puzzle_nonce")
+        else:
+            print("  - Column puzzle_nonce already exists, skipping")
+
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'deliveries' AND INDEX_NAME = 'unique_delivery_puzzle_nonce'
+        """, (db_name,))
+        if cursor.fetchone()[0] == 0:
+            print("Adding constraint: unique_delivery_puzzle_nonce")
+            cursor.execute("ALTER TABLE deliveries ADD CONSTRAINT unique_delivery_puzzle_nonce UNIQUE (puzzle_nonce)")
+            connection.commit()
+            print("  ✓ Added unique_delivery_puzzle_nonce")
+        else:
+            print("  - Constraint unique_delivery_puzzle_nonce already exists, skipping")
+
+        cursor.close()
+        connection.close()
+        print(f"\nMigration completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error migrating {db_name}: {e}")
+        return False
+
+if __name__ == "__main__":
+    print("Starting migration to add puzzle_nonce to deliveries table...\n")
+
+    # Migrate all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Migrating: {db_name}")
+        print(f"{'='*50}")
+        migrate_database(db_name)
+
+    print("\n" + "="*50)
+    print("All migrations completed!")
+    print("="*50)
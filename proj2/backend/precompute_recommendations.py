@@ -0,0 +1,129 @@
+"""Precompute customer recommendations off-peak into customer_recommendations.
+
+Walks active customers in keyset-paginated chunks, computes each
+recommendation with the configured backend (RECOMMENDATION_BACKEND) in a pool
+of worker processes, and upserts each chunk with the current menu version.
+LLM calls are paced to --rate per second across all workers. The GET
+recommendations endpoint then serves these rows by primary key.
+
+Usage:
+  python precompute_recommendations.py                      # development, 4 workers, 2 calls/s
+  python precompute_recommendations.py --env production --workers 8 --rate 5
+  python precompute_recommendations.py --workers 0          # compute inline (no pool)
+
+Run it nightly from cron. Customers whose recommendation falls back (LLM
+unavailable) keep their previous row and are computed live on request.
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.app import create_app, db
+from app.services.recommendation_service import RecommendationService
+
+# Per-process app used by the pool workers.
+_worker_app = None
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart (rate <= 0 disables pacing)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def _init_worker(env):
+    global _worker_app
+    _worker_app = create_app(env)
+
+
+def _compute(user_id, menu_data):
+    """Compute one customer's recommendation in a worker; returns (user_id, value, ok)."""
+    with _worker_app.app_context():
+        try:
+            value, ok = RecommendationService().compute_recommendation(user_id, menu_data)
+            return user_id, value, ok
+        except Exception as e:
+            print(f"User {user_id} failed: {e}")
+            return user_id, None, False
+        finally:
+            db.session.remove()
+
+
+def run_precompute(app, env, workers=4, rate=2.0, chunk_size=200):
+    global _worker_app
+    with app.app_context():
+        service = RecommendationService()
+        menu_data, menu_version = service._get_menu_snapshot()
+        db.session.remove()
+
+    limiter = RateLimiter(rate)
+    stored = skipped = 0
+    pool = None
+    if workers > 0:
+        # spawn: forked workers would share the parent's database connections
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_worker, initargs=(env,))
+    else:
+        _worker_app = app
+
+    try:
+        last_user_id = 0
+        while True:
+            with app.app_context():
+                user_ids = RecommendationService().get_active_customer_ids(after_user_id=last_user_id, limit=chunk_size)
+                db.session.remove()
+            if not user_ids:
+                break
+            last_user_id = user_ids[-1]
+
+            futures = []
+            for user_id in user_ids:
+                limiter.wait()
+                if pool is not None:
+                    futures.append(pool.submit(_compute, user_id, menu_data))
+                else:
+                    futures.append(_compute(user_id, menu_data))
+            results = [future.result() if pool is not None else future for future in futures]
+
+            ready = [(user_id, value) for user_id, value, ok in results if ok]
+            skipped += len(results) - len(ready)
+            with app.app_context():
+                try:
+                    stored += RecommendationService().save_precomputed(ready, menu_version)
+                except Exception as e:
+                    db.session.rollback()
+                    skipped += len(ready)
+                    print(f"Saving chunk ending at user {last_user_id} failed: {e}")
+                finally:
+                    db.session.remove()
+            print(f"Processed customers up to {last_user_id}: stored {stored}, skipped {skipped}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return stored, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute customer recommendations")
+    parser.add_argument('--env', default='development', help="App config name (development/testing/production)")
+    parser.add_argument('--workers', type=int, default=4, help="Worker processes (0 = compute inline)")
+    parser.add_argument('--rate', type=float, default=2.0, help="Recommendations started per second (0 = unlimited)")
+    parser.add_argument('--chunk-size', type=int, default=200, help="Customers read and upserted per chunk")
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    started = time.monotonic()
+    stored, skipped = run_precompute(app, args.env, workers=args.workers, rate=args.rate, chunk_size=args.chunk_size)
+    print(f"Done in {time.monotonic() - started:.1f}s: stored {stored}, skipped {skipped}")
+
+
+if __name__ == "__main__":
+    main()
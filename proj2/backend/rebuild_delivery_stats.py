@@ -0,0 +1,159 @@
+"""
+Create and rebuild the theatre delivery dashboard counters.
+
+The counters are normally maintained on every delivery status change. Run this
+script once to create and seed the tables on an existing database, or again at
+any time to recompute them if they drift (e.g. after bulk SQL edits).
+Throughput windows older than the dashboard serves (24 hours) are deleted on
+every run; the stale-delivery sweeper prunes them too.
+
+Usage:
+  python rebuild_delivery_stats.py                # rebuild counters for all databases
+  python rebuild_delivery_stats.py --throughput   # also re-seed throughput windows
+"""
+import argparse
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WINDOW_SECS = 900
+
+# Same retention as THROUGHPUT_MAX_WINDOWS in delivery_stats_service.py
+MAX_WINDOWS = 96
+
+CREATE_COUNTERS = """
+    CREATE TABLE IF NOT EXISTS theatre_delivery_counters (
+        theatre_id BIGINT NOT NULL,
+        delivery_status ENUM('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit',
+            'delivered', 'fulfilled', 'cancelled') NOT NULL,
+        delivery_count INT NOT NULL DEFAULT 0,
+        last_updated DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (theatre_id, delivery_status),
+        FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+    )
+"""
+
+CREATE_THROUGHPUT = """
+    CREATE TABLE IF NOT EXISTS theatre_delivery_throughput (
+        theatre_id BIGINT NOT NULL,
+        window_start DATETIME NOT NULL,
+        delivery_status ENUM('pending', 'accepted', 'in_progress', 'ready_for_pickup', 'in_transit',
+            'delivered', 'fulfilled', 'cancelled') NOT NULL,
+        transition_count INT UNSIGNED NOT NULL DEFAULT 0,
+        PRIMARY KEY (theatre_id, window_start, delivery_status),
+        FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+    )
+"""
+
+# Deliveries joined to their theatre
+DELIVERY_THEATRES = """
+    FROM deliveries d
+    JOIN customer_showings cs ON cs.id = d.customer_showing_id
+    JOIN seats s ON s.id = cs.seat_id
+    JOIN auditoriums a ON a.id = s.auditorium_id
+"""
+
+REBUILD_COUNTERS = f"""
+    INSERT INTO theatre_delivery_counters (theatre_id, delivery_status, delivery_count)
+    SELECT a.theatre_id, d.delivery_status, COUNT(*)
+    {DELIVERY_THEATRES}
+    GROUP BY a.theatre_id, d.delivery_status
+"""
+
+# History is not stored, so approximate: creation counts as a transition into
+# 'pending' and each delivery's current status is credited at last_updated.
+REBUILD_THROUGHPUT = f"""
+    INSERT INTO theatre_delivery_throughput (theatre_id, window_start, delivery_status, transition_count)
+    SELECT theatre_id, window_start, delivery_status, COUNT(*) FROM (
+        SELECT a.theatre_id,
+               FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(d.date_added) / {WINDOW_SECS}) * {WINDOW_SECS}) AS window_start,
+               'pending' AS delivery_status
+        {DELIVERY_THEATRES}
+        UNION ALL
+        SELECT a.theatre_id,
+               FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(d.last_updated) / {WINDOW_SECS}) * {WINDOW_SECS}),
+               d.delivery_status
+        {DELIVERY_THEATRES}
+        WHERE d.delivery_status <> 'pending'
+    ) t
+    GROUP BY theatre_id, window_start, delivery_status
+"""
+
+PRUNE_THROUGHPUT = f"""
+    DELETE FROM theatre_delivery_throughput
+    WHERE window_start < FROM_UNIXTIME((FLOOR(UNIX_TIMESTAMP() / {WINDOW_SECS}) - {MAX_WINDOWS - 1}) * {WINDOW_SECS})
+"""
+
+
+def rebuild_database(db_name, throughput=False):
+    """Create the dashboard tables if needed and recompute their contents."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        cursor.execute(CREATE_COUNTERS)
+        cursor.execute(CREATE_THROUGHPUT)
+        connection.commit()
+        print("  ✓ Dashboard tables present")
+
+        # Lock deliveries for the swap so no transition is lost in between
+        connection.start_transaction()
+        cursor.execute("SELECT COUNT(*) FROM deliveries FOR UPDATE")
+        cursor.execute("DELETE FROM theatre_delivery_counters")
+        cursor.execute(REBUILD_COUNTERS)
+        print(f"  ✓ Rebuilt {cursor.rowcount} status counters")
+        if throughput:
+            cursor.execute("DELETE FROM theatre_delivery_throughput")
+            cursor.execute(REBUILD_THROUGHPUT)
+            print(f"  ✓ Re-seeded {cursor.rowcount} throughput windows")
+        cursor.execute(PRUNE_THROUGHPUT)
+        print(f"  ✓ Pruned {cursor.rowcount} expired throughput windows")
+        connection.commit()
+
+        cursor.close()
+        connection.close()
+        print(f"\nRebuild completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error rebuilding {db_name}: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild theatre delivery dashboard counters")
+    parser.add_argument('--throughput', action='store_true', help="Also re-seed the 15-minute throughput windows")
+    args = parser.parse_args()
+
+    print("Starting rebuild of delivery dashboard counters...\n")
+
+    # Rebuild all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Rebuilding: {db_name}")
+        print(f"{'='*50}")
+        rebuild_database(db_name, throughput=args.throughput)
+
+    print("\n" + "="*50)
+    print("All rebuilds completed!")
+    print("="*50)
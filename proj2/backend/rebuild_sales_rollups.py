@@ -0,0 +1,107 @@
+"""
+Create and rebuild the hourly per-theatre item sales rollups.
+
+The rollups are normally maintained on every checkout and cancellation. Run
+this script once to create and backfill the table on an existing database, or
+again at any time to recompute it if it drifts (e.g. after bulk SQL edits).
+
+Usage:
+  python rebuild_sales_rollups.py
+"""
+import mysql.connector
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BUCKET_SECS = 3600
+
+CREATE_SALES = """
+    CREATE TABLE IF NOT EXISTS theatre_item_sales_hourly (
+        theatre_id BIGINT NOT NULL,
+        hour_start DATETIME NOT NULL,
+        item_type ENUM('product', 'bundle') NOT NULL,
+        item_id BIGINT NOT NULL,
+        units_sold INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (theatre_id, hour_start, item_type, item_id),
+        INDEX idx_item_sales_hour (hour_start),
+        FOREIGN KEY (theatre_id) REFERENCES theatres(id) ON DELETE CASCADE
+    )
+"""
+
+# Units of every non-cancelled delivery, credited to the hour it was placed
+REBUILD_SALES = f"""
+    INSERT INTO theatre_item_sales_hourly (theatre_id, hour_start, item_type, item_id, units_sold)
+    SELECT d.theatre_id,
+           FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(d.date_added) / {BUCKET_SECS}) * {BUCKET_SECS}) AS hour_start,
+           IF(ci.product_id IS NOT NULL, 'product', 'bundle') AS item_type,
+           COALESCE(ci.product_id, ci.bundle_id) AS item_id,
+           SUM(ci.quantity)
+    FROM delivery_items di
+    JOIN deliveries d ON d.id = di.delivery_id
+    JOIN cart_items ci ON ci.id = di.cart_item_id
+    WHERE d.delivery_status <> 'cancelled' AND d.theatre_id IS NOT NULL
+    GROUP BY d.theatre_id, hour_start, item_type, item_id
+"""
+
+
+def rebuild_database(db_name):
+    """Create the rollup table if needed and recompute its contents."""
+    my_host = os.getenv('DB_HOST', 'localhost')
+    my_user = os.getenv('DB_USER', 'root')
+    my_password = os.getenv('DB_PASSWORD', '')
+
+    try:
+        # Connect to the database
+        connection = mysql.connector.connect(
+            host=my_host,
+            user=my_user,
+            password=my_password,
+            database=db_name
+        )
+        cursor = connection.cursor()
+
+        print(f"Connected to database: {db_name}")
+
+        cursor.execute(CREATE_SALES)
+        connection.commit()
+        print("  ✓ Sales rollup table present")
+
+        # Lock deliveries for the swap so no checkout is lost in between
+        connection.start_transaction()
+        cursor.execute("SELECT COUNT(*) FROM deliveries FOR UPDATE")
+        cursor.fetchall()
+        cursor.execute("DELETE FROM theatre_item_sales_hourly")
+        cursor.execute(REBUILD_SALES)
+        print(f"  ✓ Rebuilt {cursor.rowcount} hourly item buckets")
+        connection.commit()
+
+        cursor.close()
+        connection.close()
+        print(f"\nRebuild completed for {db_name}")
+        return True
+
+    except mysql.connector.Error as e:
+        print(f"Error rebuilding {db_name}: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    print("Starting rebuild of item sales rollups...\n")
+
+    # Rebuild all three databases
+    databases = [
+        os.getenv("DB_NAME", "movie_munchers_dev"),
+        "movie_munchers_test",
+        "movie_munchers_prod"
+    ]
+
+    for db_name in databases:
+        print(f"\n{'='*50}")
+        print(f"Rebuilding: {db_name}")
+        print(f"{'='*50}")
+        rebuild_database(db_name)
+
+    print("\n" + "="*50)
+    print("All rebuilds completed!")
+    print("="*50)
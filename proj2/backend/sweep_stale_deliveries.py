@@ -0,0 +1,46 @@
+"""Release and re-dispatch deliveries that are stuck past their status SLA.
+
+Usage:
+  python sweep_stale_deliveries.py                 # single sweep (cron-friendly)
+  python sweep_stale_deliveries.py --interval 60   # loop every 60 seconds
+  python sweep_stale_deliveries.py --env production --batch-size 200
+
+Safe to run next to the web workers or other sweepers: stale rows are locked
+with SKIP LOCKED, so each delivery is only processed by one sweeper.
+"""
+import argparse
+import time
+from app.app import create_app, db
+from app.services.dispatch_service import DispatchService
+
+
+def run_sweep(app, batch_size=None):
+    with app.app_context():
+        try:
+            result = DispatchService().sweep_stale_deliveries(batch_size=batch_size)
+            print(f"Found {result['found']} stale deliveries, "
+                  f"requeued {result['requeued']}, reassigned {result['reassigned']}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Sweep failed: {e}")
+        finally:
+            db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep stale deliveries")
+    parser.add_argument('--env', default='development', help="App config name (development/testing/production)")
+    parser.add_argument('--batch-size', type=int, default=None, help="Rows locked and committed per batch")
+    parser.add_argument('--interval', type=int, default=0, help="Repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    while True:
+        run_sweep(app, batch_size=args.batch_size)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
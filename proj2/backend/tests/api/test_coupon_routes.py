@@ -30,24 +30,20 @@ def test_get_coupon_puzzle_filesystem_fallback(app, client, sample_theatre, tmp_
     assert 'token' in data and 'puzzle_script' in data
 
 
-def test_apply_coupon_with_filesystem_token(app, client):
-    # Create coupon and a filesystem puzzle, then apply with correct answer
+def test_apply_coupon_with_filesystem_token(app, client, tmp_path):
+    # Create coupon and a filesystem puzzle, fetch its signed token, then apply with correct answer
     with app.app_context():
         from app.app import db
         c = Coupons(code='APPLYFS', difficulty=1, discount_percent=50.0, is_active=True)
         db.session.add(c)
         db.session.commit()
-        # create puzzle files in tests/test_code_puzzle and configure app to use it
-        test_root = os.path.join(app.root_path, '..', 'tests', 'test_code_puzzle')
-        puzzle_dir = os.path.join(test_root, 'easy')
-        os.makedirs(puzzle_dir, exist_ok=True)
-        with open(os.path.join(puzzle_dir, 'fs_apply.py'), 'w', encoding='utf-8') as f:
-            f.write('# no-op')
-        with open(os.path.join(puzzle_dir, 'fs_apply.txt'), 'w', encoding='utf-8') as f:
-            f.write('right')
-        app.config['CODE_PUZZLE_ROOT'] = test_root
+        puzzle_dir = tmp_path / 'easy'
+        puzzle_dir.mkdir()
+        (puzzle_dir / 'fs_apply.py').write_text('# no-op', encoding='utf-8')
+        (puzzle_dir / 'fs_apply.txt').write_text('right', encoding='utf-8')
+        app.config['CODE_PUZZLE_ROOT'] = str(tmp_path)
 
-    token = base64.b64encode(b'easy/fs_apply').decode()
+    token = client.get('/api/coupons/APPLYFS/puzzle').get_json()['token']
     payload = {'code': 'APPLYFS', 'total': 20.0, 'token': token, 'answer': 'right', 'skip_puzzle': False}
     res = client.post('/api/coupons/apply', json=payload)
     assert res.status_code == 200
@@ -57,6 +53,19 @@ def test_apply_coupon_with_filesystem_token(app, client):
     assert data['new_total'] == 10.0
 
 
+def test_apply_coupon_rejects_unsigned_token(app, client, tmp_path):
+    # Plain base64 puzzle paths are no longer accepted as tokens
+    with app.app_context():
+        from app.app import db
+        db.session.add(Coupons(code='FORGED', difficulty=1, discount_percent=50.0, is_active=True))
+        db.session.commit()
+
+    token = base64.b64encode(b'easy/fs_apply').decode()
+    res = client.post('/api/coupons/apply', json={'code': 'FORGED', 'total': 20.0, 'token': token, 'answer': 'right'})
+    assert res.status_code == 400
+    assert res.get_json()['error'] == 'Invalid puzzle token'
+
+
 def test_apply_coupon_missing_token_returns_400(app, client):
     with app.app_context():
         from app.app import db
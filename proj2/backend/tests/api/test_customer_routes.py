@@ -713,3 +713,17 @@ class TestCustomerRoutes:
             assert response.status_code == 400
             data = json.loads(response.data)
             assert 'error' in data
+
+    # Showtimes for a theatre within a window
+    def test_get_theatre_showtimes(self, client, sample_theatre, sample_showing):
+        response = client.get(f'/api/theatres/{sample_theatre}/showtimes?from=2025-12-01T00:00:00&to=2025-12-02T00:00:00')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['movies'][0]['showings'][0]['showing_id'] == sample_showing
+
+    # Bad windows and unknown theatres are rejected
+    def test_get_theatre_showtimes_errors(self, client, sample_theatre):
+        response = client.get(f'/api/theatres/{sample_theatre}/showtimes?from=tomorrow')
+        assert response.status_code == 400
+        response = client.get('/api/theatres/999999/showtimes')
+        assert response.status_code == 404
@@ -443,3 +443,31 @@ class TestDriverRoutes:
         assert response.status_code == 404
         data = json.loads(response.data)
         assert 'error' in data
+
+    def test_create_drivers_bulk(self, client, sample_admin):
+        # Bulk creation reports a result per row
+        unique_id = uuid.uuid4().hex[:4]
+        row = {'name': 'Bulk Driver', 'birthday': '1995-01-01', 'password': 'testpass', 'vehicle_type': 'car',
+               'vehicle_color': 'Red', 'duty_status': 'available', 'rating': 5.0, 'total_deliveries': 0}
+        response = client.post('/api/driver/bulk', json={'user_id': sample_admin, 'drivers': [
+            dict(row, email=f'bulk_a_{unique_id}@test.com', phone=f'555300{unique_id}', license_plate=f'BA{unique_id}'),
+            dict(row, email=f'bulk_b_{unique_id}@test.com', phone=f'555301{unique_id}', license_plate=f'BA{unique_id}'),
+        ]})
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['created'] == 1
+        assert data['results'][1]['error'] == 'Duplicate license plate in batch (row 0)'
+
+    def test_create_drivers_bulk_missing_rows(self, client):
+        # An empty batch is rejected
+        response = client.post('/api/driver/bulk', json={'user_id': sample_admin, 'drivers': []})
+        assert response.status_code == 400
+
+    def test_sweep_stale_requires_admin(self, client, sample_admin):
+        # The sweep and its metrics are refused without a staff admin
+        assert client.post('/api/deliveries/sweep-stale', json={}).status_code == 404
+        assert client.get('/api/deliveries/sweep-stale/metrics', json={}).status_code == 404
+        response = client.post('/api/deliveries/sweep-stale', json={'user_id': sample_admin})
+        assert response.status_code == 200
+        assert 'found' in json.loads(response.data)
+        assert client.get('/api/deliveries/sweep-stale/metrics', json={'user_id': sample_admin}).status_code == 200
@@ -1,6 +1,7 @@
 import json
 from app.app import db
 from app.models import *
+from app.identity import LEGACY_BODY_USER_ID_ENDPOINTS
 
 class TestStaffRoutes:
 
@@ -74,6 +75,14 @@ class TestStaffRoutes:
         data = json.loads(response.data)
         assert data['message'] == 'Staff successfully removed'
 
+    def test_body_user_id_with_non_testing_default(self, app, client, sample_admin, sample_staff):
+        # Outside testing, frontend endpoints still accept the body user_id; others need a session
+        app.config['BODY_USER_ID_ENDPOINTS'] = ','.join(LEGACY_BODY_USER_ID_ENDPOINTS)
+        response = client.delete(f'/api/staff/{sample_staff}', json={'user_id': sample_admin})
+        assert response.status_code == 200
+        response = client.post('/api/staff/bulk', json={'user_id': sample_admin, 'staff': []})
+        assert response.status_code == 404
+
     def test_remove_staff_not_found(self, client, sample_admin):
         response = client.delete('/api/staff/9999', json={
             'user_id': sample_admin
@@ -348,3 +357,95 @@ class TestStaffRoutes:
 
 
     
+
+    def test_theatre_delivery_stats_success(self, client, sample_staff, sample_theatre, sample_delivery):
+        response = client.get(f'/api/theatres/{sample_theatre}/delivery-stats', json={'user_id': sample_staff})
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['theatre_id'] == sample_theatre
+        assert data['counts']['pending'] == 1
+        assert data['oldest_pending_age_secs'] is not None
+        assert data['throughput_window_mins'] == 15
+        assert isinstance(data['throughput'], list)
+
+    def test_theatre_delivery_stats_not_found(self, client, sample_staff):
+        response = client.get('/api/theatres/999999/delivery-stats', json={'user_id': sample_staff})
+        assert response.status_code == 404
+        data = json.loads(response.data)
+        assert 'error' in data
+
+    def test_theatre_delivery_stats_requires_theatre_staff(self, client, sample_theatre, sample_customer):
+        response = client.get(f'/api/theatres/{sample_theatre}/delivery-stats')
+        assert response.status_code == 404
+        response = client.get(f'/api/theatres/{sample_theatre}/delivery-stats', json={'user_id': sample_customer})
+        assert response.status_code == 404
+
+    def test_theatre_delivery_stats_too_many_windows(self, client, sample_staff, sample_theatre):
+        response = client.get(f'/api/theatres/{sample_theatre}/delivery-stats?windows=97', json={'user_id': sample_staff})
+        assert response.status_code == 400
+
+    def test_schedule_showings_success(self, client, sample_admin, sample_theatre, sample_movie, sample_auditorium):
+        response = client.post(f'/api/theatres/{sample_theatre}/showings/schedule', json={
+            'user_id': sample_admin,
+            'showings': [
+                {'movie_id': sample_movie, 'auditorium_id': sample_auditorium, 'start_time': '2025-02-01T12:00:00.000Z'},
+                {'movie_id': sample_movie, 'auditorium_id': sample_auditorium, 'start_time': '2025-02-01T15:00:00.000Z'}
+            ]
+        })
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert len(data['showings']) == 2
+
+    def test_schedule_showings_conflict(self, client, sample_admin, sample_theatre, sample_movie, sample_auditorium, sample_showing):
+        response = client.post(f'/api/theatres/{sample_theatre}/showings/schedule', json={
+            'user_id': sample_admin,
+            'showings': [
+                {'movie_id': sample_movie, 'auditorium_id': sample_auditorium, 'start_time': '2025-12-01T20:00:00'}
+            ]
+        })
+        assert response.status_code == 409
+        data = json.loads(response.data)
+        assert len(data['conflicts']) == 1
+
+    def test_schedule_showings_missing_showings(self, client, sample_admin, sample_theatre):
+        response = client.post(f'/api/theatres/{sample_theatre}/showings/schedule', json={
+            'user_id': sample_admin
+        })
+        assert response.status_code == 400
+
+    def test_schedule_showings_malformed_slot(self, client, sample_admin, sample_theatre, sample_auditorium):
+        response = client.post(f'/api/theatres/{sample_theatre}/showings/schedule', json={
+            'user_id': sample_admin,
+            'showings': [{'auditorium_id': sample_auditorium, 'start_time': 'not a date'}]
+        })
+        assert response.status_code == 400
+
+    def test_schedule_showings_unknown_movie(self, client, sample_admin, sample_theatre, sample_auditorium):
+        response = client.post(f'/api/theatres/{sample_theatre}/showings/schedule', json={
+            'user_id': sample_admin,
+            'showings': [{'movie_id': 999999, 'auditorium_id': sample_auditorium, 'start_time': '2025-02-01T12:00:00'}]
+        })
+        assert response.status_code == 404
+        assert 'not found' in json.loads(response.data)['error']
+
+    # Test bulk staff onboarding returns per-row results
+    def test_add_staff_bulk(self, client, sample_admin, sample_theatre):
+        response = client.post('/api/staff/bulk', json={
+            'user_id': sample_admin,
+            'staff': [
+                {'name': 'Bulk One', 'email': 'bulk1@example.com', 'phone': '5552220001', 'birthday': '1990-01-01',
+                 'password': 'password123', 'theatre_id': sample_theatre, 'role': 'runner'},
+                {'name': 'Bulk Two', 'email': 'admin@example.com', 'phone': '5552220002', 'birthday': '1990-01-01',
+                 'password': 'password123', 'theatre_id': sample_theatre, 'role': 'runner'},
+            ]
+        })
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['created'] == 1
+        assert data['failed'] == 1
+        assert data['results'][1]['error'] == 'Email already in use'
+
+    # Test bulk staff onboarding requires an admin
+    def test_add_staff_bulk_unauthorized(self, client, sample_staff):
+        response = client.post('/api/staff/bulk', json={'user_id': sample_staff, 'staff': []})
+        assert response.status_code == 404
@@ -0,0 +1,38 @@
+from app.cache import TTLCache, get_cache
+
+
+class TestTTLCache:
+    # Entries expire after their TTL
+    def test_expiry(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr('app.cache.time.monotonic', lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        now[0] += 6
+        assert cache.get('a') is None
+
+    # The least-recently-used entry is evicted at capacity
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert len(cache) == 2
+
+    # get_or_set only computes on a miss
+    def test_get_or_set(self):
+        cache = TTLCache()
+        calls = []
+        assert cache.get_or_set('k', lambda: calls.append(1) or 'v') == 'v'
+        assert cache.get_or_set('k', lambda: calls.append(1) or 'w') == 'v'
+        assert len(calls) == 1
+
+    # Named caches are per app
+    def test_get_cache_per_app(self, app):
+        with app.app_context():
+            assert get_cache('x') is get_cache('x')
+            assert app.extensions['ttl_caches']['x'] is get_cache('x')
@@ -1,3 +1,4 @@
+import pytest
 from decimal import Decimal
 from app.models import Coupons, PaymentMethods, CartItems, Deliveries
 
@@ -32,3 +33,145 @@ def test_create_delivery_with_skip_puzzle_applies_coupon(app, sample_customer, s
     pm_after = PaymentMethods.query.get(sample_payment_method)
     # total charged should be post-discount: original total - discount
     assert Decimal(pm_after.balance) < bal_before
+
+
+def _write_puzzle(root, tier, name, script, answer=None):
+    folder = root / tier
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / f'{name}.py').write_text(script, encoding='utf-8')
+    if answer is not None:
+        (folder / f'{name}.txt').write_text(answer, encoding='utf-8')
+
+
+def test_puzzle_catalog_serves_files_by_tier(app, tmp_path):
+    # Script files are indexed by tier with their stored answers
+    from app.services.coupon_service import get_puzzle_catalog
+
+    _write_puzzle(tmp_path, 'easy', 'one', 'print(1)', '1\n')
+    with app.app_context():
+        app.config['CODE_PUZZLE_ROOT'] = str(tmp_path)
+        chosen = get_puzzle_catalog().choose(2)
+        assert chosen['filename'] == 'one.py'
+        assert chosen['answer'] == '1'
+        with pytest.raises(ValueError, match='No puzzles'):
+            get_puzzle_catalog().choose(9)
+
+
+def test_puzzle_catalog_prefers_table_rows(app, tmp_path):
+    # Active table puzzles win over files of the same tier
+    from app.app import db
+    from app.models import CodePuzzles
+    from app.services.coupon_service import get_puzzle_catalog
+
+    _write_puzzle(tmp_path, 'hard', 'file', 'print(2)', '2')
+    with app.app_context():
+        app.config['CODE_PUZZLE_ROOT'] = str(tmp_path)
+        puzzle = CodePuzzles(folder='hard', name='row', difficulty=8, script='print(3)', answer='3', is_active=True)
+        db.session.add(puzzle)
+        db.session.commit()
+        chosen = get_puzzle_catalog().choose(8)
+        assert chosen['key'] == f'db:{puzzle.id}'
+
+
+def test_puzzle_catalog_reloads_on_change(app, tmp_path):
+    # New files and edited answers are picked up without a restart
+    from app.services.coupon_service import get_puzzle_catalog
+
+    _write_puzzle(tmp_path, 'medium', 'a', 'print(4)', '4')
+    with app.app_context():
+        app.config['CODE_PUZZLE_ROOT'] = str(tmp_path)
+        assert get_puzzle_catalog().choose(5)['answer'] == '4'
+        _write_puzzle(tmp_path, 'medium', 'a', 'print(5)', '5')
+        get_puzzle_catalog().invalidate()
+        assert get_puzzle_catalog().choose(5)['answer'] == '5'
+
+
+def _signed_token(app, coupon_code='CODE', answer='42'):
+    from app.services.coupon_service import issue_puzzle_token
+    return issue_puzzle_token({'key': 'easy/x', 'answer': answer}, coupon_code)
+
+
+def test_puzzle_token_verifies_locally(app):
+    # A signed token checks the answer without any lookup
+    from app.services.coupon_service import verify_puzzle_token
+
+    with app.app_context():
+        token = _signed_token(app)
+        claims = verify_puzzle_token(token, ' 42 ', 'CODE')
+        assert claims['p'] == 'easy/x'
+        with pytest.raises(ValueError, match='Incorrect'):
+            verify_puzzle_token(token, '41', 'CODE')
+        with pytest.raises(ValueError, match='different coupon'):
+            verify_puzzle_token(token, '42', 'OTHER')
+
+
+def test_puzzle_token_rejects_tampering_and_expiry(app):
+    # Edited payloads fail the signature and old tokens expire
+    from app.services.coupon_service import verify_puzzle_token
+
+    with app.app_context():
+        body, signature = _signed_token(app).split('.')
+        with pytest.raises(ValueError, match='Invalid'):
+            verify_puzzle_token(body[:-2] + 'AA.' + signature, '42', 'CODE')
+        with pytest.raises(ValueError, match='Invalid'):
+            verify_puzzle_token('not-a-token', '42', 'CODE')
+        app.config['PUZZLE_TOKEN_TTL_SECS'] = -1
+        with pytest.raises(ValueError, match='expired'):
+            verify_puzzle_token(_signed_token(app), '42', 'CODE')
+
+
+def test_puzzle_token_single_use(app, sample_delivery):
+    # A token spent on one order cannot be replayed on another
+    from app.app import db
+    from app.services.coupon_service import verify_puzzle_token, consume_puzzle_token
+
+    with app.app_context():
+        token = _signed_token(app)
+        first = Deliveries.query.get(sample_delivery)
+        consume_puzzle_token(verify_puzzle_token(token, '42', 'CODE'), first)
+        db.session.commit()
+        second = Deliveries(customer_showing_id=first.customer_showing_id, payment_method_id=first.payment_method_id,
+                            total_price=10.00)
+        db.session.add(second)
+        with pytest.raises(ValueError, match='already used'):
+            consume_puzzle_token(verify_puzzle_token(token, '42', 'CODE'), second)
+        db.session.rollback()
+        assert Deliveries.query.filter_by(puzzle_nonce=first.puzzle_nonce).count() == 1
+
+
+def test_coupon_cache_answers_from_memory(app):
+    # Hits and misses come from the snapshot, not the table
+    from app.app import db
+    from sqlalchemy import text
+    from app.services.coupon_service import CouponService
+
+    with app.app_context():
+        db.session.add(Coupons(code='CACHED', difficulty=2, discount_percent=15.0, is_active=True))
+        db.session.commit()
+        service = CouponService()
+        assert service.get_active_coupon('cached')['code'] == 'CACHED'
+        assert service.get_active_coupon('NOPE') is None
+        # Raw SQL bypasses the ORM listeners, so the snapshot still answers
+        db.session.execute(text("DELETE FROM coupons WHERE code = 'CACHED'"))
+        db.session.execute(text("INSERT INTO coupons (code) VALUES ('NOPE')"))
+        db.session.commit()
+        assert service.get_active_coupon('CACHED')['discount_percent'] == Decimal('15.00')
+        assert service.get_active_coupon('NOPE') is None
+
+
+def test_coupon_cache_invalidated_by_orm_changes(app):
+    # Creating or deactivating a coupon is visible on the next lookup
+    from app.app import db
+    from app.services.coupon_service import CouponService
+
+    with app.app_context():
+        service = CouponService()
+        assert service.get_active_coupon('FRESH') is None
+        coupon = Coupons(code='FRESH', difficulty=1, discount_percent=5.0, is_active=True)
+        db.session.add(coupon)
+        db.session.commit()
+        assert service.get_active_coupon('FRESH')['id'] == coupon.id
+        coupon.is_active = False
+        db.session.commit()
+        assert service.get_active_coupon('FRESH') is None
+        assert service.list_active_coupons() == []
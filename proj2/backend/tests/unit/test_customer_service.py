@@ -1,6 +1,6 @@
 import pytest
 from app.services.customer_service import CustomerService
-from app.models import Theatres, PaymentMethods, CartItems, Seats, Products
+from app.models import Theatres, PaymentMethods, CartItems, Seats, Products, Auditoriums, CustomerShowings, Deliveries
 from app.app import db
 from decimal import Decimal
 
@@ -370,6 +370,8 @@ class TestCustomerService:
             assert cs.customer_id == sample_customer
             assert cs.movie_showing_id == sample_showing
             assert cs.seat_id == seat.id
+            assert cs.auditorium_id == sample_auditorium
+            assert cs.theatre_id == Auditoriums.query.filter_by(id=sample_auditorium).first().theatre_id
 
     # Charge a payment method and confirm the balance decreases
     def test_charge_payment_method_success(self, app, sample_customer, sample_product, sample_payment_method):
@@ -451,6 +453,15 @@ class TestCustomerService:
             assert "donation" in details  # Added: verify donation field exists
             assert details["id"] == sample_delivery
 
+    # Deliveries created without venue ids get them filled in on flush
+    def test_delivery_venue_columns_filled(self, app, sample_delivery, sample_customer_showing, sample_theatre):
+        with app.app_context():
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            showing = CustomerShowings.query.filter_by(id=sample_customer_showing).first()
+            assert showing.theatre_id == sample_theatre
+            assert delivery.theatre_id == sample_theatre
+            assert delivery.auditorium_id == showing.auditorium_id
+
     # get_delivery_details should raise when the delivery id does not exist
     def test_get_delivery_details_invalid(self, app):
         from app.models import Deliveries
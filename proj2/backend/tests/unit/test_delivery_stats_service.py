@@ -0,0 +1,87 @@
+import pytest
+from datetime import datetime, timedelta
+from app.app import db
+from app.models import Deliveries, TheatreDeliveryCounters, TheatreDeliveryThroughput
+from app.services.delivery_stats_service import DeliveryStatsService, THROUGHPUT_MAX_WINDOWS
+
+
+class TestDeliveryStatsService:
+    # A new delivery is counted as pending at its theatre
+    def test_new_delivery_counted(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            counts = DeliveryStatsService().get_status_counts(sample_theatre)
+            assert counts['pending'] == 1
+            assert counts['fulfilled'] == 0
+
+    # A status change moves the count from the old status to the new one
+    def test_transition_moves_count(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            delivery.delivery_status = 'accepted'
+            db.session.commit()
+            counts = DeliveryStatsService().get_status_counts(sample_theatre)
+            assert counts['pending'] == 0
+            assert counts['accepted'] == 1
+            throughput = DeliveryStatsService().get_throughput(sample_theatre, windows=1)
+            assert throughput[-1]['counts']['accepted'] == 1
+
+    # Rolled-back transitions leave the counters untouched
+    def test_rollback_discards_counter_update(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            delivery.delivery_status = 'cancelled'
+            db.session.flush()
+            db.session.rollback()
+            counts = DeliveryStatsService().get_status_counts(sample_theatre)
+            assert counts['pending'] == 1
+            assert counts['cancelled'] == 0
+
+    # Deleting a delivery removes it from the counts
+    def test_delete_decrements(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            db.session.delete(Deliveries.query.filter_by(id=sample_delivery).first())
+            db.session.commit()
+            assert DeliveryStatsService().get_status_counts(sample_theatre)['pending'] == 0
+
+    # Oldest pending age is reported only while something is pending
+    def test_oldest_pending_age(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            service = DeliveryStatsService()
+            assert service.get_oldest_pending_age(sample_theatre) >= 0
+            Deliveries.query.filter_by(id=sample_delivery).first().delivery_status = 'fulfilled'
+            db.session.commit()
+            assert service.get_oldest_pending_age(sample_theatre) is None
+
+    # Pending deliveries not yet backfilled with a theatre_id still count towards the oldest age
+    def test_oldest_pending_age_legacy_row(self, app, sample_theatre, sample_delivery):
+        with app.app_context():
+            Deliveries.query.filter_by(id=sample_delivery).update({'theatre_id': None, 'auditorium_id': None})
+            db.session.commit()
+            assert DeliveryStatsService().get_oldest_pending_age(sample_theatre) >= 0
+
+    # Unknown theatre and bad window counts raise
+    def test_get_delivery_stats_errors(self, app, sample_theatre):
+        with app.app_context():
+            service = DeliveryStatsService()
+            with pytest.raises(ValueError, match="not found"):
+                service.get_delivery_stats(999999)
+            with pytest.raises(ValueError, match="between 1 and"):
+                service.get_throughput(sample_theatre, windows=0)
+            with pytest.raises(ValueError, match="between 1 and"):
+                service.get_throughput(sample_theatre, windows=THROUGHPUT_MAX_WINDOWS + 1)
+
+    # Windows older than the longest served range are pruned, recent ones kept
+    def test_prune_throughput(self, app, sample_theatre):
+        with app.app_context():
+            now = datetime.now().replace(second=0, microsecond=0)
+            db.session.add_all([
+                TheatreDeliveryThroughput(theatre_id=sample_theatre, window_start=now - timedelta(days=2),
+                                          delivery_status='pending', transition_count=3),
+                TheatreDeliveryThroughput(theatre_id=sample_theatre, window_start=now - timedelta(hours=1),
+                                          delivery_status='pending', transition_count=1),
+            ])
+            db.session.commit()
+            assert DeliveryStatsService().prune_throughput() == 1
+            db.session.commit()
+            rows = TheatreDeliveryThroughput.query.filter_by(theatre_id=sample_theatre).all()
+            assert [row.transition_count for row in rows] == [1]
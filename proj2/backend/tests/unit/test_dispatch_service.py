@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta
+from app.app import db
+from app.models import Users, Drivers, Deliveries, Staff
+from app.services.dispatch_service import DispatchService
+
+
+def _make_stale(delivery_id, status, driver_id=None, staff_id=None, age=timedelta(days=2)):
+    # Push a delivery's last_updated far into the past so it breaches every SLA
+    delivery = Deliveries.query.filter_by(id=delivery_id).first()
+    delivery.delivery_status = status
+    delivery.driver_id = driver_id
+    delivery.staff_id = staff_id
+    delivery.last_updated = datetime.now() - age
+    db.session.commit()
+    return delivery
+
+
+def _create_driver(email, phone, duty_status='available'):
+    # Create an extra driver so re-dispatch has someone else to pick
+    user = Users(name='Backup Driver', email=email, phone=phone, birthday=datetime(1990, 1, 1),
+                 password_hash='mock-test-hash', role='driver')
+    db.session.add(user)
+    db.session.flush()
+    driver = Drivers(user_id=user.id, license_plate='BAK123', vehicle_type='car', vehicle_color='red',
+                     duty_status=duty_status, rating=4.0, total_deliveries=0)
+    db.session.add(driver)
+    db.session.commit()
+    return user.id
+
+
+class TestDispatchService:
+    def test_sweep_releases_stuck_driver_and_reassigns(self, app, sample_delivery, sample_driver, sample_staff):
+        # An accepted delivery past its SLA is moved to a different driver
+        with app.app_context():
+            Drivers.query.filter_by(user_id=sample_driver).first().duty_status = 'on_delivery'
+            staff = Staff.query.filter_by(user_id=sample_staff).first()
+            staff.is_available = False
+            staff.active_deliveries = 1
+            db.session.commit()
+            _make_stale(sample_delivery, 'accepted', driver_id=sample_driver, staff_id=sample_staff)
+            backup_id = _create_driver('backup@example.com', '5550001111')
+
+            result = DispatchService().sweep_stale_deliveries()
+
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            assert result == {'found': 1, 'requeued': 1, 'reassigned': 1}
+            assert delivery.driver_id == backup_id
+            assert delivery.delivery_status == 'accepted'
+            assert Drivers.query.filter_by(user_id=sample_driver).first().duty_status == 'available'
+            assert delivery.staff_id == sample_staff
+            assert Staff.query.filter_by(user_id=sample_staff).first().active_deliveries == 1
+
+    def test_sweep_requeues_when_no_driver_available(self, app, sample_delivery, sample_driver):
+        # Without another free driver the delivery goes back to pending
+        with app.app_context():
+            Drivers.query.filter_by(user_id=sample_driver).first().duty_status = 'on_delivery'
+            db.session.commit()
+            _make_stale(sample_delivery, 'accepted', driver_id=sample_driver)
+
+            result = DispatchService().sweep_stale_deliveries()
+
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            assert result['requeued'] == 1
+            assert result['reassigned'] == 0
+            assert delivery.delivery_status == 'pending'
+            assert delivery.driver_id is None
+
+    def test_sweep_retries_stale_pending(self, app, sample_delivery, sample_driver):
+        # Pending deliveries past the SLA are retried without a release
+        with app.app_context():
+            _make_stale(sample_delivery, 'pending')
+
+            result = DispatchService().sweep_stale_deliveries()
+
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            assert result == {'found': 1, 'requeued': 0, 'reassigned': 1}
+            assert delivery.driver_id == sample_driver
+
+    def test_sweep_ignores_fresh_deliveries(self, app, sample_delivery, sample_driver):
+        # Deliveries within their SLA are left untouched
+        with app.app_context():
+            _make_stale(sample_delivery, 'accepted', driver_id=sample_driver, age=timedelta(0))
+
+            result = DispatchService().sweep_stale_deliveries()
+
+            assert result['found'] == 0
+            assert Deliveries.query.filter_by(id=sample_delivery).first().driver_id == sample_driver
+
+    def test_metrics_accumulate(self, app, sample_delivery):
+        # Each sweep bumps the run counter
+        with app.app_context():
+            before = DispatchService.get_metrics().get('runs', 0)
+            DispatchService().sweep_stale_deliveries()
+            assert DispatchService.get_metrics()['runs'] == before + 1
@@ -541,3 +541,47 @@ class TestDriverService:
         with app.app_context():
             with pytest.raises(ValueError, match=f"No active delivery found for driver {driver_id}"):
                 driver_service.get_active_delivery(driver_id)
+
+    def _bulk_driver_row(self, suffix, **overrides):
+        row = {
+            'name': f'Bulk Driver {suffix}', 'email': f'bulk_{suffix}@test.com', 'phone': f'555100{suffix}',
+            'birthday': '1995-01-01', 'password': 'testpass', 'license_plate': f'BULK{suffix}',
+            'vehicle_type': 'car', 'vehicle_color': 'Red', 'duty_status': STATUS_AVAILABLE,
+            'rating': '5.0', 'total_deliveries': 0,
+        }
+        row.update(overrides)
+        return row
+
+    def test_create_drivers_bulk_success(self, app, driver_service):
+        # Every valid row is created with its driver record
+        with app.app_context():
+            results = driver_service.create_drivers_bulk([self._bulk_driver_row('0001'), self._bulk_driver_row('0002')])
+            assert [r['status'] for r in results] == ['created', 'created']
+            for result in results:
+                driver = Drivers.query.filter_by(user_id=result['user_id']).first()
+                assert driver.vehicle_type == 'car'
+                assert Users.query.get(result['user_id']).role == 'driver'
+
+    def test_create_drivers_bulk_partial(self, app, driver_service, sample_driver):
+        # Invalid, duplicate and already-used rows are reported while the rest are created
+        with app.app_context():
+            results = driver_service.create_drivers_bulk([
+                self._bulk_driver_row('0001'),
+                self._bulk_driver_row('0002', email='driver@example.com'),
+                self._bulk_driver_row('0003', license_plate='XYZ1234'),
+                self._bulk_driver_row('0004', license_plate='BULK0001'),
+                self._bulk_driver_row('0005', vehicle_type='boat'),
+            ])
+            assert results[0]['status'] == 'created'
+            assert results[1] == {'index': 1, 'status': 'error', 'error': 'Email already in use'}
+            assert results[2]['error'] == 'License plate already in use'
+            assert results[3]['error'] == 'Duplicate license plate in batch (row 0)'
+            assert results[4]['status'] == 'error'
+            assert Drivers.query.filter(Drivers.license_plate.like('BULK%')).count() == 1
+
+    def test_create_drivers_bulk_too_many_rows(self, app, driver_service):
+        # Batches over the configured limit are rejected outright
+        with app.app_context():
+            app.config['BULK_ONBOARDING_MAX_ROWS'] = 1
+            with pytest.raises(ValueError, match="At most 1 rows can be created per request"):
+                driver_service.create_drivers_bulk([self._bulk_driver_row('0001'), self._bulk_driver_row('0002')])
@@ -0,0 +1,80 @@
+import pytest
+import threading
+from app.hashing import PasswordHashPool, PasswordHashingBusy, get_password_hasher
+
+
+# Test class for hashing.py
+class TestPasswordHashPool:
+    # Hashes verify against the right password only
+    def test_hash_and_verify(self):
+        pool = PasswordHashPool(time_cost=1, memory_cost=1024, parallelism=1, workers=2)
+        password_hash = pool.hash('secret')
+        assert password_hash != 'secret'
+        assert pool.verify(password_hash, 'secret') is True
+        assert pool.verify(password_hash, 'wrong') is False
+
+    # Malformed hashes are treated as a failed verification
+    def test_verify_invalid_hash(self):
+        pool = PasswordHashPool(time_cost=1, memory_cost=1024, parallelism=1)
+        assert pool.verify('not-a-hash', 'secret') is False
+        assert pool.needs_rehash('not-a-hash') is False
+
+    # Hashes made with other parameters are flagged for rehash
+    def test_needs_rehash(self):
+        cheap = PasswordHashPool(time_cost=1, memory_cost=1024, parallelism=1)
+        stronger = PasswordHashPool(time_cost=2, memory_cost=2048, parallelism=1)
+        password_hash = cheap.hash('secret')
+        assert cheap.needs_rehash(password_hash) is False
+        assert stronger.needs_rehash(password_hash) is True
+
+    # A saturated pool rejects new work instead of queueing it
+    def test_admission_control(self):
+        pool = PasswordHashPool(time_cost=1, memory_cost=1024, parallelism=1, workers=1, queue_size=0,
+                                admission_timeout=0.01)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool._run, args=(blocking_job,))
+        worker.start()
+        started.wait(5)
+        with pytest.raises(PasswordHashingBusy):
+            pool.hash('secret')
+        release.set()
+        worker.join()
+        assert pool.verify(pool.hash('secret'), 'secret') is True
+
+    # A bulk batch keeps at most half the workers busy, leaving room for logins
+    def test_hash_many_bounded(self):
+        pool = PasswordHashPool(time_cost=1, memory_cost=1024, parallelism=1, workers=4, queue_size=0,
+                                admission_timeout=0.5)
+        hasher = pool.hasher
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        class CountingHasher:
+            def hash(self, password):
+                with lock:
+                    in_flight[0] += 1
+                    in_flight[1] = max(in_flight[1], in_flight[0])
+                try:
+                    return hasher.hash(password)
+                finally:
+                    with lock:
+                        in_flight[0] -= 1
+
+        pool.hasher = CountingHasher()
+        hashes = pool.hash_many([f'secret{i}' for i in range(12)])
+        assert in_flight[1] <= 2
+        assert hasher.verify(hashes[5], 'secret5')
+
+    # The app pool is built once from config
+    def test_get_password_hasher_from_config(self, app):
+        with app.app_context():
+            pool = get_password_hasher()
+            assert pool is get_password_hasher()
+            assert pool.hasher.time_cost == app.config['ARGON2_TIME_COST']
+            assert pool.hasher.memory_cost == app.config['ARGON2_MEMORY_COST']
@@ -0,0 +1,129 @@
+import pytest
+from app.identity import (
+    Principal, UserPrincipal, get_principal, get_role_record, principal_for,
+    load_user_principal, invalidate_user_principal,
+)
+from app.services.staff_service import StaffService
+from app.models import *
+from app.app import db
+
+
+# Test class for identity.py
+class TestIdentity:
+    # Role records are looked up once and reused within the same context
+    def test_get_role_record_memoized(self, app, sample_admin):
+        with app.app_context():
+            first = get_role_record(Staff, sample_admin)
+            second = get_role_record(Staff, sample_admin)
+            assert first is not None
+            assert first is second
+            assert first.role == 'admin'
+
+    # Users without the role get None, and that result is not memoized
+    def test_get_role_record_missing(self, app, sample_customer):
+        with app.app_context():
+            assert get_role_record(Staff, sample_customer) is None
+            assert get_role_record(Customers, sample_customer).user_id == sample_customer
+
+    # A memoized record that has since been deleted is not returned
+    def test_get_role_record_deleted(self, app, sample_staff):
+        with app.app_context():
+            staff = get_role_record(Staff, sample_staff)
+            db.session.delete(staff)
+            db.session.commit()
+            assert get_role_record(Staff, sample_staff) is None
+
+    # Without a login session the principal falls back to the body user_id
+    def test_get_principal_from_body(self, app, sample_admin):
+        with app.test_request_context(json={'user_id': sample_admin}):
+            principal = get_principal()
+            assert principal.user_id == sample_admin
+            assert principal.authenticated is False
+            assert principal.staff().role == 'admin'
+
+    # Outside the testing default the body user_id is honoured only on allow-listed endpoints
+    def test_get_principal_body_allow_list(self, app, sample_admin):
+        app.config['BODY_USER_ID_ENDPOINTS'] = 'staff.add_staff_bulk'
+        with app.test_request_context('/api/staff/bulk', method='POST', json={'user_id': sample_admin}):
+            assert get_principal().user_id == sample_admin
+        with app.test_request_context('/api/driver/bulk', method='POST', json={'user_id': sample_admin}):
+            assert get_principal() is None
+        app.config['BODY_USER_ID_ENDPOINTS'] = ''
+        with app.test_request_context('/api/staff/bulk', method='POST', json={'user_id': sample_admin}):
+            assert get_principal() is None
+
+    # No session and no body user_id resolves to no principal
+    def test_get_principal_anonymous(self, app):
+        with app.test_request_context():
+            assert get_principal() is None
+
+    # The principal is resolved once per request, not once per app context
+    def test_get_principal_per_request(self, app, sample_admin, sample_staff):
+        with app.app_context():
+            with app.test_request_context(json={'user_id': sample_admin}):
+                first = get_principal()
+                assert get_principal() is first
+            with app.test_request_context(json={'user_id': sample_staff}):
+                assert get_principal().user_id == sample_staff
+
+    # Services built from the same user id share the request principal
+    def test_principal_for_reuses_request_principal(self, app, sample_admin, sample_staff):
+        with app.test_request_context(json={'user_id': sample_admin}):
+            principal = get_principal()
+            assert principal_for(sample_admin) is principal
+            assert StaffService(sample_admin).principal is principal
+            assert principal_for(sample_staff) is not principal
+
+    # Services accept a principal directly and authorize against its records
+    def test_service_with_principal(self, app, sample_admin, sample_staff):
+        with app.app_context():
+            assert StaffService(principal=Principal(sample_admin)).validate_admin().role == 'admin'
+            with pytest.raises(ValueError, match="Unauthorized User - Not an admin"):
+                StaffService(principal=Principal(sample_staff)).validate_admin()
+
+    # The user_loader principal is cached and carries the profile fields
+    def test_load_user_principal_cached(self, app, sample_user):
+        with app.app_context():
+            principal = load_user_principal(sample_user)
+            assert principal.id == sample_user
+            assert principal.email == 'test@example.com'
+            assert principal.is_authenticated
+            assert load_user_principal(sample_user) is principal
+
+    # Unknown users resolve to None
+    def test_load_user_principal_missing(self, app):
+        with app.app_context():
+            assert load_user_principal(999999) is None
+
+    # Invalidation drops the entry so the next load sees the current row
+    def test_invalidate_user_principal(self, app, sample_user):
+        with app.app_context():
+            principal = load_user_principal(sample_user)
+            Users.query.filter_by(id=sample_user).update({'name': 'Changed'})
+            db.session.commit()
+            assert load_user_principal(sample_user) is principal
+            invalidate_user_principal(sample_user)
+            assert load_user_principal(sample_user).name == 'Changed'
+
+    # A load that raced with an invalidation does not cache the old row
+    def test_invalidate_during_load_not_cached(self, app, sample_user, monkeypatch):
+        with app.app_context():
+            original = UserPrincipal.__init__
+
+            def invalidate_mid_load(self, user):
+                original(self, user)
+                invalidate_user_principal(user.id)
+
+            monkeypatch.setattr(UserPrincipal, '__init__', invalidate_mid_load)
+            first = load_user_principal(sample_user)
+            monkeypatch.setattr(UserPrincipal, '__init__', original)
+            assert load_user_principal(sample_user) is not first
+
+    # Load records are dropped once no load is running, so invalidations do not accumulate per user
+    def test_load_records_pruned(self, app, sample_user):
+        with app.app_context():
+            load_user_principal(sample_user)
+            invalidate_user_principal(sample_user)
+            invalidate_user_principal(999999)
+            assert load_user_principal(999999) is None
+            assert app.extensions['user_principal_loads'] == {}
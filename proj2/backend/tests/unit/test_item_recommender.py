@@ -0,0 +1,88 @@
+import pytest
+from app.app import db
+from app.models import CartItems, DeliveryItems, Deliveries, CustomerShowings
+from app.services.item_recommender import ItemRecommender, get_customer_item_history, recommend_items
+
+
+# Rows as returned by the refresh query: (delivery_item_id, delivery_id, product_id, bundle_id)
+ROWS = [
+    (1, 10, 1, None), (2, 10, 2, None),
+    (3, 11, 1, None), (4, 11, None, 5),
+    (5, 12, 3, None),
+]
+
+
+class TestItemRecommender:
+    # Co-occurrence counts pairs per delivery and popularity on the diagonal
+    def test_fold_builds_cooccurrence(self):
+        recommender = ItemRecommender()
+        recommender._fold(ROWS)
+        assert recommender.items == [('product', 1), ('product', 2), ('bundle', 5), ('product', 3)]
+        assert recommender.score({}) == [
+            (('product', 1), 2.0), (('product', 2), 1.0), (('bundle', 5), 1.0), (('product', 3), 1.0)
+        ]
+
+    # Items bought with the customer's history rank first; history itself is excluded
+    def test_score_from_history(self):
+        recommender = ItemRecommender()
+        recommender._fold(ROWS)
+        assert recommender.score({('product', 1): 3}) == [(('product', 2), 3.0), (('bundle', 5), 3.0)]
+        assert recommender.score({('product', 3): 1}) == []
+
+    # Later folds add new items and counts without rebuilding
+    def test_incremental_fold(self):
+        recommender = ItemRecommender()
+        recommender._fold(ROWS)
+        recommender._fold([(6, 13, 1, None), (7, 13, 2, None), (8, 13, 4, None)])
+        ranked = recommender.score({('product', 1): 1})
+        assert ranked[0] == (('product', 2), 2.0)
+        assert (('product', 4), 1.0) in ranked
+
+    # An empty model scores nothing
+    def test_empty_model(self):
+        assert ItemRecommender().score({('product', 1): 1}) == []
+
+    # Refresh reads delivery history from the database and only new rows after that
+    def test_refresh_and_recommend(self, app, sample_delivery, sample_product):
+        with app.app_context():
+            delivery = Deliveries.query.get(sample_delivery)
+            customer_id = CustomerShowings.query.get(delivery.customer_showing_id).customer_id
+            cart_item = CartItems(product_id=sample_product, quantity=1, customer_id=customer_id)
+            db.session.add(cart_item)
+            db.session.commit()
+            db.session.add(DeliveryItems(delivery_id=sample_delivery, cart_item_id=cart_item.id))
+            db.session.commit()
+
+            recommender = ItemRecommender()
+            assert recommender.refresh() == 1
+            assert recommender.refresh() == 0
+            assert get_customer_item_history(customer_id) == {('product', sample_product): 1}
+
+            # A new customer gets the most popular available items
+            items = recommend_items(customer_id + 100000)
+            assert items[0]['type'] == 'product'
+            assert items[0]['id'] == sample_product
+            assert items[0]['reason'] == 'Popular with other moviegoers'
+
+    # Rows committed behind the high-water mark are folded once; cancelled deliveries drop out on rebuild
+    def test_refresh_overlap_and_rebuild(self, app, sample_delivery, sample_product):
+        with app.app_context():
+            delivery = Deliveries.query.get(sample_delivery)
+            customer_id = CustomerShowings.query.get(delivery.customer_showing_id).customer_id
+            cart_item = CartItems(product_id=sample_product, quantity=1, customer_id=customer_id)
+            db.session.add(cart_item)
+            db.session.commit()
+            item = DeliveryItems(delivery_id=sample_delivery, cart_item_id=cart_item.id)
+            db.session.add(item)
+            db.session.commit()
+
+            recommender = ItemRecommender(overlap=10)
+            recommender.last_delivery_item_id = item.id + 5
+            assert recommender.refresh() == 1
+            assert recommender.refresh() == 0
+            assert recommender.popularity() == {('product', sample_product): 1.0}
+
+            delivery.delivery_status = 'cancelled'
+            db.session.commit()
+            assert recommender.rebuild() == 0
+            assert recommender.popularity() == {}
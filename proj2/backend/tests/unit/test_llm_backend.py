@@ -0,0 +1,109 @@
+import pytest
+import threading
+import time
+from app.services.llm_backend import (
+    CircuitBreaker, LLMGateway, LLMUnavailable, RecommendationBackend, get_llm_gateway,
+)
+
+
+class FakeBackend(RecommendationBackend):
+    """Backend that records calls and can block, fail or answer."""
+
+    def __init__(self, reply='{"recommendations": "Nachos"}', delay=0.0, error=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def complete(self, prompt, timeout):
+        self.calls += 1
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.reply
+
+
+# Test class for llm_backend.py
+class TestLLMGateway:
+    # Replies come back through the worker pool
+    def test_call_returns_reply(self):
+        gateway = LLMGateway(FakeBackend(), timeout=1)
+        assert gateway.call(1, 'prompt') == '{"recommendations": "Nachos"}'
+
+    # Concurrent calls for the same key share a single backend call
+    def test_concurrent_calls_coalesced(self):
+        backend = FakeBackend()
+        backend.release.clear()
+        gateway = LLMGateway(backend, timeout=5)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(gateway.call(7, 'prompt'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        backend.release.set()
+        for thread in threads:
+            thread.join()
+        assert backend.calls == 1
+        assert len(results) == 5
+
+    # A slow backend is cut off at the deadline
+    def test_deadline(self):
+        gateway = LLMGateway(FakeBackend(delay=0.5), timeout=0.05)
+        started = time.monotonic()
+        with pytest.raises(LLMUnavailable, match="did not answer"):
+            gateway.call(1, 'prompt')
+        assert time.monotonic() - started < 0.4
+
+    # Backend errors surface as LLMUnavailable
+    def test_backend_error(self):
+        gateway = LLMGateway(FakeBackend(error=RuntimeError("503")), timeout=1)
+        with pytest.raises(LLMUnavailable, match="503"):
+            gateway.call(1, 'prompt')
+
+    # Repeated failures open the circuit and later calls skip the backend
+    def test_circuit_opens(self):
+        backend = FakeBackend(error=RuntimeError("down"))
+        gateway = LLMGateway(backend, timeout=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for _ in range(2):
+            with pytest.raises(LLMUnavailable):
+                gateway.call(1, 'prompt')
+        with pytest.raises(LLMUnavailable, match="circuit is open"):
+            gateway.call(1, 'prompt')
+        assert backend.calls == 2
+        assert gateway.breaker.state == 'open'
+
+    # The app gateway is built once from config
+    def test_get_llm_gateway_from_config(self, app):
+        with app.app_context():
+            app.config['LLM_TIMEOUT_SECS'] = 3
+            gateway = get_llm_gateway('fake_key', 'mistral-small')
+            assert gateway.timeout == 3
+            assert get_llm_gateway('fake_key', 'mistral-small') is gateway
+
+
+# Test class for CircuitBreaker
+class TestCircuitBreaker:
+    # After the reset timeout one probe is allowed; success closes the breaker
+    def test_half_open_probe_success(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        assert breaker.allow() is False
+        time.sleep(0.02)
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+        breaker.record_success()
+        assert breaker.state == 'closed'
+        assert breaker.allow() is True
+
+    # A failed probe opens the breaker again
+    def test_half_open_probe_failure(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.01)
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow() is True
+        breaker.record_failure()
+        assert breaker.state == 'open'
@@ -0,0 +1,94 @@
+import pytest
+from app.app import db
+from app.models import Movies, Products
+from app.services.pairing_service import PairingIndex, get_pairing_index, get_showing_pairings, mark_pairings_changed
+
+
+@pytest.fixture
+def themed_products(app, sample_supplier):
+    """Add a spicy and a sweet product with keywords."""
+    with app.app_context():
+        spicy = Products(supplier_id=sample_supplier, name='Nachos', unit_price=4.50, inventory_quantity=10,
+                         category='snacks', keywords='spicy action crunchy', is_available=True)
+        sweet = Products(supplier_id=sample_supplier, name='Chocolate', unit_price=3.00, inventory_quantity=10,
+                         category='candy', keywords='sweet romance', is_available=True)
+        db.session.add_all([spicy, sweet])
+        db.session.commit()
+        return spicy.id, sweet.id
+
+
+# Test class for pairing_service.py
+class TestPairingService:
+    # The product sharing the movie's genre and keywords ranks first
+    def test_pairs_by_keywords(self, app, sample_showing, themed_products):
+        with app.app_context():
+            spicy, sweet = themed_products
+            result = get_showing_pairings(sample_showing)
+            ids = [p['id'] for p in result['pairings']]
+            assert ids[0] == spicy
+            assert sweet not in ids
+            assert result['pairings'][0]['name'] == 'Nachos'
+
+    # Products with nothing in common with the movie are not paired
+    def test_no_overlap_returns_nothing(self, app, sample_movie, sample_product):
+        with app.app_context():
+            index = PairingIndex()
+            index.build()
+            assert index.pairings(sample_movie) == []
+
+    # Product edits are folded in incrementally on the next lookup
+    def test_incremental_product_edit(self, app, sample_movie, themed_products):
+        with app.app_context():
+            spicy, sweet = themed_products
+            index = get_pairing_index()
+            built_at = index.built_at
+            Products.query.get(sweet).keywords = 'action sweet'
+            db.session.commit()
+            mark_pairings_changed('product', sweet)
+            index = get_pairing_index()
+            assert index.built_at == built_at
+            assert sweet in [p['id'] for p in index.pairings(sample_movie)]
+
+            Products.query.get(spicy).is_available = False
+            db.session.commit()
+            mark_pairings_changed('product', spicy)
+            assert spicy not in [p['id'] for p in get_pairing_index().pairings(sample_movie)]
+
+    # Edits queued while a build is running stay pending for the next fold
+    def test_edit_during_build_kept(self, app, sample_movie, themed_products):
+        with app.app_context():
+            spicy, sweet = themed_products
+            index = PairingIndex()
+            index.mark_changed('product', spicy)
+            rank = index._rank
+
+            def rank_and_mark(state, rows=None):
+                index.mark_changed('product', sweet)
+                return rank(state, rows)
+
+            index._rank = rank_and_mark
+            index.build()
+            index._rank = rank
+            assert index._pending == {('product', sweet)}
+            index.apply_pending()
+            assert index._pending == set()
+
+    # A movie edit that brings a new word triggers a full rebuild
+    def test_new_word_rebuilds(self, app, sample_movie, themed_products):
+        with app.app_context():
+            spicy, sweet = themed_products
+            index = get_pairing_index()
+            movie = Movies.query.get(sample_movie)
+            movie.genre = 'Romance'
+            movie.keywords = 'heartfelt'
+            db.session.commit()
+            mark_pairings_changed('movie', sample_movie)
+            assert [p['id'] for p in get_pairing_index().pairings(sample_movie)] == [sweet]
+
+    # Unknown showings and bad limits raise
+    def test_invalid_arguments(self, app, sample_showing):
+        with app.app_context():
+            with pytest.raises(ValueError, match="not found"):
+                get_showing_pairings(999999)
+            with pytest.raises(ValueError, match="limit"):
+                get_showing_pairings(sample_showing, limit=0)
@@ -0,0 +1,57 @@
+import time
+import pytest
+from app.rate_limit import MemoryTokenBucketStore, parse_limit
+
+
+# Test class for rate_limit.py
+class TestRateLimit:
+    # A bucket allows its burst, then reports how long to wait
+    def test_bucket_burst_then_wait(self):
+        store = MemoryTokenBucketStore()
+        assert [store.take('k', 2, 60) for _ in range(2)] == [0.0, 0.0]
+        wait = store.take('k', 2, 60)
+        assert 29 < wait <= 30
+        assert store.take('other', 2, 60) == 0.0
+
+    # Tokens come back at capacity/period per second
+    def test_bucket_refills(self):
+        store = MemoryTokenBucketStore()
+        store.take('k', 1, 0.05)
+        assert store.take('k', 1, 0.05) > 0
+        time.sleep(0.06)
+        assert store.take('k', 1, 0.05) == 0.0
+
+    # Buckets that have refilled are evicted on the next sweep
+    def test_full_buckets_evicted(self):
+        store = MemoryTokenBucketStore(evict_interval=0)
+        store.take('idle', 1, 0.01)
+        time.sleep(0.02)
+        store.take('busy', 5, 60)
+        assert len(store) == 1
+
+    # Limits parse as '<requests>/<seconds>' and '0' disables them
+    def test_parse_limit(self):
+        assert parse_limit('10/60') == (10, 60.0)
+        assert parse_limit('0') is None
+        assert parse_limit('') is None
+        with pytest.raises(ValueError):
+            parse_limit('0/60')
+
+    # Login attempts past the per-account limit get 429 before credentials are checked
+    def test_login_limited_per_account(self, app, client):
+        app.config['RATE_LIMIT_ENABLED'] = True
+        app.config['RATE_LIMIT_LOGIN_PER_ACCOUNT'] = '2/60'
+        payload = {'email': 'nobody@example.com', 'password': 'wrong'}
+        statuses = [client.post('/api/users/login', json=payload).status_code for _ in range(3)]
+        assert statuses == [401, 401, 429]
+        res = client.post('/api/users/login', json={'email': 'other@example.com', 'password': 'wrong'})
+        assert res.status_code == 401
+
+    # Coupon endpoints share a per-IP bucket and return Retry-After
+    def test_coupon_limited_per_ip(self, app, client):
+        app.config['RATE_LIMIT_ENABLED'] = True
+        app.config['RATE_LIMIT_COUPON_PER_IP'] = '1/60'
+        assert client.post('/api/coupons/apply', json={}).status_code == 400
+        res = client.get('/api/coupons/ANY/puzzle')
+        assert res.status_code == 429
+        assert int(res.headers['Retry-After']) >= 1
@@ -0,0 +1,92 @@
+import json
+import pytest
+from app.models import *
+from app.app import db
+from app.services.llm_backend import LLMGateway
+from app.services.recommendation_eval import (
+    EvalDataset, PopularityBackend, CoOccurrenceBackend, LLMPromptBackend, StubLLMBackend,
+    evaluate, _percentile,
+)
+
+
+@pytest.fixture
+def two_orders(app, sample_delivery, sample_product, sample_product_extra):
+    """Give the sample customer two deliveries: Popcorn, then Popcorn and the extra product."""
+    with app.app_context():
+        first = Deliveries.query.get(sample_delivery)
+        customer_id = CustomerShowings.query.get(first.customer_showing_id).customer_id
+        second = Deliveries(driver_id=first.driver_id, customer_showing_id=first.customer_showing_id,
+                            payment_method_id=first.payment_method_id, payment_status="pending",
+                            total_price=10.00, delivery_status="pending")
+        db.session.add(second)
+        db.session.commit()
+        for delivery_id, product_id in [(first.id, sample_product), (second.id, sample_product),
+                                        (second.id, sample_product_extra)]:
+            cart_item = CartItems(customer_id=customer_id, product_id=product_id, quantity=1)
+            db.session.add(cart_item)
+            db.session.commit()
+            db.session.add(DeliveryItems(delivery_id=delivery_id, cart_item_id=cart_item.id))
+        db.session.commit()
+        return customer_id
+
+
+# Test class for recommendation_eval.py
+class TestRecommendationEval:
+    # The latest order is held out and kept out of the training rows
+    def test_dataset_holds_out_latest_order(self, app, two_orders, sample_product, sample_product_extra):
+        with app.app_context():
+            dataset = EvalDataset()
+            customer = dataset.customers[two_orders]
+            assert customer['target'] == {('product', sample_product), ('product', sample_product_extra)}
+            assert len(customer['history']) == 1
+            assert len(dataset.training_rows) == 1
+
+    # Customers without enough history are not evaluated
+    def test_dataset_min_history(self, app, two_orders):
+        with app.app_context():
+            assert two_orders not in EvalDataset(min_history=2).customers
+
+    # Local backends report hit rate, coverage and latency without token cost
+    def test_evaluate_local_backends(self, app, two_orders):
+        with app.app_context():
+            dataset = EvalDataset()
+            for backend in (PopularityBackend(), CoOccurrenceBackend()):
+                result = evaluate(backend, dataset, k=3)
+                assert result['users'] == 1
+                assert 0.0 <= result['hit_rate_at_k'] <= 1.0
+                assert 0.0 <= result['coverage'] <= 1.0
+                assert result['cost_per_1k_users'] == 0.0
+                assert result['latency_ms']['p99'] >= result['latency_ms']['p50']
+
+    # The LLM pipeline runs offline against the stub and is charged for tokens
+    def test_evaluate_llm_stub(self, app, two_orders, sample_product):
+        with app.app_context():
+            dataset = EvalDataset()
+            backend = LLMPromptBackend(LLMGateway(StubLLMBackend(picks=5), timeout=1))
+            result = evaluate(backend, dataset, k=5, input_price_per_1m=1.0, output_price_per_1m=1.0)
+            assert result['users'] == 1
+            assert result['hit_rate_at_k'] == 1.0
+            assert result['cost_per_1k_users'] > 0.0
+
+    # The LLM menu is ranked from training rows only, so the held-out order does not leak into it
+    def test_llm_menu_excludes_held_out_orders(self, app, two_orders, sample_supplier):
+        with app.app_context():
+            app.config['RECOMMENDATION_MENU_TOP_K'] = 1
+            db.session.add(Products(supplier_id=sample_supplier, name='Juice', unit_price=2.50,
+                                    inventory_quantity=10, category='beverages', is_available=True))
+            db.session.commit()
+            backend = LLMPromptBackend(LLMGateway(StubLLMBackend(), timeout=1))
+            backend.fit(EvalDataset())
+            beverages = [item for item in backend.menu_data['products'] if 'Juice' in item or 'Soda' in item]
+            assert beverages == ['Juice ($2.50)']
+
+    # The stub names the first products listed in the prompt
+    def test_stub_llm_reply(self):
+        reply = StubLLMBackend(picks=2).complete("Products: Popcorn ($5.99), Soda ($2.00), Nachos ($4.00)\n", 1)
+        assert json.loads(reply)['recommendations'] == "You might enjoy Popcorn, Soda!"
+
+    # Percentiles use the nearest-rank method
+    def test_percentile(self):
+        assert _percentile([], 50) == 0.0
+        assert _percentile([1, 2, 3, 4], 50) == 2
+        assert _percentile(list(range(1, 101)), 99) == 99
@@ -14,7 +14,7 @@ class TestRecommendationService:
 
     # --- Logic & "Happy Path" Tests ---
 
-    @patch("app.services.recommendation_service.Mistral")
+    @patch("app.services.llm_backend.Mistral")
     def test_get_recommendations_success(self, mock_mistral, app, sample_customer):
         """Test the standard successful flow with a valid JSON response."""
         
@@ -41,7 +41,7 @@ class TestRecommendationService:
         # We don't check the exact string, just that it reached the client
         mock_client.chat.complete.assert_called_once()
 
-    @patch("app.services.recommendation_service.Mistral")
+    @patch("app.services.llm_backend.Mistral")
     def test_get_recommendations_json_decode_error(self, mock_mistral, app, sample_customer):
         """Test resilience when Mistral returns plain text instead of JSON."""
         mock_client = MagicMock()
@@ -61,7 +61,7 @@ class TestRecommendationService:
         assert result["type"] == "text"
         assert result["recommendations"] == raw_text
 
-    @patch("app.services.recommendation_service.Mistral")
+    @patch("app.services.llm_backend.Mistral")
     def test_get_recommendations_api_failure(self, mock_mistral, app, sample_customer):
         """Test graceful failure when Mistral API throws an exception."""
         mock_client = MagicMock()
@@ -75,6 +75,27 @@ class TestRecommendationService:
         # Should return a safe fallback message
         assert "trouble reaching our AI chef" in result["recommendations"]
 
+    @pytest.mark.parametrize("content", [
+        None,
+        [{"type": "text", "text": '{"recommendations": "Nachos"}'}],
+        '["Nachos", "Soda"]',
+        '"Nachos"',
+    ])
+    @patch("app.services.llm_backend.Mistral")
+    def test_get_recommendations_unexpected_content(self, mock_mistral, content, app, sample_customer):
+        """Replies that are not text, or JSON that is not an object, take the fallback path."""
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        mock_client.chat.complete.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content=content))]
+        )
+
+        with app.app_context():
+            service = RecommendationService()
+            result = service.get_recommendations(user_id=sample_customer)
+
+        assert "trouble reaching our AI chef" in result["recommendations"]
+
     def test_customer_not_found(self, app):
         """Test that invalid user_ids raise the correct error."""
         with app.app_context():
@@ -120,6 +141,40 @@ class TestRecommendationService:
             assert "Popcorn" in history[0]['items'][0] 
             assert "snacks" in history[0]['items'][0]
 
+    def test_get_user_order_history_latest_orders_oldest_first(self, app, sample_delivery, sample_product):
+        """Only the latest `limit` orders are returned, oldest first, and empty deliveries are skipped."""
+        from app.models import DeliveryItems, CartItems, db
+
+        with app.app_context():
+            first = Deliveries.query.get(sample_delivery)
+            customer_user_id = CustomerShowings.query.get(first.customer_showing_id).customer_id
+            delivery_ids = [first.id]
+            for _ in range(2):
+                delivery = Deliveries(driver_id=first.driver_id, customer_showing_id=first.customer_showing_id,
+                                      payment_method_id=first.payment_method_id, payment_status="pending",
+                                      total_price=5.00, delivery_status="pending")
+                db.session.add(delivery)
+                db.session.commit()
+                delivery_ids.append(delivery.id)
+            # A newer delivery without items must not take one of the slots
+            empty = Deliveries(driver_id=first.driver_id, customer_showing_id=first.customer_showing_id,
+                               payment_method_id=first.payment_method_id, payment_status="pending",
+                               total_price=0.00, delivery_status="pending")
+            db.session.add(empty)
+            for quantity, delivery_id in enumerate(delivery_ids, start=1):
+                cart_item = CartItems(product_id=sample_product, quantity=quantity, customer_id=customer_user_id)
+                db.session.add(cart_item)
+                db.session.commit()
+                db.session.add(DeliveryItems(delivery_id=delivery_id, cart_item_id=cart_item.id))
+            db.session.commit()
+
+            history = RecommendationService()._get_user_order_history(customer_user_id, limit=2)
+
+            assert len(history) == 2
+            dates = [Deliveries.query.get(delivery_id).date_added.isoformat() for delivery_id in delivery_ids[1:]]
+            assert [order['date'] for order in history] == dates
+            assert all(order['items'] == ["Popcorn (snacks)"] for order in history)
+
     def test_get_menu_items_integration(self, app, sample_product, sample_bundle):
         """Verify _get_menu_items retrieves products and bundles formatted correctly."""
         with app.app_context():
@@ -156,4 +211,201 @@ class TestRecommendationService:
             
             prompt = service._format_prompt(menu_data, history)
             assert "Popcorn" in prompt
-            assert "No previous orders" not in prompt
\ No newline at end of file
+            assert "No previous orders" not in prompt
+
+    def test_format_prompt_history_aggregated(self, app):
+        """History is rendered as item counts plus the latest order, not one line per order."""
+        with app.app_context():
+            service = RecommendationService()
+            menu_data = {'products': ['A'], 'bundles': ['B']}
+            history = [{'date': f'2023-01-0{day}', 'items': ['Popcorn (snacks)']} for day in range(1, 6)]
+            history[-1]['items'].append('Soda (drinks)')
+
+            prompt = service._format_prompt(menu_data, history)
+            assert "Popcorn (snacks) x5" in prompt
+            assert "Most recent order (2023-01-05): Popcorn (snacks), Soda (drinks)" in prompt
+            assert "2023-01-01" not in prompt
+
+    def test_get_menu_items_top_k_and_budget(self, app, sample_supplier):
+        """The menu keeps the top K items per category and stays within the token budget."""
+        from app.models import Products, db
+        with app.app_context():
+            for i in range(30):
+                db.session.add(Products(supplier_id=sample_supplier, name=f"Snack {i:02d}", unit_price=2.50,
+                                        inventory_quantity=10, category='snacks', is_available=True))
+                db.session.add(Products(supplier_id=sample_supplier, name=f"Drink {i:02d}", unit_price=1.50,
+                                        inventory_quantity=10, category='beverages', is_available=True))
+            db.session.commit()
+            service = RecommendationService()
+
+            app.config['RECOMMENDATION_MENU_TOP_K'] = 3
+            menu = service._get_menu_items()
+            assert sum(item.startswith("Snack") for item in menu['products']) == 3
+            assert sum(item.startswith("Drink") for item in menu['products']) == 3
+
+            app.config['RECOMMENDATION_MENU_TOP_K'] = 30
+            app.config['RECOMMENDATION_MENU_TOKEN_BUDGET'] = 50
+            menu = service._get_menu_items()
+            assert 0 < len(menu['products']) < 60
+            assert len(", ".join(menu['products'])) // 4 <= 50
+    # --- Caching Tests ---
+
+    @staticmethod
+    def _llm_reply(mock_client, text):
+        mock_client.chat.complete.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content=json.dumps({"recommendations": text})))]
+        )
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_repeat_requests_served_from_cache(self, mock_mistral, app, sample_customer):
+        """A second request for the same user does not call the LLM again."""
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        self._llm_reply(mock_client, "Try the nachos!")
+
+        with app.app_context():
+            first = RecommendationService().get_recommendations(user_id=sample_customer)
+            second = RecommendationService().get_recommendations(user_id=sample_customer)
+
+        assert first == second
+        assert mock_client.chat.complete.call_count == 1
+        assert mock_mistral.call_count == 1
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_fallback_not_cached(self, mock_mistral, app, sample_customer):
+        """An LLM failure is not cached, so the next request tries again."""
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        mock_client.chat.complete.side_effect = Exception("Service Unavailable")
+
+        with app.app_context():
+            RecommendationService().get_recommendations(user_id=sample_customer)
+            mock_client.chat.complete.side_effect = None
+            self._llm_reply(mock_client, "Try the nachos!")
+            result = RecommendationService().get_recommendations(user_id=sample_customer)
+
+        assert result["recommendations"] == "Try the nachos!"
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_invalidation_serves_stale_then_refreshes(self, mock_mistral, app, sample_customer):
+        """After invalidation the old text is served once while a refresh replaces it."""
+        from app.services.recommendation_service import invalidate_recommendations
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        self._llm_reply(mock_client, "Old pick")
+
+        with app.app_context():
+            service = RecommendationService()
+            service.get_recommendations(user_id=sample_customer)
+            self._llm_reply(mock_client, "New pick")
+            invalidate_recommendations(sample_customer)
+
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "Old pick"
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "New pick"
+        assert mock_client.chat.complete.call_count == 2
+
+    def test_background_refresh_dropped_when_pool_full(self, app):
+        """Refreshes beyond the pool's workers and queue are dropped, not given new threads."""
+        import threading
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def blocking_snapshot():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            raise RuntimeError("menu unavailable")
+
+        with app.app_context():
+            app.config.update(RECOMMENDATION_REFRESH_ASYNC=True, RECOMMENDATION_REFRESH_WORKERS=1,
+                              RECOMMENDATION_REFRESH_QUEUE_SIZE=0)
+            app.extensions.pop('recommendation_refresh_pool', None)
+            service = RecommendationService()
+            service._get_menu_snapshot = blocking_snapshot
+            service._refresh_in_background(1)
+            assert started.wait(5)
+            service._refresh_in_background(2)
+            assert 2 not in app.extensions['recommendation_refreshing']
+            release.set()
+            executor, _ = app.extensions.pop('recommendation_refresh_pool')
+            executor.shutdown(wait=True)
+        assert len(calls) == 1
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_menu_change_refreshes(self, mock_mistral, app, sample_customer, sample_product):
+        """A new menu version makes cached recommendations stale."""
+        from app.models import Products, db
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        self._llm_reply(mock_client, "Popcorn for you")
+
+        with app.app_context():
+            app.config['RECOMMENDATION_MENU_TTL_SECS'] = 0
+            service = RecommendationService()
+            service.get_recommendations(user_id=sample_customer)
+            assert mock_client.chat.complete.call_count == 1
+
+            product = Products.query.get(sample_product)
+            product.is_available = False
+            db.session.commit()
+            self._llm_reply(mock_client, "Try a bundle")
+
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "Popcorn for you"
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "Try a bundle"
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_local_backend_skips_llm(self, mock_mistral, app, sample_customer):
+        """The local backend answers with item ids and never builds an LLM client."""
+        with app.app_context():
+            app.config['RECOMMENDATION_BACKEND'] = 'local'
+            result = RecommendationService().get_recommendations(user_id=sample_customer)
+
+        assert result == {"type": "items", "recommendations": []}
+        mock_mistral.assert_not_called()
+
+    # --- Precompute Tests ---
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_precomputed_row_served_without_llm(self, mock_mistral, app, sample_customer):
+        """A precomputed row for the current menu is served by primary key, without an LLM call."""
+        with app.app_context():
+            service = RecommendationService()
+            _, menu_version = service._get_menu_snapshot()
+            stored = {"type": "text", "recommendations": "Precomputed pick"}
+            assert service.save_precomputed([(sample_customer, stored)], menu_version) == 1
+
+            assert service.get_recommendations(user_id=sample_customer) == stored
+        mock_mistral.return_value.chat.complete.assert_not_called()
+
+    @patch("app.services.llm_backend.Mistral")
+    def test_precomputed_row_for_old_menu_refreshed(self, mock_mistral, app, sample_customer):
+        """A row built from another menu is served once while a refresh replaces it."""
+        mock_client = MagicMock()
+        mock_mistral.return_value = mock_client
+        self._llm_reply(mock_client, "Fresh pick")
+
+        with app.app_context():
+            service = RecommendationService()
+            service.save_precomputed([(sample_customer, {"type": "text", "recommendations": "Old pick"})], "0" * 40)
+
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "Old pick"
+            assert service.get_recommendations(user_id=sample_customer)["recommendations"] == "Fresh pick"
+
+    def test_save_precomputed_upserts(self, app, sample_customer):
+        """Saving again for the same customer replaces the row."""
+        from app.models import CustomerRecommendations
+        with app.app_context():
+            service = RecommendationService()
+            service.save_precomputed([(sample_customer, {"type": "text", "recommendations": "A"})], "a" * 40)
+            service.save_precomputed([(sample_customer, {"type": "text", "recommendations": "B"})], "b" * 40)
+
+            row = CustomerRecommendations.query.get(sample_customer)
+            assert row.recommendation["recommendations"] == "B"
+            assert row.menu_version == "b" * 40
+
+    def test_get_active_customer_ids_keyset(self, app, sample_customer):
+        """Active customers are paged by user id, starting after the given id."""
+        with app.app_context():
+            service = RecommendationService()
+            assert sample_customer in service.get_active_customer_ids()
+            assert sample_customer not in service.get_active_customer_ids(after_user_id=sample_customer)
@@ -0,0 +1,75 @@
+import pytest
+from app.app import db
+from app.models import CartItems, CustomerShowings, Deliveries, DeliveryItems
+from app.services.sales_rollup_service import SalesRollupService
+from app.services.customer_service import CustomerService
+
+
+def _add_item(delivery_id, product_id, quantity):
+    delivery = Deliveries.query.filter_by(id=delivery_id).first()
+    customer_id = CustomerShowings.query.get(delivery.customer_showing_id).customer_id
+    cart_item = CartItems(customer_id=customer_id, product_id=product_id, quantity=quantity)
+    db.session.add(cart_item)
+    db.session.flush()
+    db.session.add(DeliveryItems(delivery_id=delivery_id, cart_item_id=cart_item.id))
+    db.session.commit()
+
+
+class TestSalesRollupService:
+    # Delivery items are rolled up as units sold at the delivery's theatre
+    def test_delivery_items_counted(self, app, sample_theatre, sample_delivery, sample_product):
+        with app.app_context():
+            _add_item(sample_delivery, sample_product, 3)
+            top = SalesRollupService().get_top_sellers(theatre_id=sample_theatre, hours=1)
+            assert top == [{'item_type': 'product', 'item_id': sample_product, 'units_sold': 3}]
+            assert SalesRollupService().get_top_sellers(theatre_id=999999, hours=1) == []
+
+    # Items are ranked by units sold across the window
+    def test_ranking(self, app, sample_delivery, sample_product, sample_product_extra):
+        with app.app_context():
+            _add_item(sample_delivery, sample_product, 1)
+            _add_item(sample_delivery, sample_product_extra, 4)
+            top = SalesRollupService().get_top_sellers(hours=24, item_type='product')
+            assert [row['item_id'] for row in top] == [sample_product_extra, sample_product]
+            assert SalesRollupService().get_units_sold(hours=24)[('product', sample_product)] == 1
+
+    # Cancelling a delivery takes its units back out
+    def test_cancellation_reverses(self, app, sample_theatre, sample_delivery, sample_product):
+        with app.app_context():
+            _add_item(sample_delivery, sample_product, 2)
+            Deliveries.query.filter_by(id=sample_delivery).first().delivery_status = 'cancelled'
+            db.session.commit()
+            assert SalesRollupService().get_units_sold(theatre_id=sample_theatre) == {}
+
+    # Rolled-back checkouts leave the rollups untouched
+    def test_rollback_discards_update(self, app, sample_delivery, sample_product):
+        with app.app_context():
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            customer_id = CustomerShowings.query.get(delivery.customer_showing_id).customer_id
+            cart_item = CartItems(customer_id=customer_id, product_id=sample_product, quantity=1)
+            db.session.add(cart_item)
+            db.session.flush()
+            db.session.add(DeliveryItems(delivery_id=sample_delivery, cart_item_id=cart_item.id))
+            db.session.flush()
+            db.session.rollback()
+            assert SalesRollupService().get_units_sold() == {}
+
+    # Invalid windows and filters raise
+    def test_invalid_arguments(self, app):
+        with app.app_context():
+            service = SalesRollupService()
+            with pytest.raises(ValueError, match="hours"):
+                service.get_top_sellers(hours=0)
+            with pytest.raises(ValueError, match="limit"):
+                service.get_top_sellers(limit=0)
+            with pytest.raises(ValueError, match="item_type"):
+                service.get_top_sellers(item_type='movie')
+
+    # The menu can be ordered by recent units sold
+    def test_menu_sorted_by_popularity(self, app, sample_delivery, sample_product, sample_product_extra):
+        with app.app_context():
+            _add_item(sample_delivery, sample_product_extra, 5)
+            products = CustomerService().show_all_products(sort='popular')
+            assert products[0].id == sample_product_extra
+            with pytest.raises(ValueError, match="sort"):
+                CustomerService().show_all_products(sort='price')
@@ -0,0 +1,119 @@
+import base64
+import pytest
+from datetime import datetime
+from app.app import db
+from app.models import Seats, CustomerShowings, MovieShowings
+from app.services.showing_service import ShowingService
+from app.services.customer_service import CustomerService
+from app.services.staff_service import StaffService
+
+
+def _add_seats(auditorium_id, spec):
+    # spec: {aisle: [numbers]}; returns {(aisle, number): seat_id}
+    ids = {}
+    for aisle, numbers in spec.items():
+        for number in numbers:
+            seat = Seats(aisle=aisle, number=number, auditorium_id=auditorium_id)
+            db.session.add(seat)
+            db.session.flush()
+            ids[(aisle, number)] = seat.id
+    db.session.commit()
+    return ids
+
+
+class TestShowingService:
+    # Layout is compressed into per-aisle ranges and occupancy into a bitset
+    def test_build_seatmap_ranges_and_bits(self, app, sample_showing, sample_auditorium, sample_customer):
+        with app.app_context():
+            seats = _add_seats(sample_auditorium, {'A': [1, 2, 3, 5], 'B': [1, 2]})
+            db.session.add(CustomerShowings(customer_id=sample_customer, movie_showing_id=sample_showing,
+                                            seat_id=seats[('A', 2)]))
+            db.session.add(CustomerShowings(customer_id=sample_customer, movie_showing_id=sample_showing,
+                                            seat_id=seats[('B', 1)]))
+            db.session.commit()
+
+            seatmap = ShowingService().build_seatmap(sample_showing)
+            assert seatmap['seat_count'] == 6
+            assert seatmap['booked_count'] == 2
+            assert seatmap['layout'] == [
+                {'aisle': 'A', 'ranges': [[1, 3], [5, 5]]},
+                {'aisle': 'B', 'ranges': [[1, 2]]},
+            ]
+            # Order: A1 A2 A3 A5 B1 B2 -> 0 1 0 0 1 0 (padded)
+            assert base64.b64decode(seatmap['occupancy']) == bytes([0b01001000])
+
+    # Payload stays small for a large auditorium
+    def test_seatmap_is_compact(self, app, sample_showing, sample_auditorium):
+        with app.app_context():
+            _add_seats(sample_auditorium, {aisle: range(1, 26) for aisle in 'ABCDEFGHIJKLMNOPQRST'})
+            seatmap = ShowingService().build_seatmap(sample_showing)
+            assert seatmap['seat_count'] == 500
+            assert len(seatmap['occupancy']) < 100
+
+    # Cached seat maps are refreshed after a booking
+    def test_seatmap_invalidated_on_booking(self, app, sample_showing, sample_auditorium, sample_customer):
+        with app.app_context():
+            seats = _add_seats(sample_auditorium, {'A': [1, 2]})
+            service = ShowingService()
+            assert service.get_seatmap(sample_showing)['booked_count'] == 0
+            CustomerService().create_customer_showing(sample_customer, sample_showing, seats[('A', 1)])
+            assert service.get_seatmap(sample_showing)['booked_count'] == 1
+
+    # Unknown showings raise
+    def test_seatmap_not_found(self, app):
+        with app.app_context():
+            with pytest.raises(ValueError, match="not found"):
+                ShowingService().get_seatmap(999999)
+
+    # Showtimes groups the window's showings by movie
+    def test_get_showtimes(self, app, sample_theatre, sample_showing, sample_auditorium, sample_movie):
+        with app.app_context():
+            db.session.add(MovieShowings(movie_id=sample_movie, auditorium_id=sample_auditorium,
+                                         start_time=datetime(2025, 12, 2, 19, 0)))
+            db.session.commit()
+
+            showtimes = ShowingService().get_showtimes(sample_theatre, datetime(2025, 12, 1), datetime(2025, 12, 2))
+            assert showtimes['theatre_id'] == sample_theatre
+            assert len(showtimes['movies']) == 1
+            movie = showtimes['movies'][0]
+            assert movie['movie_id'] == sample_movie
+            assert movie['title'] == 'Test Movie'
+            assert movie['showings'] == [
+                {'showing_id': sample_showing, 'auditorium_id': sample_auditorium, 'start_time': '2025-12-01T19:00:00'}
+            ]
+
+            showtimes = ShowingService().get_showtimes(sample_theatre, datetime(2025, 12, 1, 20), datetime(2025, 12, 3))
+            assert [s['start_time'] for s in showtimes['movies'][0]['showings']] == ['2025-12-02T19:00:00']
+
+    # Showtimes windows must be non-empty and bounded, and the theatre must exist
+    def test_get_showtimes_invalid(self, app, sample_theatre):
+        with app.app_context():
+            service = ShowingService()
+            with pytest.raises(ValueError, match="must end after it starts"):
+                service.get_showtimes(sample_theatre, datetime(2025, 12, 2), datetime(2025, 12, 1))
+            with pytest.raises(ValueError, match="cannot exceed 14 days"):
+                service.get_showtimes(sample_theatre, datetime(2025, 12, 1), datetime(2026, 1, 1))
+            with pytest.raises(ValueError, match="Theatre 999999 not found"):
+                service.get_showtimes(999999, datetime(2025, 12, 1), datetime(2025, 12, 2))
+
+    # Days are cached until a showing on that day changes
+    def test_showtimes_cached_and_invalidated(self, app, sample_theatre, sample_showing, sample_auditorium,
+                                              sample_movie, sample_admin):
+        with app.app_context():
+            service = ShowingService()
+            window = (datetime(2025, 12, 1), datetime(2025, 12, 2))
+            assert len(service.get_showtimes(sample_theatre, *window)['movies'][0]['showings']) == 1
+
+            # Written behind the service's back: still served from cache
+            db.session.add(MovieShowings(movie_id=sample_movie, auditorium_id=sample_auditorium,
+                                         start_time=datetime(2025, 12, 1, 10, 0)))
+            db.session.commit()
+            assert len(service.get_showtimes(sample_theatre, *window)['movies'][0]['showings']) == 1
+
+            StaffService(sample_admin).add_showing(sample_movie, sample_auditorium, datetime(2025, 12, 1, 23, 0))
+            starts = [s['start_time'] for s in service.get_showtimes(sample_theatre, *window)['movies'][0]['showings']]
+            assert starts == ['2025-12-01T10:00:00', '2025-12-01T19:00:00', '2025-12-01T23:00:00']
+
+            StaffService(sample_admin).remove_showing(sample_showing)
+            starts = [s['start_time'] for s in service.get_showtimes(sample_theatre, *window)['movies'][0]['showings']]
+            assert starts == ['2025-12-01T10:00:00', '2025-12-01T23:00:00']
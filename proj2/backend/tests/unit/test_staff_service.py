@@ -1,5 +1,5 @@
 import pytest
-from app.services.staff_service import StaffService
+from app.services.staff_service import StaffService, ScheduleConflictError
 from app.services.user_service import UserService
 from app.models import *
 from datetime import datetime
@@ -393,6 +393,14 @@ class TestStaffService:
                 assert hasattr(d, "id")
                 assert hasattr(d, "delivery_status")
 
+    # Legacy deliveries without a theatre_id are still listed through their seat
+    def test_show_all_deliveries_includes_legacy_rows(self, app, sample_admin, sample_theatre, sample_delivery):
+        with app.app_context():
+            Deliveries.query.filter_by(id=sample_delivery).update({'theatre_id': None, 'auditorium_id': None})
+            db.session.commit()
+            deliveries = StaffService(sample_admin).show_all_deliveries(theatre_id=sample_theatre)
+            assert sample_delivery in [d.id for d in deliveries]
+
     # Show all deliveries should be empty for a theatre with no data
     def test_show_all_deliveries_empty_for_unused_theatre(self, app, sample_admin):
         with app.app_context():
@@ -418,3 +426,164 @@ class TestStaffService:
             with pytest.raises(ValueError, match="Unauthorized User - Not a staff member"):
                 staff = svc.get_staff(sample_customer)
                 assert staff is None
+
+    # Claiming staff picks the least-recently-updated runner first
+    def test_claim_available_staff_least_recently_used(self, app):
+        with app.app_context():
+            theatre = Theatres(name='Queue Theatre', address='1 Queue St', phone='5550007001', is_open=True)
+            db.session.add(theatre)
+            db.session.commit()
+            runner_ids = []
+            for i, stamp in enumerate([datetime(2024, 1, 2), datetime(2024, 1, 1)]):
+                u = UserService().create_user(
+                    name=f'Queue Runner {i}',
+                    email=f'queue{i}@example.com',
+                    phone=f'555123710{i}',
+                    birthday='1995-01-01',
+                    password='password123',
+                    role='staff'
+                )
+                db.session.add(Staff(user_id=u.id, theatre_id=theatre.id, role='runner',
+                                     is_available=True, last_updated=stamp))
+                runner_ids.append(u.id)
+            db.session.commit()
+            svc = StaffService(0)
+            staff = svc.claim_available_staff(theatre_id=theatre.id)
+            assert staff.user_id == runner_ids[1]
+            assert staff.active_deliveries == 1
+            assert staff.is_available is False
+            db.session.commit()
+            assert svc.claim_available_staff(theatre_id=theatre.id).user_id == runner_ids[0]
+            db.session.commit()
+            assert svc.claim_available_staff(theatre_id=theatre.id) is None
+
+    # A runner stays in the queue until the concurrency limit is reached
+    def test_claim_respects_concurrency_limit(self, app, sample_staff):
+        with app.app_context():
+            app.config['STAFF_MAX_CONCURRENT_DELIVERIES'] = 2
+            staff = Staff.query.filter_by(user_id=sample_staff).first()
+            svc = StaffService(0)
+            svc._take_slot(staff)
+            assert staff.is_available is True
+            svc._take_slot(staff)
+            assert staff.is_available is False
+            db.session.commit()
+            released = svc.release_staff(sample_staff)
+            assert released.active_deliveries == 1
+            assert released.is_available is True
+
+    # Releasing does not bring back a runner who went unavailable by choice
+    def test_release_staff_keeps_manual_unavailability(self, app, sample_staff):
+        with app.app_context():
+            svc = StaffService(sample_staff)
+            staff = Staff.query.filter_by(user_id=sample_staff).first()
+            app.config['STAFF_MAX_CONCURRENT_DELIVERIES'] = 3
+            staff.active_deliveries = 1
+            svc.set_availability(False)
+            released = svc.release_staff(sample_staff)
+            assert released.active_deliveries == 0
+            assert released.is_available is False
+
+    # Assigning staff to a delivery leaves the commit to the caller
+    def test_try_assign_staff_sets_delivery(self, app, sample_staff, sample_theatre, sample_delivery):
+        with app.app_context():
+            Staff.query.filter(Staff.user_id != sample_staff).update({'is_available': False})
+            db.session.commit()
+            delivery = Deliveries.query.filter_by(id=sample_delivery).first()
+            assert StaffService(0).try_assign_staff(theatre_id=sample_theatre, delivery=delivery) is True
+            db.session.commit()
+            assert Deliveries.query.filter_by(id=sample_delivery).first().staff_id == sample_staff
+            assert Staff.query.filter_by(user_id=sample_staff).first().active_deliveries == 1
+
+    # Bulk schedule several non-overlapping showings in one call
+    def test_schedule_showings_success(self, app, sample_admin, sample_theatre, sample_movie, sample_auditorium):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            showings = svc.schedule_showings(sample_theatre, [
+                {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T12:00:00"},
+                {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T14:15:00"},
+                {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": datetime(2025, 2, 1, 17, 0, 0)},
+            ])
+            assert len(showings) == 3
+            assert [s.start_time for s in showings] == [
+                datetime(2025, 2, 1, 12, 0), datetime(2025, 2, 1, 14, 15), datetime(2025, 2, 1, 17, 0)
+            ]
+
+    # Slots overlapping each other (runtime + buffer) are rejected and nothing is written
+    def test_schedule_showings_conflict_within_batch(self, app, sample_admin, sample_theatre, sample_movie, sample_auditorium):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            with pytest.raises(ScheduleConflictError) as exc:
+                svc.schedule_showings(sample_theatre, [
+                    {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T12:00:00"},
+                    {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T14:05:00"},
+                ])
+            assert exc.value.conflicts[0]["slot"] == 1
+            assert MovieShowings.query.filter_by(auditorium_id=sample_auditorium).count() == 0
+
+    # Slots overlapping an existing showing are rejected
+    def test_schedule_showings_conflict_with_existing(self, app, sample_admin, sample_theatre, sample_movie, sample_auditorium, sample_showing):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            with pytest.raises(ScheduleConflictError) as exc:
+                svc.schedule_showings(sample_theatre, [
+                    {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-12-01T18:00:00"},
+                ])
+            assert exc.value.conflicts[0]["conflicts_with_showing_id"] == sample_showing
+
+    # Auditoriums from another theatre are rejected
+    def test_schedule_showings_wrong_theatre(self, app, sample_admin, sample_movie, sample_auditorium):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            with pytest.raises(ValueError, match="not found in theatre"):
+                svc.schedule_showings(999999, [
+                    {"movie_id": sample_movie, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T12:00:00"},
+                ])
+
+    # An unknown movie is rejected after releasing the auditorium locks
+    def test_schedule_showings_unknown_movie_releases_locks(self, app, sample_admin, sample_theatre, sample_auditorium):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            with pytest.raises(ValueError, match="not found"):
+                svc.schedule_showings(sample_theatre, [
+                    {"movie_id": 999999, "auditorium_id": sample_auditorium, "start_time": "2025-02-01T12:00:00"},
+                ])
+            assert not db.session.in_transaction()
+
+    # Adding a single showing five minutes after another one is an overlap
+    def test_add_showing_overlap(self, app, sample_admin, sample_movie, sample_auditorium, sample_showing):
+        with app.app_context():
+            svc = StaffService(sample_admin)
+            with pytest.raises(ScheduleConflictError):
+                svc.add_showing(sample_movie, sample_auditorium, datetime(2025, 12, 1, 19, 5, 0))
+
+    # Bulk onboarding creates valid staff rows and reports the invalid ones
+    def test_add_staff_bulk(self, app, sample_admin, sample_theatre):
+        with app.app_context():
+            staff_service = StaffService(sample_admin)
+            base = {'birthday': '1990-01-01', 'password': 'password123', 'theatre_id': sample_theatre, 'role': 'runner'}
+            results = staff_service.add_staff_bulk([
+                dict(base, name='Runner One', email='runner1@example.com', phone='5551110001'),
+                dict(base, name='Runner Two', email='RUNNER1@example.com', phone='5551110002'),
+                dict(base, name='Runner Three', email='runner3@example.com', phone='5551110003', theatre_id=999999),
+                dict(base, name='Runner Four', email='runner4@example.com', phone='5551110004', role='chef'),
+                dict(base, name='Runner Five', email='runner5@example.com', phone='5551110005', birthday='01/01/1990'),
+                dict(base, name='Runner Six', email='runner6@example.com', phone='5551110006', theatre_id=str(sample_theatre)),
+                dict(base, name='Runner Seven', email='runner7@example.com', phone='5551110007', theatre_id='main'),
+            ])
+            assert results[0]['status'] == 'created'
+            assert results[1]['error'] == 'Duplicate email in batch (row 0)'
+            assert results[2]['error'] == 'Theatre 999999 not found'
+            assert results[3]['error'] == "Invalid role. Must be 'admin' or 'runner'."
+            assert results[4]['error'] == 'Birthday must be YYYY-MM-DD'
+            assert results[5]['status'] == 'created'
+            assert results[6]['error'] == 'theatre_id must be an integer'
+            staff = Staff.query.filter_by(user_id=results[0]['user_id']).first()
+            assert staff.role == 'runner' and staff.theatre_id == sample_theatre and staff.is_available
+            assert UserService().validate_credentials('runner1@example.com', 'password123') is not None
+
+    # Only admins can onboard staff in bulk
+    def test_add_staff_bulk_unauthorized(self, app, sample_staff):
+        with app.app_context():
+            with pytest.raises(ValueError, match="Unauthorized User - Not an admin"):
+                StaffService(sample_staff).add_staff_bulk([])
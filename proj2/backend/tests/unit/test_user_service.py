@@ -1,5 +1,9 @@
 import pytest
 from app.services.user_service import UserService
+from app.identity import load_user_principal
+from app.hashing import PasswordHashPool, get_password_hasher
+from app.models import Users
+from app.app import db
 
 # Test class for user_service.py
 class TestUserService:
@@ -263,3 +267,42 @@ class TestUserService:
             password_hash = user_service.generate_password_hash('mypassword')
             result = user_service.check_password_hash(password_hash, 'wrongpassword')
             assert result is False
+
+    # set_account_status updates the account and evicts the cached session principal
+    def test_set_account_status(self, app, sample_user):
+        with app.app_context():
+            user_service = UserService()
+            assert load_user_principal(sample_user).is_active
+            user = user_service.set_account_status(sample_user, 'inactive')
+            assert user.account_status == 'inactive'
+            assert load_user_principal(sample_user) is None
+
+    # set_account_status rejects unknown statuses
+    def test_set_account_status_invalid(self, app, sample_user):
+        with app.app_context():
+            user_service = UserService()
+            with pytest.raises(ValueError, match="Account status must be active or inactive"):
+                user_service.set_account_status(sample_user, 'banned')
+
+    # Profile updates are visible through the session principal immediately
+    def test_update_profile_invalidates_principal(self, app, sample_user):
+        with app.app_context():
+            user_service = UserService()
+            assert load_user_principal(sample_user).name == 'Test User'
+            user_service.update_user_profile(sample_user, 'Renamed', 'renamed@example.com', '5550001111', '1990-01-01')
+            assert load_user_principal(sample_user).name == 'Renamed'
+
+    # Logging in upgrades a hash made with outdated argon2 parameters
+    def test_validate_credentials_rehashes(self, app, sample_user):
+        with app.app_context():
+            user_service = UserService()
+            old_pool = PasswordHashPool(time_cost=2, memory_cost=2048, parallelism=1)
+            user = Users.query.filter_by(id=sample_user).first()
+            user.password_hash = old_pool.hash('password123')
+            db.session.commit()
+            assert get_password_hasher().needs_rehash(user.password_hash)
+
+            assert user_service.validate_credentials('test@example.com', 'password123') is not None
+            user = Users.query.filter_by(id=sample_user).first()
+            assert not get_password_hasher().needs_rehash(user.password_hash)
+            assert user_service.check_password_hash(user.password_hash, 'password123')
@@ -0,0 +1,198 @@
+"""Run every coupon puzzle script in a sandbox and check it against its stored answer.
+
+Each <tier>/<name>.py under the puzzle roots is run in its own isolated
+Python subprocess (-I -S, empty environment, scratch working directory,
+CPU/memory/file-size rlimits) with a wall-clock timeout, many at a time.
+Its stdout is compared with <tier>/<name>.txt.
+
+Usage:
+  python validate_puzzles.py                               # validate app/code_puzzle
+  python validate_puzzles.py --root tests/test_code_puzzle --workers 32 --timeout 2
+  python validate_puzzles.py --sync-db --env production    # also upsert code_puzzles rows
+
+With --sync-db, every puzzle that validated is written to code_puzzles in
+one bulk insert and one bulk update; mismatching or failing puzzles are
+left alone. Exits non-zero if any puzzle fails.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+TIERS = ('easy', 'medium', 'hard')
+
+# Same tier-to-difficulty mapping as load_database.py
+TIER_DIFFICULTY = {'easy': 1, 'medium': 5, 'hard': 8}
+
+# Runs inside the child: apply rlimits, then execute the puzzle as __main__
+SANDBOX_PRELUDE = """
+import runpy, sys
+path, cpu_secs, memory_bytes = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+try:
+    import resource
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_secs, cpu_secs))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+except (ImportError, ValueError, OSError):
+    pass
+sys.argv = [path]
+runpy.run_path(path, run_name='__main__')
+"""
+
+
+def discover(roots):
+    """Return [(tier, name, script_path, answer_or_None)] for every puzzle script, first root wins."""
+    puzzles = []
+    seen = set()
+    for root in roots:
+        for tier in TIERS:
+            folder = os.path.join(root, tier)
+            if not os.path.isdir(folder):
+                continue
+            for filename in sorted(os.listdir(folder)):
+                name, ext = os.path.splitext(filename)
+                if ext != '.py' or (tier, name) in seen:
+                    continue
+                seen.add((tier, name))
+                answer_path = os.path.join(folder, name + '.txt')
+                answer = None
+                if os.path.exists(answer_path):
+                    with open(answer_path, 'r', encoding='utf-8') as f:
+                        answer = f.read().strip()
+                puzzles.append((tier, name, os.path.abspath(os.path.join(folder, filename)), answer))
+    return puzzles
+
+
+def run_puzzle(script_path, timeout, cpu_secs, memory_mb):
+    """Run one script in the sandbox.
+
+    Returns:
+        tuple: (status, stdout, detail, elapsed seconds) with status 'ran', 'error' or 'timeout'.
+    """
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix='puzzle-') as scratch:
+        command = [sys.executable, '-I', '-S', '-c', SANDBOX_PRELUDE, script_path,
+                   str(cpu_secs), str(memory_mb * 1024 * 1024)]
+        process = subprocess.Popen(command, cwd=scratch, env={}, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   start_new_session=(os.name == 'posix'))
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # Kill the whole process group so nothing the script spawned lingers
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            process.communicate()
+            return 'timeout', '', f"no result after {timeout}s", time.monotonic() - started
+    elapsed = time.monotonic() - started
+    stdout = stdout.decode('utf-8', errors='replace').strip()
+    if process.returncode != 0:
+        lines = stderr.decode('utf-8', errors='replace').strip().splitlines()
+        if lines:
+            detail = lines[-1]
+        elif process.returncode < 0:
+            detail = f"killed by {signal.Signals(-process.returncode).name} (resource limit)"
+        else:
+            detail = f"exit code {process.returncode}"
+        return 'error', stdout, detail, elapsed
+    return 'ran', stdout, '', elapsed
+
+
+def validate(puzzles, workers, timeout, cpu_secs, memory_mb):
+    """Run all puzzles in parallel and return one result dict per puzzle, in input order."""
+    def check(puzzle):
+        tier, name, script_path, answer = puzzle
+        status, stdout, detail, elapsed = run_puzzle(script_path, timeout, cpu_secs, memory_mb)
+        if status == 'ran':
+            if answer is None:
+                status, detail = 'no-answer', f"missing {name}.txt"
+            elif stdout != answer:
+                status, detail = 'mismatch', f"expected {answer!r}, got {stdout!r}"
+            else:
+                status = 'ok'
+        return {'tier': tier, 'name': name, 'script_path': script_path, 'status': status,
+                'output': stdout, 'detail': detail, 'elapsed': elapsed}
+
+    # The work happens in subprocesses; threads only wait on them
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check, puzzles))
+
+
+def sync_database(env, results):
+    """Bulk upsert validated puzzles into code_puzzles, keyed by (folder, name)."""
+    from sqlalchemy import insert, update
+    from app.app import create_app, db
+    from app.models import CodePuzzles
+
+    rows = []
+    for result in results:
+        if result['status'] != 'ok':
+            continue
+        with open(result['script_path'], 'r', encoding='utf-8') as f:
+            script = f.read()
+        rows.append({'folder': result['tier'], 'name': result['name'], 'difficulty': TIER_DIFFICULTY[result['tier']],
+                     'script': script, 'answer': result['output'], 'is_active': True})
+
+    app = create_app(env)
+    with app.app_context():
+        try:
+            existing = {(folder, name): puzzle_id for puzzle_id, folder, name in
+                        db.session.query(CodePuzzles.id, CodePuzzles.folder, CodePuzzles.name)}
+            updates = [dict(row, id=existing[(row['folder'], row['name'])])
+                       for row in rows if (row['folder'], row['name']) in existing]
+            inserts = [row for row in rows if (row['folder'], row['name']) not in existing]
+            if inserts:
+                db.session.execute(insert(CodePuzzles), inserts)
+            if updates:
+                db.session.execute(update(CodePuzzles), updates)
+            db.session.commit()
+            print(f"Synced code_puzzles: inserted {len(inserts)}, updated {len(updates)}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Sync failed: {e}")
+            return False
+        finally:
+            db.session.remove()
+    return True
+
+
+def main():
+    default_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'code_puzzle')
+    parser = argparse.ArgumentParser(description="Validate coupon puzzle scripts against their answers")
+    parser.add_argument('--root', action='append', help="Puzzle root with easy/medium/hard folders (repeatable; default app/code_puzzle)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Puzzles run at once")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Wall-clock seconds per puzzle")
+    parser.add_argument('--cpu-secs', type=int, default=2, help="CPU seconds per puzzle")
+    parser.add_argument('--memory-mb', type=int, default=256, help="Address space per puzzle in MiB")
+    parser.add_argument('--sync-db', action='store_true', help="Upsert validated puzzles into code_puzzles")
+    parser.add_argument('--env', default='development', help="App config name used with --sync-db")
+    args = parser.parse_args()
+
+    puzzles = discover(args.root or [default_root])
+    if not puzzles:
+        print("No puzzles found")
+        return 1
+
+    started = time.monotonic()
+    results = validate(puzzles, args.workers, args.timeout, args.cpu_secs, args.memory_mb)
+    elapsed = time.monotonic() - started
+
+    failed = [r for r in results if r['status'] != 'ok']
+    for result in results:
+        line = f"  {result['status']:<9} {result['tier']}/{result['name']} ({result['elapsed'] * 1000:.0f} ms)"
+        print(line + (f": {result['detail']}" if result['detail'] else ''))
+    print(f"\n{len(results) - len(failed)}/{len(results)} puzzles valid in {elapsed:.2f}s")
+
+    if args.sync_db and not sync_database(args.env, results):
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())